@@ -4,11 +4,22 @@ from flask_jwt_extended import JWTManager
 from config import Config
 import os
 from .extensions import db, jwt
-from .routes.auth import auth_bp
+from .routes.auth import auth_bp, init_yandex_auth
 from .routes.products import products_bp
 from .routes.orders import orders_bp
 from .routes.admin import admin_bp
 from .routes.payment_routes import payment_bp, init_payment_service
+from .services.cache_service import init_catalog_cache
+from .services.json_service import init_json
+from .services.compression_service import init_compression
+from .services.search_service import init_search_service
+from .services.principal_service import init_principal_cache
+from .services.token_service import init_token_service
+from .services.password_service import init_password_hasher
+from .services.storage_service import init_storage
+from .services.image_service import init_image_pipeline
+from .services.reservation_service import start_hold_sweeper
+from .cli import register_commands
 
 def create_app(config_class=Config):
     app = Flask(__name__, static_folder='static')
@@ -16,8 +27,18 @@ def create_app(config_class=Config):
 
     db.init_app(app)
     jwt.init_app(app)
+    init_json(app)
 
     init_payment_service(app)
+    init_yandex_auth(app)
+    init_catalog_cache(app)
+    init_search_service(app)
+    init_principal_cache(app)
+    init_token_service(app, jwt)
+    init_password_hasher(app)
+    init_storage(app)
+    init_image_pipeline(app)
+    init_compression(app)
 
     # Создаем директорию для загрузок, если она не существует
     upload_folder = os.path.join(app.static_folder, 'uploads', 'products')
@@ -29,4 +50,9 @@ def create_app(config_class=Config):
     app.register_blueprint(admin_bp)
     app.register_blueprint(payment_bp, url_prefix='/payments')
 
+    register_commands(app)
+
+    if app.config['ORDER_HOLD_SWEEPER_ENABLED']:
+        start_hold_sweeper(app)
+
     return app
\ No newline at end of file
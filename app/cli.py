@@ -0,0 +1,189 @@
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from app.extensions import db
+from app.models import Product
+from app.services.inventory_service import disable_sharding, enable_sharding, rebalance_all
+from app.services.reservation_service import expire_holds
+from app.services.reconciliation_service import reconcile_pending
+from app.routes.payment_routes import payment_service
+from app.services.idempotency_service import purge_expired
+from app.services.token_service import denylist
+from app.services.image_service import image_pipeline, process_image
+from app.services.import_service import import_products as run_import, read_records
+from app.services.upload_service import direct_uploads_enabled, purge_unfinished_uploads
+
+inventory_cli = AppGroup('inventory', help='Управление остатками товаров')
+payments_cli = AppGroup('payments', help='Обслуживание платежей')
+idempotency_cli = AppGroup('idempotency', help='Хранилище ответов Idempotency-Key')
+tokens_cli = AppGroup('tokens', help='Отозванные JWT')
+images_cli = AppGroup('images', help='Производные изображений товаров')
+products_cli = AppGroup('products', help='Каталог товаров')
+
+
+@inventory_cli.command('shard')
+@click.argument('product_id', type=int)
+@click.argument('shards', type=int)
+def shard_command(product_id, shards):
+    """Разбивает остаток товара на SHARDS шардов"""
+    enable_sharding(product_id, shards)
+    click.echo(f'Product {product_id}: {shards} shards')
+
+
+@inventory_cli.command('unshard')
+@click.argument('product_id', type=int)
+def unshard_command(product_id):
+    """Собирает остаток товара обратно в одну строку"""
+    disable_sharding(product_id)
+    click.echo(f'Product {product_id}: sharding disabled')
+
+
+@inventory_cli.command('rebalance')
+@click.option('--interval', type=float, default=None,
+              help='Повторять каждые N секунд (по умолчанию INVENTORY_REBALANCE_INTERVAL)')
+@click.option('--once', is_flag=True, help='Выполнить один проход и выйти')
+def rebalance_command(interval, once):
+    """Выравнивает остатки между шардами"""
+    interval = interval or current_app.config['INVENTORY_REBALANCE_INTERVAL']
+    while True:
+        totals = rebalance_all()
+        click.echo(f'Rebalanced {len(totals)} products')
+        if once:
+            break
+        time.sleep(interval)
+
+
+@inventory_cli.command('expire-holds')
+@click.option('--batch-size', type=int, default=None,
+              help='Размер пачки (по умолчанию ORDER_HOLD_SWEEP_BATCH)')
+@click.option('--interval', type=float, default=None,
+              help='Повторять каждые N секунд (по умолчанию ORDER_HOLD_SWEEP_INTERVAL)')
+@click.option('--once', is_flag=True, help='Выполнить один проход и выйти')
+def expire_holds_command(batch_size, interval, once):
+    """Отменяет неоплаченные заказы с истекшим резервом и возвращает остатки"""
+    batch_size = batch_size or current_app.config['ORDER_HOLD_SWEEP_BATCH']
+    interval = interval or current_app.config['ORDER_HOLD_SWEEP_INTERVAL']
+    while True:
+        expired = expire_holds(batch_size)
+        click.echo(f'Expired {expired} unpaid orders')
+        if once:
+            break
+        time.sleep(interval)
+
+
+@payments_cli.command('reconcile')
+@click.option('--workers', type=int, default=None, help='Потоков запросов к YooKassa (RECONCILE_WORKERS)')
+@click.option('--rate', type=float, default=None, help='Запросов в секунду (RECONCILE_RATE_LIMIT)')
+@click.option('--batch-size', type=int, default=None, help='Размер пачки (RECONCILE_BATCH_SIZE)')
+@click.option('--interval', type=float, default=None, help='Повторять каждые N секунд (RECONCILE_INTERVAL)')
+@click.option('--once', is_flag=True, help='Выполнить один проход и выйти')
+def reconcile_command(workers, rate, batch_size, interval, once):
+    """Сверяет зависшие pending-платежи с YooKassa"""
+    config = current_app.config
+    interval = interval or config['RECONCILE_INTERVAL']
+    while True:
+        stats = reconcile_pending(
+            payment_service.verify_payment,
+            batch_size=batch_size or config['RECONCILE_BATCH_SIZE'],
+            workers=workers or config['RECONCILE_WORKERS'],
+            rate=rate or config['RECONCILE_RATE_LIMIT'],
+            max_attempts=config['RECONCILE_MAX_ATTEMPTS'],
+            base_delay=config['RECONCILE_BACKOFF_BASE'],
+            min_age=config['RECONCILE_MIN_AGE']
+        )
+        click.echo(f"Checked {stats['checked']}, updated {stats['updated']}, failed {stats['failed']}")
+        if once:
+            break
+        time.sleep(interval)
+
+
+@idempotency_cli.command('purge')
+@click.option('--batch-size', type=int, default=1000)
+def purge_command(batch_size):
+    """Удаляет просроченные записи Idempotency-Key"""
+    click.echo(f'Purged {purge_expired(batch_size)} records')
+
+
+@tokens_cli.command('purge')
+@click.option('--batch-size', type=int, default=1000)
+def purge_tokens_command(batch_size):
+    """Удаляет истекшие записи об отозванных токенах"""
+    click.echo(f'Purged {denylist.purge_expired(batch_size)} revoked tokens')
+
+
+@images_cli.command('regenerate')
+@click.option('--all', 'regenerate_all', is_flag=True, help='Перестроить и готовые варианты')
+@click.option('--batch-size', type=int, default=100)
+def regenerate_images_command(regenerate_all, batch_size):
+    """Строит производные для товаров без готовых вариантов"""
+    if not image_pipeline.enabled:
+        raise click.ClickException('Pillow is not installed')
+    query = db.select(Product.product_id, Product.image_url).where(Product.image_url.isnot(None))
+    if not regenerate_all:
+        query = query.where(db.or_(Product.image_variants_status.is_(None),
+                                   Product.image_variants_status.in_(('pending', 'failed'))))
+    done = failed = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            query.where(Product.product_id > last_id).order_by(Product.product_id).limit(batch_size)
+        ).all()
+        db.session.rollback()
+        if not rows:
+            break
+        last_id = rows[-1].product_id
+        for product_id, image_url in rows:
+            if process_image(product_id, image_url,
+                             current_app.config['IMAGE_PIPELINE_MAX_ATTEMPTS'],
+                             current_app.config['IMAGE_PIPELINE_RETRY_DELAY']):
+                done += 1
+            else:
+                failed += 1
+    click.echo(f'Built variants for {done} products, {failed} skipped or failed')
+
+
+@images_cli.command('purge-uploads')
+@click.option('--max-age', type=int, default=None,
+              help='Возраст в секундах (по умолчанию S3_UPLOAD_ORPHAN_AGE)')
+def purge_uploads_command(max_age):
+    """Удаляет прямые загрузки в S3, не привязанные к товарам"""
+    if not direct_uploads_enabled():
+        raise click.ClickException('Direct uploads require S3 storage')
+    stats = purge_unfinished_uploads(max_age if max_age is not None else current_app.config['S3_UPLOAD_ORPHAN_AGE'])
+    click.echo(f"Deleted {stats['deleted']} objects, aborted {stats['aborted']} multipart uploads")
+
+
+@products_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default=None,
+              help='По умолчанию — по расширению файла')
+@click.option('--batch-size', type=int, default=None)
+@click.option('--dry-run', is_flag=True, help='Проверить и откатить каждую пачку')
+def import_products_command(path, fmt, batch_size, dry_run):
+    """Импортирует товары из CSV или NDJSON с upsert по sku или (name, category_id)"""
+    fmt = fmt or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+    started = time.perf_counter()
+    with open(path, 'rb') as f:
+        report = run_import(
+            read_records(f, fmt),
+            batch_size or current_app.config['IMPORT_BATCH_SIZE'],
+            dry_run=dry_run,
+            max_errors=current_app.config['IMPORT_MAX_ERRORS']
+        )
+    elapsed = time.perf_counter() - started
+    for error in report['errors']:
+        click.echo(f"row {error['row']}: {error['error']}", err=True)
+    click.echo(f"{report['rows']} rows: {report['inserted']} inserted, {report['updated']} updated, "
+               f"{report['failed']} failed in {elapsed:.1f}s ({report['rows'] / max(elapsed, 1e-9):.0f} rows/s)")
+
+
+def register_commands(app) -> None:
+    app.cli.add_command(inventory_cli)
+    app.cli.add_command(payments_cli)
+    app.cli.add_command(idempotency_cli)
+    app.cli.add_command(tokens_cli)
+    app.cli.add_command(images_cli)
+    app.cli.add_command(products_cli)
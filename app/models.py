@@ -33,50 +33,103 @@ class User(db.Model):
     def is_token_valid(self):
         return self.token_expires_at and self.token_expires_at > datetime.utcnow()
 
+class RevokedToken(db.Model):
+    """Отозванный JWT (по jti); хранится до истечения самого токена"""
+    jti = db.Column(db.String(36), primary_key=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<RevokedToken {self.jti}>'
+
 class Order(db.Model):
+    __table_args__ = (
+        db.Index('ix_order_user_created', 'user_id', 'created_at', 'order_id'),
+        db.Index('ix_order_created_id', 'created_at', 'order_id'),
+        db.Index('ix_order_status_created', 'status', 'created_at', 'order_id'),
+    )
+
     order_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.user_id'))
     status = db.Column(db.String(50))
     payment_status = db.Column(db.String(50))
-    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     total_amount = db.Column(db.Numeric(10, 2))
 
+    items = db.relationship('OrderProducts', back_populates='order', cascade='all, delete-orphan')
+    payments = db.relationship('Payment', back_populates='order', order_by='Payment.created_at')
+    hold = db.relationship('StockHold', uselist=False, cascade='all, delete-orphan')
+
+class StockHold(db.Model):
+    """Резерв остатков неоплаченного заказа; по истечении expires_at заказ отменяется"""
+    order_id = db.Column(db.Integer, db.ForeignKey('order.order_id'), primary_key=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<StockHold {self.order_id}>'
+
 class Product(db.Model):
+    __table_args__ = (
+        # Индексы под keyset-пагинацию каталога: (ключ сортировки, product_id)
+        db.Index('ix_product_created_at_id', 'created_at', 'product_id'),
+        db.Index('ix_product_price_id', 'price', 'product_id'),
+        db.Index('ix_product_category_active_created', 'category_id', 'is_active', 'created_at', 'product_id'),
+        db.Index('ix_product_category_active_price', 'category_id', 'is_active', 'price', 'product_id'),
+        # max(updated_at) для ETag каталога читается с конца индекса
+        db.Index('ix_product_updated_at', 'updated_at'),
+    )
+
     product_id = db.Column(db.Integer, primary_key=True)
+    sku = db.Column(db.String(64), unique=True)  # артикул поставщика, ключ upsert при импорте
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     price = db.Column(db.Numeric(10, 2), nullable=False)
     category_id = db.Column(db.String(100))
     image_url = db.Column(db.String(500))  # URL изображения в S3
+    image_variants = db.Column(db.JSON)  # {ширина: {формат: URL}}, строится в фоне
+    image_variants_status = db.Column(db.String(20))  # pending, ready, failed, skipped
     stock_quantity = db.Column(db.Integer, default=0)
+    stock_shards = db.Column(db.Integer, default=0, nullable=False)  # >0: остаток хранится в InventoryShard
     is_active = db.Column(db.Boolean, default=True)
     created_by = db.Column(db.Integer, db.ForeignKey('user.user_id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    shards = db.relationship('InventoryShard', cascade='all, delete-orphan')
+
     def __repr__(self):
         return f'<Product {self.name}>'
 
     def to_dict(self):
-        return {
-            'product_id': self.product_id,
-            'name': self.name,
-            'description': self.description,
-            'price': float(self.price),
-            'category_id': self.category_id,
-            'image_url': self.image_url,
-            'stock_quantity': self.stock_quantity,
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
-        }
+        # Локальный импорт: read_model_service сам импортирует модели
+        from app.services.read_model_service import ADMIN_PRODUCT
+        return ADMIN_PRODUCT.dump(self)
+
+class InventoryShard(db.Model):
+    """Часть остатка "горячего" товара: заказы списывают со случайного шарда"""
+    product_id = db.Column(db.Integer, db.ForeignKey('product.product_id', ondelete='CASCADE'), primary_key=True)
+    shard_no = db.Column(db.Integer, primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<InventoryShard {self.product_id}:{self.shard_no}>'
 
 class OrderProducts(db.Model):
     order_id = db.Column(db.Integer, db.ForeignKey('order.order_id'), primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('product.product_id'), primary_key=True)
     quantity = db.Column(db.Integer, default=1)
 
+    order = db.relationship('Order', back_populates='items')
+    product = db.relationship('Product')
+
 class Payment(db.Model):
+    __table_args__ = (
+        db.Index('ix_payment_order_id', 'order_id'),
+        db.Index('ix_payment_status_created', 'status', 'created_at', 'payment_id'),
+    )
+
     payment_id = db.Column(db.String(100), primary_key=True)  # ID платежа в YooMoney
     order_id = db.Column(db.Integer, db.ForeignKey('order.order_id'))
     user_id = db.Column(db.Integer, db.ForeignKey('user.user_id'))
@@ -90,23 +143,26 @@ class Payment(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     paid_at = db.Column(db.DateTime)
+    last_checked_at = db.Column(db.DateTime)  # последняя сверка статуса с YooKassa
+
+    order = db.relationship('Order', back_populates='payments')
 
     def __repr__(self):
         return f'<Payment {self.payment_id}>'
 
     def to_dict(self):
-        return {
-            'payment_id': self.payment_id,
-            'order_id': self.order_id,
-            'user_id': self.user_id,
-            'amount': float(self.amount),
-            'currency': self.currency,
-            'status': self.status,
-            'payment_method': self.payment_method,
-            'payment_details': self.payment_details,
-            'error_code': self.error_code,
-            'error_description': self.error_description,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat(),
-            'paid_at': self.paid_at.isoformat() if self.paid_at else None
-        }
\ No newline at end of file
+        from app.services.read_model_service import PAYMENT
+        return PAYMENT.dump(self)
+
+class IdempotencyRecord(db.Model):
+    """Сохраненный ответ на запрос с заголовком Idempotency-Key"""
+    key = db.Column(db.String(64), primary_key=True)  # sha256(пользователь, метод, путь, ключ)
+    fingerprint = db.Column(db.String(64), nullable=False)  # sha256 тела запроса
+    status_code = db.Column(db.SmallInteger)  # NULL, пока первый запрос выполняется
+    response_body = db.Column(db.LargeBinary)
+    mimetype = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # конец аренды, пока запрос выполняется; затем — срок хранения ответа
+
+    def __repr__(self):
+        return f'<IdempotencyRecord {self.key}>'
@@ -1,22 +1,22 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, abort, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models import User, Product, Order, OrderProducts
 from ..extensions import db
-from functools import wraps
+from ..services.catalog_service import parse_catalog_params, get_catalog_page, product_validator
+from ..services.conditional_service import conditional_response, make_etag
+from ..services.cache_service import catalog_cache, cached_json_response
+from ..services.order_service import parse_order_filters, get_orders_page
+from ..services.inventory_service import set_stock, enable_sharding, disable_sharding
+from ..services.principal_service import admin_required
+from ..services.image_service import image_pipeline
+from ..services.export_service import EXPORTS, FORMATS, generate_export
+from ..services import import_service
+from ..services import read_model_service as read_models
+from ..services.read_model_service import ADMIN_ORDER, ADMIN_ORDER_ITEM, ADMIN_PRODUCT
+from ..services.bulk_service import bulk_change_order_status, bulk_adjust_products
 
 admin_bp = Blueprint('admin', __name__)
 
-def admin_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user or user.role != 'admin':
-            return jsonify({"msg": "Admin access required"}), 403
-        return f(*args, **kwargs)
-    return decorated_function
-
 @admin_bp.route('/admin', methods=['GET'])
 @jwt_required()
 @admin_required
@@ -53,6 +53,8 @@ def create_product():
         
         db.session.add(new_product)
         db.session.commit()
+        catalog_cache.bump_version()
+        image_pipeline.enqueue(new_product.product_id, new_product.image_url)
         
         return jsonify({
             "msg": "Product created successfully",
@@ -79,14 +81,18 @@ def update_product(product_id):
             product.price = data['price']
         if 'category_id' in data:
             product.category_id = data['category_id']
+        image_changed = 'image_url' in data and data['image_url'] != product.image_url
         if 'image_url' in data:
             product.image_url = data['image_url']
         if 'stock_quantity' in data:
-            product.stock_quantity = data['stock_quantity']
+            set_stock(product, data['stock_quantity'])
         if 'is_active' in data:
             product.is_active = data['is_active']
             
         db.session.commit()
+        catalog_cache.bump_version()
+        if image_changed:
+            image_pipeline.enqueue(product.product_id, product.image_url)
         
         return jsonify({
             "msg": "Product updated successfully",
@@ -106,73 +112,187 @@ def delete_product(product_id):
     try:
         db.session.delete(product)
         db.session.commit()
+        catalog_cache.bump_version()
         return jsonify({"msg": "Product deleted successfully"})
     except Exception as e:
         db.session.rollback()
         return jsonify({"msg": str(e)}), 400
 
+@admin_bp.route('/admin/products/<int:product_id>/shards', methods=['POST'])
+@jwt_required()
+@admin_required
+def set_product_shards(product_id):
+    data = request.get_json() or {}
+    Product.query.get_or_404(product_id)
+
+    try:
+        shards = int(data.get('shards', 0))
+        if shards > 0:
+            enable_sharding(product_id, shards)
+        else:
+            disable_sharding(product_id)
+        catalog_cache.bump_version()
+        return jsonify({"msg": "Product stock sharding updated", "shards": shards})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"msg": str(e)}), 400
+
 @admin_bp.route('/products', methods=['GET'])
 @jwt_required()
 @admin_required
 def get_products():
-    products = Product.query.all()
-    return jsonify({
-        "products": [product.to_dict() for product in products]
-    })
+    try:
+        params = parse_catalog_params(request.args)
+        fields = ADMIN_PRODUCT.parse_fields(request.args.get('fields'))
+        params_key = tuple(sorted(params.items())) + (fields,)
+
+        def build_payload():
+            rows, next_cursor = get_catalog_page(params, ADMIN_PRODUCT.columns(fields))
+            return {
+                "products": [ADMIN_PRODUCT.serialize(row, fields) for row in rows],
+                "next_cursor": next_cursor
+            }
+
+        return cached_json_response(('admin_products', params_key), build_payload)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
 
 @admin_bp.route('/products/<int:product_id>', methods=['GET'])
 @jwt_required()
 @admin_required
 def get_product(product_id):
-    product = Product.query.get_or_404(product_id)
-    return jsonify(product.to_dict())
+    try:
+        fields = ADMIN_PRODUCT.parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    last_modified = product_validator(product_id)
+    if last_modified is None:
+        return jsonify({"msg": "Product not found"}), 404
+    etag = make_etag('product', product_id, last_modified, fields)
+    return conditional_response(
+        etag, last_modified,
+        lambda: cached_json_response(
+            ('product', product_id, etag),
+            lambda: read_models.get_product(product_id, fields) or abort(404)
+        )
+    )
+
+@admin_bp.route('/admin/export/<resource>', methods=['GET'])
+@jwt_required()
+@admin_required
+def export(resource):
+    """
+    Потоковая выгрузка products, orders, users или payments в NDJSON или CSV
+    """
+    fmt = request.args.get('format', 'ndjson')
+    if resource not in EXPORTS:
+        return jsonify({"msg": "Unknown export"}), 404
+    if fmt not in FORMATS:
+        return jsonify({"msg": "Format must be ndjson or csv"}), 400
+
+    response = Response(
+        stream_with_context(generate_export(resource, fmt)),
+        mimetype=FORMATS[fmt]
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename={resource}.{fmt}'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@admin_bp.route('/admin/products/import', methods=['POST'])
+@jwt_required()
+@admin_required
+def import_products():
+    """
+    Массовый импорт товаров из CSV или NDJSON: файл в поле file или тело запроса.
+    Upsert по sku, а без него — по (name, category_id).
+    """
+    upload = request.files.get('file')
+    fmt = request.args.get('format')
+    if not fmt:
+        name = upload.filename if upload else ''
+        fmt = 'ndjson' if name.endswith(('.ndjson', '.jsonl')) or 'ndjson' in (request.mimetype or '') else 'csv'
+    if fmt not in import_service.FORMATS:
+        return jsonify({"msg": "Format must be csv or ndjson"}), 400
+
+    report = import_service.import_from_stream(
+        upload.stream if upload else request.stream,
+        fmt,
+        created_by=get_jwt_identity(),
+        dry_run=request.args.get('dry_run', '').lower() in ('1', 'true', 'yes')
+    )
+    return jsonify(report)
+
+@admin_bp.route('/admin/products/bulk', methods=['POST'])
+@jwt_required()
+@admin_required
+def bulk_update_products():
+    """
+    Сдвиги цены и остатка у списка товаров одной транзакцией
+    """
+    try:
+        summary = bulk_adjust_products(request.get_json() or {})
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    return jsonify(summary)
+
+@admin_bp.route('/admin/cache/stats', methods=['GET'])
+@jwt_required()
+@admin_required
+def cache_stats():
+    return jsonify(catalog_cache.stats())
 
 @admin_bp.route('/admin/orders', methods=['GET'])
 @jwt_required()
 @admin_required
 def get_orders():
-    orders = Order.query.all()
-    orders_data = []
-    for order in orders:
-        order_data = {
-            "order_id": order.order_id,
-            "user_id": order.user_id,
-            "status": order.status,
-            "payment_status": order.payment_status,
-            "created_at": order.created_at,
-            "total_amount": str(order.total_amount)
-        }
-
-        order_products = OrderProducts.query.filter_by(order_id=order.order_id).all()
-        products = []
-        for order_product in order_products:
-            product = Product.query.get(order_product.product_id)
-            if product:
-                products.append({
-                    "product_id": product.product_id,
-                    "name": product.name,
-                    "price": str(product.price),
-                    "quantity": order_product.quantity
-                })
-
-        order_data["products"] = products
-        orders_data.append(order_data)
+    try:
+        params = parse_order_filters(request.args)
+        fields = ADMIN_ORDER.parse_fields(request.args.get('fields'))
+        rows, next_cursor = get_orders_page(params, ADMIN_ORDER.columns(fields))
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
 
     return jsonify({
-        "orders": orders_data
+        "orders": read_models.serialize_orders(rows, fields, ADMIN_ORDER, ADMIN_ORDER_ITEM),
+        "next_cursor": next_cursor
     })
 
+@admin_bp.route('/admin/orders/bulk-status', methods=['POST'])
+@jwt_required()
+@admin_required
+def bulk_change_status():
+    """
+    Смена статуса у списка заказов (order_ids / orders с updated_at) или по filter
+    """
+    try:
+        summary = bulk_change_order_status(request.get_json() or {})
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    return jsonify(summary)
+
 @admin_bp.route('/admin/change_order_status/<int:order_id>', methods=['POST'])
 @jwt_required()
 @admin_required
 def change_order_status(order_id):
-    data = request.get_json()
+    """
+    Смена статуса одного заказа — те же правила, что и у bulk-status:
+    отмена возвращает товар на склад, из cancelled — только с from_status
+    """
+    data = request.get_json() or {}
+    body = {'status': data.get('status'), 'from_status': data.get('from_status')}
+    if data.get('updated_at') is not None:
+        body['orders'] = [{'order_id': order_id, 'updated_at': data['updated_at']}]
+    else:
+        body['order_ids'] = [order_id]
+    try:
+        result = bulk_change_order_status(body)['results'][str(order_id)]
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
 
-    order = Order.query.get(order_id)
-    if not order:
+    if result == 'not_found':
         return jsonify({"msg": "Order not found"}), 404
-
-    order.status = data.get('status', order.status)
-    db.session.commit()
-
+    if result == 'insufficient_stock':
+        return jsonify({"msg": "Not enough stock to restore the order"}), 409
+    if result in ('conflict', 'no_version'):
+        return jsonify({"msg": "Order status cannot be changed", "result": result}), 409
     return jsonify({"msg": "Order status updated"}), 200
\ No newline at end of file
@@ -1,15 +1,24 @@
 from typing import Dict, Any, Tuple, Union
 from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity, get_jwt
 from ..models import User
 from ..extensions import db
-from app.services.yandex_auth import YandexAuthService
+from app.services.yandex_auth import UNAVAILABLE, YandexAuthService
+from app.services.principal_service import role_claims
+from app.services.token_service import REFRESH_TOKEN_EXPIRES, remember_tokens, revoke_token, session_claims
+from app.services.password_service import PasswordHasherBusyError, password_hasher, verify_and_update
 from datetime import datetime, timedelta
 
 auth_bp = Blueprint('auth', __name__)
 yandex_auth = YandexAuthService()
 
+def init_yandex_auth(app):
+    yandex_auth.init_app(app)
+
+@auth_bp.errorhandler(PasswordHasherBusyError)
+def password_hasher_busy(e):
+    return jsonify({"msg": "Too many authentication requests, try again later"}), 503
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     data = request.get_json()
@@ -28,7 +37,7 @@ def register():
 
     new_user = User(
         email=email,
-        password=generate_password_hash(password),
+        password=password_hasher.hash(password),
         username=username,
         first_name=first_name,
         last_name=last_name,
@@ -37,10 +46,11 @@ def register():
     db.session.add(new_user)
     db.session.commit()
 
-    access_token = create_access_token(identity=str(new_user.user_id), expires_delta=timedelta(days=7))
-    refresh_token = create_refresh_token(identity=str(new_user.user_id), expires_delta=timedelta(days=30))
+    sid_claims = session_claims()
+    access_token = create_access_token(identity=str(new_user.user_id), additional_claims={**role_claims(new_user), **sid_claims}, expires_delta=timedelta(days=7))
+    refresh_token = create_refresh_token(identity=str(new_user.user_id), additional_claims=sid_claims, expires_delta=REFRESH_TOKEN_EXPIRES)
     
-    new_user.update_tokens(access_token, refresh_token)
+    remember_tokens(new_user, access_token, refresh_token)
 
     return jsonify({
         "msg": "User registered successfully",
@@ -66,11 +76,12 @@ def login():
         return jsonify({"msg": "Missing email or password"}), 400
 
     user = User.query.filter_by(email=email).first()
-    if user and check_password_hash(user.password, password):
-        access_token = create_access_token(identity=str(user.user_id), expires_delta=timedelta(days=7))
-        refresh_token = create_refresh_token(identity=str(user.user_id), expires_delta=timedelta(days=30))
+    if verify_and_update(user, password):
+        sid_claims = session_claims()
+        access_token = create_access_token(identity=str(user.user_id), additional_claims={**role_claims(user), **sid_claims}, expires_delta=timedelta(days=7))
+        refresh_token = create_refresh_token(identity=str(user.user_id), additional_claims=sid_claims, expires_delta=REFRESH_TOKEN_EXPIRES)
         
-        user.update_tokens(access_token, refresh_token)
+        remember_tokens(user, access_token, refresh_token)
 
         return jsonify({
             "msg": "Login successful",
@@ -97,8 +108,8 @@ def refresh():
     if not user:
         return jsonify({"msg": "User not found"}), 404
 
-    access_token = create_access_token(identity=str(user.user_id), expires_delta=timedelta(days=7))
-    user.update_tokens(access_token, user.refresh_token)
+    access_token = create_access_token(identity=str(user.user_id), additional_claims={**role_claims(user), **session_claims(get_jwt())}, expires_delta=timedelta(days=7))
+    remember_tokens(user, access_token, user.refresh_token)
 
     return jsonify({
         "access_token": access_token,
@@ -112,6 +123,13 @@ def refresh():
         }
     })
 
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required(verify_type=False)
+def logout():
+    # Отзывается и сессия токена: парный refresh/access-токен тоже перестает работать
+    revoke_token(get_jwt())
+    return jsonify({"msg": "Token revoked"})
+
 @auth_bp.route('/auth/yandex/callback', methods=['POST'])
 def yandex_callback() -> Tuple[Dict[str, Any], int]:
     data: Dict[str, Any] = request.get_json()
@@ -130,6 +148,8 @@ def yandex_callback() -> Tuple[Dict[str, Any], int]:
         if not token_response or not isinstance(token_response, dict):
             return jsonify({'error': 'Yandex did not return a valid response'}), 500
         if 'error' in token_response:
+            if token_response['error'] == UNAVAILABLE:
+                return jsonify({'error': 'Yandex is temporarily unavailable'}), 503
             if token_response['error'] == 'invalid_grant':
                 return jsonify({'error': 'Wrong authorization code received from YaID'}), 400
             elif token_response['error'] == 'bad_verification_code':
@@ -137,6 +157,8 @@ def yandex_callback() -> Tuple[Dict[str, Any], int]:
             return jsonify({'error': token_response['error']}), 400
         access_token: str = token_response['access_token']
         user_info: Dict[str, Any] = yandex_auth.get_user_info(access_token)
+        if user_info.get('error') == UNAVAILABLE:
+            return jsonify({'error': 'Yandex is temporarily unavailable'}), 503
         email = user_info.get('default_email')
         user = User.query.filter_by(email=email).first()
         if not user:
@@ -183,6 +205,8 @@ def yandex_register():
             return jsonify({'error': 'Yandex did not return a valid response'}), 500
             
         if 'error' in token_response:
+            if token_response['error'] == UNAVAILABLE:
+                return jsonify({'error': 'Yandex is temporarily unavailable'}), 503
             if token_response['error'] == 'invalid_grant':
                 return jsonify({'error': 'Wrong authorization code received from YaID'}), 400
             elif token_response['error'] == 'bad_verification_code':
@@ -191,6 +215,8 @@ def yandex_register():
             
         access_token = token_response['access_token']
         user_info = yandex_auth.get_user_info(access_token)
+        if user_info.get('error') == UNAVAILABLE:
+            return jsonify({'error': 'Yandex is temporarily unavailable'}), 503
         
         email = user_info.get('default_email')
         if not email:
@@ -204,7 +230,7 @@ def yandex_register():
         # Создаем нового пользователя
         new_user = User(
             email=email,
-            password=generate_password_hash(password),
+            password=password_hasher.hash(password),
             first_name=user_info.get('first_name'),
             last_name=user_info.get('last_name'),
             yandex_id=user_info.get('id'),
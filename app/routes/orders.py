@@ -2,25 +2,21 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models import Order, Product, OrderProducts, User, Payment
 from ..extensions import db
+from ..services.order_service import with_items, user_orders_validator, order_validator
+from ..services import read_model_service as read_models
+from ..services.read_model_service import ORDER, ORDER_DETAIL
+from ..services.conditional_service import conditional_response, make_etag
+from ..services.reservation_service import new_hold, release_hold
+from ..services.idempotency_service import idempotent
+from ..services.inventory_service import InsufficientStockError, aggregate_quantities, reserve_stock, release_stock
 from datetime import datetime
 from typing import Dict, Any, List
-from functools import wraps
 
 orders_bp = Blueprint('orders', __name__)
 
-def admin_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user or user.role != 'admin':
-            return jsonify({"msg": "Admin access required"}), 403
-        return f(*args, **kwargs)
-    return decorated_function
-
 @orders_bp.route('/orders', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_order():
     """
     Создание нового заказа
@@ -35,50 +31,38 @@ def create_order():
         return jsonify({"msg": "Invalid order details"}), 400
 
     try:
-        total_amount = 0
-        products = Product.query.filter(Product.product_id.in_(product_ids)).all()
-        
-        if len(products) != len(product_ids):
+        requested = aggregate_quantities(product_ids, quantities)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    try:
+        products = {
+            p.product_id: p
+            for p in Product.query.filter(Product.product_id.in_(requested.keys())).all()
+        }
+        if len(products) != len(requested):
             return jsonify({"msg": "Some products not found"}), 404
 
-        # Проверяем наличие товаров
-        for i, product in enumerate(products):
-            if product.stock_quantity < quantities[i]:
-                return jsonify({
-                    "msg": f"Not enough stock for product {product.name}",
-                    "product_id": product.product_id,
-                    "available": product.stock_quantity,
-                    "requested": quantities[i]
-                }), 400
-
-        # Создаем заказ
+        # Списываем остатки атомарно в той же транзакции, что и заказ
+        reserve_stock(requested, shards={
+            pid: p.stock_shards for pid, p in products.items() if p.stock_shards
+        })
+
+        total_amount = sum(products[pid].price * quantity for pid, quantity in requested.items())
         order = Order(
             user_id=current_user_id,
             status='pending',
             payment_status='pending',
-            total_amount=0
+            total_amount=total_amount
         )
+        order.items = [
+            OrderProducts(product_id=pid, quantity=quantity)
+            for pid, quantity in requested.items()
+        ]
+        order.hold = new_hold()
         db.session.add(order)
         db.session.commit()
 
-        # Добавляем товары в заказ
-        for i, product in enumerate(products):
-            quantity = quantities[i]
-            total_amount += float(product.price) * quantity
-            
-            # Уменьшаем количество товара на складе
-            product.stock_quantity -= quantity
-            
-            order_product = OrderProducts(
-                order_id=order.order_id,
-                product_id=product.product_id,
-                quantity=quantity
-            )
-            db.session.add(order_product)
-
-        order.total_amount = total_amount
-        db.session.commit()
-
         return jsonify({
             "msg": "Order created successfully",
             "order": {
@@ -90,6 +74,16 @@ def create_order():
             }
         }), 201
 
+    except InsufficientStockError as e:
+        product_name = products[e.product_id].name
+        db.session.rollback()
+        return jsonify({
+            "msg": f"Not enough stock for product {product_name}",
+            "product_id": e.product_id,
+            "available": e.available,
+            "requested": e.requested
+        }), 400
+
     except Exception as e:
         db.session.rollback()
         return jsonify({"msg": str(e)}), 400
@@ -101,32 +95,16 @@ def get_user_orders():
     Получение списка заказов пользователя
     """
     current_user_id = get_jwt_identity()
-    orders = Order.query.filter_by(user_id=current_user_id).all()
-    
-    orders_data = []
-    for order in orders:
-        order_products = OrderProducts.query.filter_by(order_id=order.order_id).all()
-        products_data = []
-        
-        for op in order_products:
-            product = Product.query.get(op.product_id)
-            products_data.append({
-                "product_id": product.product_id,
-                "name": product.name,
-                "price": float(product.price),
-                "quantity": op.quantity
-            })
-            
-        orders_data.append({
-            "order_id": order.order_id,
-            "total_amount": float(order.total_amount),
-            "status": order.status,
-            "payment_status": order.payment_status,
-            "created_at": order.created_at.isoformat(),
-            "products": products_data
-        })
-    
-    return jsonify({"orders": orders_data})
+    try:
+        fields = ORDER.parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    parts, last_modified = user_orders_validator(current_user_id)
+
+    def build_response():
+        return jsonify({"orders": read_models.get_user_orders(current_user_id, fields)})
+
+    return conditional_response(make_etag('orders', current_user_id, parts, fields), last_modified, build_response)
 
 @orders_bp.route('/orders/<int:order_id>', methods=['GET'])
 @jwt_required()
@@ -135,33 +113,22 @@ def get_order(order_id: int):
     Получение информации о конкретном заказе
     """
     current_user_id = get_jwt_identity()
-    order = Order.query.get_or_404(order_id)
-    
-    order_products = OrderProducts.query.filter_by(order_id=order_id).all()
-    products_data = []
-    
-    for op in order_products:
-        product = Product.query.get(op.product_id)
-        products_data.append({
-            "product_id": product.product_id,
-            "name": product.name,
-            "price": float(product.price),
-            "quantity": op.quantity
-        })
-    
-    # Получаем информацию о платеже, если он есть
-    payment = Payment.query.filter_by(order_id=order_id).first()
-    payment_data = payment.to_dict() if payment else None
-    
-    return jsonify({
-        "order_id": order.order_id,
-        "total_amount": float(order.total_amount),
-        "status": order.status,
-        "payment_status": order.payment_status,
-        "created_at": order.created_at.isoformat(),
-        "products": products_data,
-        "payment": payment_data
-    })
+    try:
+        fields = ORDER_DETAIL.parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    validator = order_validator(order_id)
+    if validator is None:
+        return jsonify({"msg": "Order not found"}), 404
+    parts, last_modified = validator
+
+    def build_response():
+        order = read_models.get_order(order_id, fields)
+        if order is None:
+            return jsonify({"msg": "Order not found"}), 404
+        return jsonify(order)
+
+    return conditional_response(make_etag('order', order_id, parts, fields), last_modified, build_response)
 
 @orders_bp.route('/orders/<int:order_id>/cancel', methods=['POST'])
 @jwt_required()
@@ -170,20 +137,30 @@ def cancel_order(order_id: int):
     Отмена заказа
     """
     current_user_id = get_jwt_identity()
-    order = Order.query.get_or_404(order_id)
+    order = with_items(Order.query.filter_by(order_id=order_id)).first_or_404()
     
     # Проверяем, можно ли отменить заказ
     if order.status not in ['pending', 'processing']:
         return jsonify({"msg": "Order cannot be cancelled"}), 400
     
     try:
+        # Меняем статус условно, чтобы параллельная отмена не вернула товары дважды
+        table = Order.__table__
+        result = db.session.execute(
+            table.update()
+            .where(table.c.order_id == order_id, table.c.status.in_(['pending', 'processing']))
+            .values(status='cancelled')
+        )
+        if result.rowcount != 1:
+            db.session.rollback()
+            return jsonify({"msg": "Order cannot be cancelled"}), 400
+
         # Возвращаем товары на склад
-        order_products = OrderProducts.query.filter_by(order_id=order_id).all()
-        for op in order_products:
-            product = Product.query.get(op.product_id)
-            product.stock_quantity += op.quantity
-        
-        order.status = 'cancelled'
+        release_stock(
+            ((op.product_id, op.quantity) for op in order.items),
+            shards={op.product_id: op.product.stock_shards for op in order.items if op.product and op.product.stock_shards}
+        )
+        release_hold(order_id)
         db.session.commit()
         
         return jsonify({"msg": "Order cancelled successfully"})
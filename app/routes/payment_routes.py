@@ -3,6 +3,13 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.services.payment_service import PaymentService
 from app.extensions import db
 from app.models import Order, Payment, User
+from app.services.payment_status_service import (
+    TERMINAL_STATUSES, apply_payment_status, claim_refresh, parse_provider_datetime
+)
+from app.services.idempotency_service import idempotent
+from yookassa.domain.common import SecurityHelper
+from yookassa.domain.notification import WebhookNotificationFactory
+from decimal import Decimal
 from datetime import datetime
 from typing import Dict, Any
 
@@ -14,6 +21,7 @@ def init_payment_service(app):
 
 @payment_bp.route('/create', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_payment():
     """
     Создает новый платеж для заказа
@@ -89,19 +97,16 @@ def get_payment_status(payment_id: str):
     payment = Payment.query.filter_by(payment_id=payment_id).first_or_404()
     
     try:
-        payment_info = payment_service.verify_payment(payment_id)
-        
-        if payment_info:
-            payment.status = payment_info['status']
-            
-            if payment_info['status'] == 'succeeded':
-                payment.paid_at = datetime.utcnow()
-                order = Order.query.get(payment.order_id)
-                if order:
-                    order.payment_status = 'succeeded'
-                    order.status = 'processing'
-            
-            db.session.commit()
+        # Статус обновляется вебхуком; к провайдеру ходим не чаще раза в интервал
+        if payment.status not in TERMINAL_STATUSES and claim_refresh(payment_id):
+            payment_info = payment_service.verify_payment(payment_id)
+            if payment_info and apply_payment_status(
+                payment_id,
+                payment_info['status'],
+                parse_provider_datetime(payment_info.get('captured_at'))
+            ):
+                db.session.commit()
+                db.session.refresh(payment)
             
         return jsonify({
             'payment_id': payment.payment_id,
@@ -114,6 +119,49 @@ def get_payment_status(payment_id: str):
         })
         
     except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@payment_bp.route('/webhook', methods=['POST'])
+def payment_webhook():
+    """
+    Принимает уведомления YooKassa об изменении статуса платежа
+    """
+    if current_app.config['YOOMONEY_WEBHOOK_VERIFY_IP'] and not SecurityHelper().is_ip_trusted(request.remote_addr):
+        return jsonify({'error': 'Untrusted source'}), 403
+
+    try:
+        notification = WebhookNotificationFactory().create(request.get_json(force=True))
+        payment_object = notification.object
+    except Exception:
+        return jsonify({'error': 'Invalid notification'}), 400
+
+    if not notification.event.startswith('payment.'):
+        return jsonify({'status': 'ignored'})
+
+    payment = Payment.query.filter_by(payment_id=payment_object.id).first()
+    if not payment:
+        # Платеж мог еще не сохраниться — YooKassa повторит доставку
+        return jsonify({'error': 'Payment not found'}), 404
+
+    if (Decimal(str(payment_object.amount.value)) != payment.amount
+            or payment_object.amount.currency != payment.currency):
+        current_app.logger.error(f"Webhook amount mismatch for payment {payment.payment_id}")
+        return jsonify({'error': 'Amount mismatch'}), 400
+
+    try:
+        changed = apply_payment_status(
+            payment.payment_id,
+            payment_object.status,
+            parse_provider_datetime(getattr(payment_object, 'captured_at', None))
+        )
+        db.session.commit()
+        return jsonify({'status': 'applied' if changed else 'duplicate'})
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @payment_bp.route('/<string:payment_id>/cancel', methods=['POST'])
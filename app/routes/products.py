@@ -2,7 +2,16 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models import Product, User
 from ..extensions import db
-from ..services.file_service import save_file
+from ..services.storage_service import store_image
+from ..services.catalog_service import parse_catalog_params, get_catalog_page, catalog_validator
+from ..services.conditional_service import conditional_response, make_etag
+from ..services.read_model_service import CATALOG
+from ..services.cache_service import catalog_cache, cached_json_response
+from ..services.search_service import search_service
+from ..services.inventory_service import set_stock
+from ..services.principal_service import admin_required
+from ..services.image_service import image_pipeline
+from ..services.upload_service import UploadError, complete_upload, create_presigned_upload, direct_uploads_enabled
 from werkzeug.utils import secure_filename
 import os
 
@@ -16,24 +25,49 @@ def allowed_file(filename):
 @products_bp.route('/products', methods=['GET'])
 @jwt_required()
 def get_products():
-    products = Product.query.all()
-    return jsonify({
-        "products": [{
-            "product_id": p.product_id,
-            "name": p.name,
-            "price": str(p.price),
-            "image_url": p.image_url
-        } for p in products]
-    })
+    try:
+        params = parse_catalog_params(request.args)
+        fields = CATALOG.parse_fields(request.args.get('fields'))
+        params_key = tuple(sorted(params.items())) + (fields,)
+
+        def build_payload():
+            rows, next_cursor = get_catalog_page(params, CATALOG.columns(fields))
+            return {
+                "products": [CATALOG.serialize(row, fields) for row in rows],
+                "next_cursor": next_cursor
+            }
+
+        count, last_modified = catalog_validator()
+        etag = make_etag('products', params_key, count, last_modified)
+        # ETag в ключе кэша: тело всегда соответствует выданному валидатору
+        return conditional_response(
+            etag, last_modified,
+            lambda: cached_json_response(('products', params_key, etag), build_payload)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@products_bp.route('/products/search', methods=['GET'])
+@jwt_required()
+def search_products():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Query parameter q is required'}), 400
+
+    try:
+        limit = int(request.args.get('limit', search_service.default_limit))
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+
+    return cached_json_response(
+        ('search', query.lower(), limit),
+        lambda: {"query": query, "products": search_service.search(query, limit)}
+    )
 
 @products_bp.route('/products', methods=['POST'])
 @jwt_required()
+@admin_required
 def create_product():
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user or user.role != 'admin':
-        return jsonify({'error': 'Admin access required'}), 403
-
     # Проверяем наличие файла
     if 'image' not in request.files:
         return jsonify({'error': 'Image file is required'}), 400
@@ -54,7 +88,7 @@ def create_product():
 
     try:
         # Сохраняем изображение
-        image_url = save_file(file)
+        image_url = store_image(file)
         
         # Создаем продукт
         product = Product(
@@ -65,6 +99,8 @@ def create_product():
         
         db.session.add(product)
         db.session.commit()
+        catalog_cache.bump_version()
+        image_pipeline.enqueue(product.product_id, image_url)
         
         return jsonify({
             'msg': 'Product created',
@@ -77,11 +113,8 @@ def create_product():
 
 @products_bp.route('/products/<int:product_id>', methods=['PUT'])
 @jwt_required()
+@admin_required
 def update_product(product_id):
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user or user.role != 'admin':
-        return jsonify({'error': 'Admin access required'}), 403
     product = Product.query.get_or_404(product_id)
     data = request.get_json()
     name = data.get('name')
@@ -93,19 +126,59 @@ def update_product(product_id):
     if price is not None:
         product.price = price
     if stock_quantity is not None:
-        product.stock_quantity = stock_quantity
+        set_stock(product, stock_quantity)
 
     db.session.commit()
+    catalog_cache.bump_version()
     return jsonify({'msg': 'Product updated'})
 
 @products_bp.route('/products/<int:product_id>', methods=['DELETE'])
 @jwt_required()
+@admin_required
 def delete_product(product_id):
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user or user.role != 'admin':
-        return jsonify({'error': 'Admin access required'}), 403
     product = Product.query.get_or_404(product_id)
     db.session.delete(product)
     db.session.commit()
-    return jsonify({'msg': 'Product deleted'})
\ No newline at end of file
+    catalog_cache.bump_version()
+    return jsonify({'msg': 'Product deleted'})
+
+@products_bp.route('/products/<int:product_id>/image/upload-url', methods=['POST'])
+@jwt_required()
+@admin_required
+def create_image_upload_url(product_id):
+    """
+    Подписанный URL для загрузки изображения напрямую в S3, минуя воркер
+    """
+    if not direct_uploads_enabled():
+        return jsonify({'error': 'Direct uploads require S3 storage'}), 400
+    Product.query.get_or_404(product_id)
+    data = request.get_json() or {}
+    filename = data.get('filename')
+    if not filename:
+        return jsonify({'error': 'Filename required'}), 400
+    try:
+        upload = create_presigned_upload(product_id, filename, data.get('size'), data.get('method', 'post'))
+    except UploadError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(upload)
+
+@products_bp.route('/products/<int:product_id>/image/complete', methods=['POST'])
+@jwt_required()
+@admin_required
+def complete_image_upload(product_id):
+    """
+    Привязывает загруженный напрямую объект к товару
+    """
+    if not direct_uploads_enabled():
+        return jsonify({'error': 'Direct uploads require S3 storage'}), 400
+    product = Product.query.get_or_404(product_id)
+    data = request.get_json() or {}
+    try:
+        image_url = complete_upload(product_id, data.get('key'))
+    except UploadError as e:
+        return jsonify({'error': str(e)}), 400
+    product.image_url = image_url
+    db.session.commit()
+    catalog_cache.bump_version()
+    image_pipeline.enqueue(product_id, image_url)
+    return jsonify({'msg': 'Product image updated', 'image_url': image_url})
@@ -0,0 +1,330 @@
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional
+
+from flask import current_app
+from sqlalchemy import Boolean, DateTime, Integer, Numeric, bindparam, tuple_
+from werkzeug.datastructures import MultiDict
+
+from app.extensions import db
+from app.models import Order, Product, StockHold
+from app.services.cache_service import catalog_cache
+from app.services.inventory_service import InsufficientStockError, release_stock, reserve_stock
+from app.services.order_service import parse_order_filters
+from app.services.reservation_service import new_hold, release_orders_stock, reserve_orders_stock
+
+# Статусы, из которых заказ можно отменить с возвратом товара (как в cancel_order)
+CANCELLABLE_STATUSES = ('pending', 'processing')
+
+
+def _parse_version(value: Any) -> Optional[datetime]:
+    """
+    Ожидаемое значение updated_at для оптимистической проверки
+    """
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError("Invalid updated_at")
+
+
+def _parse_order_targets(data: Dict[str, Any]) -> Dict[int, Optional[datetime]]:
+    """
+    order_ids: [1, 2] или orders: [{"order_id": 1, "updated_at": "..."}]
+    """
+    targets: Dict[int, Optional[datetime]] = {}
+    for order_id in data.get('order_ids') or []:
+        if not isinstance(order_id, int):
+            raise ValueError("order_ids must be integers")
+        targets[order_id] = None
+    for item in data.get('orders') or []:
+        if not isinstance(item, dict) or not isinstance(item.get('order_id'), int):
+            raise ValueError("Each order must have an integer order_id")
+        targets[item['order_id']] = _parse_version(item.get('updated_at'))
+    return targets
+
+
+def bulk_change_order_status(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Меняет статус у списка заказов или у заказов под фильтром.
+
+    Все изменения — один условный UPDATE ... RETURNING в одной транзакции:
+    заказ меняется, только если его текущий статус разрешен (from_status)
+    и, если передан updated_at, версия совпадает. При отмене товар
+    возвращается на склад, а резервы снимаются так же, как в cancel_order.
+    Из cancelled заказ выводится, только если cancelled явно указан
+    в from_status: его позиции списываются со склада заново.
+    Возвращает сводку по каждому id: updated, unchanged, conflict, not_found,
+    no_version (у заказа нет updated_at, версию не проверить),
+    insufficient_stock (отмененный заказ не восстановить).
+    """
+    status = data.get('status')
+    if not isinstance(status, str) or not status or len(status) > 50:
+        raise ValueError("Invalid status")
+    from_status = data.get('from_status')
+    if from_status is not None and (not isinstance(from_status, list) or not from_status):
+        raise ValueError("from_status must be a non-empty list")
+    if status == 'cancelled':
+        # Отмена возвращает товар на склад, поэтому только из CANCELLABLE_STATUSES
+        from_status = [s for s in (from_status or CANCELLABLE_STATUSES) if s in CANCELLABLE_STATUSES]
+        if not from_status:
+            raise ValueError(f"Orders can be cancelled only from: {', '.join(CANCELLABLE_STATUSES)}")
+
+    max_rows = current_app.config['BULK_MAX_ROWS']
+    table = Order.__table__
+    if 'filter' in data:
+        if not isinstance(data['filter'], dict):
+            raise ValueError("filter must be an object")
+        params = parse_order_filters(MultiDict(
+            {key: value for key, value in data['filter'].items() if value is not None}
+        ))
+        conditions = []
+        if params['status']:
+            conditions.append(table.c.status == params['status'])
+        if params['payment_status']:
+            conditions.append(table.c.payment_status == params['payment_status'])
+        if params['user_id'] is not None:
+            conditions.append(table.c.user_id == params['user_id'])
+        if params['date_from']:
+            conditions.append(table.c.created_at >= params['date_from'])
+        if params['date_to']:
+            conditions.append(table.c.created_at < params['date_to'])
+        if not conditions:
+            raise ValueError("filter must not be empty")
+        targets = {
+            order_id: None for order_id in db.session.execute(
+                db.select(table.c.order_id).where(*conditions).order_by(table.c.order_id).limit(max_rows + 1)
+            ).scalars()
+        }
+    else:
+        targets = _parse_order_targets(data)
+    if not targets:
+        raise ValueError("No orders selected")
+    if len(targets) > max_rows:
+        raise ValueError(f"At most {max_rows} orders per request")
+
+    # Отмененный заказ уже вернул товар на склад: без повторного списания
+    # его нельзя оживить, поэтому из cancelled — только по явному from_status
+    revive = status != 'cancelled' and from_status is not None and 'cancelled' in from_status
+    guards = [table.c.status != status, table.c.status != 'cancelled']
+    if from_status is not None:
+        guards.append(table.c.status.in_(from_status))
+    unversioned = [order_id for order_id, version in targets.items() if version is None]
+    versioned = [(order_id, version) for order_id, version in targets.items() if version is not None]
+    selectors = []
+    if unversioned:
+        selectors.append(table.c.order_id.in_(unversioned))
+    if versioned:
+        selectors.append(tuple_(table.c.order_id, table.c.updated_at).in_(versioned))
+
+    updated = db.session.execute(
+        table.update()
+        .where(db.or_(*selectors), *guards)
+        .values(status=status)
+        .returning(table.c.order_id)
+    ).scalars().all()
+
+    if status == 'cancelled' and updated:
+        release_orders_stock(updated)
+        db.session.execute(StockHold.__table__.delete().where(StockHold.order_id.in_(updated)))
+
+    results: Dict[int, str] = {}
+    if revive:
+        updated.extend(_revive_orders(targets, status, selectors, results))
+    db.session.commit()
+
+    # Почему остальные не изменились — одним запросом
+    updated_set = set(updated)
+    rest = [order_id for order_id in targets if order_id not in updated_set]
+    current = {
+        order_id: (order_status, updated_at) for order_id, order_status, updated_at in db.session.execute(
+            db.select(table.c.order_id, table.c.status, table.c.updated_at).where(table.c.order_id.in_(rest))
+        )
+    } if rest else {}
+    for order_id, version in targets.items():
+        if order_id in results:
+            continue
+        if order_id in updated_set:
+            results[order_id] = 'updated'
+        elif order_id not in current:
+            results[order_id] = 'not_found'
+        elif current[order_id][0] == status:
+            results[order_id] = 'unchanged'
+        elif version is not None and current[order_id][1] is None:
+            # Заказ создан до появления updated_at: версию сравнить не с чем
+            results[order_id] = 'no_version'
+        else:
+            results[order_id] = 'conflict'
+    return _summary(results)
+
+
+def _revive_orders(targets: Dict[int, Optional[datetime]], status: str, selectors,
+                   results: Dict[int, str]) -> List[int]:
+    """
+    Выводит заказы из cancelled с повторным списанием их позиций.
+    Каждый заказ — в своей точке сохранения: при нехватке товара он
+    остается отмененным, остальные восстанавливаются.
+    """
+    table = Order.__table__
+    candidates = db.session.execute(
+        db.select(table.c.order_id).where(db.or_(*selectors), table.c.status == 'cancelled')
+    ).scalars().all()
+    revived = []
+    for order_id in sorted(candidates):
+        version = targets[order_id]
+        nested = db.session.begin_nested()
+        try:
+            result = db.session.execute(
+                table.update()
+                .where(table.c.order_id == order_id, table.c.status == 'cancelled',
+                       *([table.c.updated_at == version] if version is not None else []))
+                .values(status=status)
+            )
+            if result.rowcount != 1:
+                nested.rollback()
+                continue
+            reserve_orders_stock([order_id])
+            if status == 'pending':
+                # Снова неоплаченный — снова под резервом с истечением
+                hold = new_hold()
+                hold.order_id = order_id
+                db.session.add(hold)
+                db.session.flush()
+            nested.commit()
+            revived.append(order_id)
+        except InsufficientStockError:
+            nested.rollback()
+            results[order_id] = 'insufficient_stock'
+    return revived
+
+
+def _parse_delta(item: Dict[str, Any], key: str, parse) -> Any:
+    if item.get(key) is None:
+        return None
+    try:
+        return parse(str(item[key]))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"Invalid {key} for product {item.get('product_id')}")
+
+
+def bulk_adjust_products(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Применяет сдвиги цены и остатка к списку товаров:
+    items: [{"product_id": 1, "price_delta": "-10.00", "stock_delta": 5, "updated_at": "..."}].
+
+    Обычные товары меняются одним executemany-UPDATE: строка обновляется,
+    только если версия совпала (если передана), а цена и остаток не уходят
+    в минус. Шардированные остатки идут через списание/возврат по шардам.
+    Все в одной транзакции. Итог по id: updated, conflict, out_of_range,
+    insufficient_stock, not_found.
+    """
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        raise ValueError("items must be a non-empty list")
+    max_rows = current_app.config['BULK_MAX_ROWS']
+    if len(items) > max_rows:
+        raise ValueError(f"At most {max_rows} products per request")
+
+    rows: Dict[int, Dict[str, Any]] = {}
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get('product_id'), int):
+            raise ValueError("Each item must have an integer product_id")
+        price_delta = _parse_delta(item, 'price_delta', Decimal)
+        stock_delta = _parse_delta(item, 'stock_delta', int)
+        if price_delta is None and stock_delta is None:
+            raise ValueError(f"Nothing to change for product {item['product_id']}")
+        if price_delta is not None and not price_delta.is_finite():
+            raise ValueError(f"Invalid price_delta for product {item['product_id']}")
+        rows[item['product_id']] = {
+            'pid': item['product_id'],
+            'price_delta': price_delta or Decimal('0'),
+            'stock_delta': stock_delta or 0,
+            'expected': _parse_version(item.get('updated_at'))
+        }
+
+    table = Product.__table__
+    shards: Dict[int, int] = {}
+    # Исходная версия шардированных товаров: если остаток не спишется,
+    # товар возвращается к ней целиком, вместе с updated_at
+    original_versions: Dict[int, Optional[datetime]] = {}
+    for product_id, stock_shards, updated_at in db.session.execute(
+        db.select(table.c.product_id, table.c.stock_shards, table.c.updated_at)
+        .where(table.c.product_id.in_(list(rows)), table.c.stock_shards > 0)
+    ):
+        shards[product_id] = stock_shards
+        original_versions[product_id] = updated_at
+
+    # Один executemany-UPDATE с проверкой версии и неотрицательности. Всем строкам
+    # ставится одна метка updated_at — по ней одним SELECT видно, какие обновились.
+    # Остаток шардированных товаров меняется отдельно, здесь у них — только цена.
+    stamp = datetime.utcnow()
+    new_price = table.c.price + bindparam('price_delta', type_=Numeric(10, 2))
+    new_stock = table.c.stock_quantity + bindparam('stock_delta', type_=Integer)
+    db.session.execute(
+        table.update()
+        .where(table.c.product_id == bindparam('pid'),
+               db.or_(bindparam('check', type_=Boolean) == db.false(),
+                      table.c.updated_at == bindparam('expected', type_=DateTime)),
+               new_price >= 0,
+               new_stock >= 0)
+        .values(price=new_price, stock_quantity=new_stock, updated_at=stamp),
+        [{
+            'pid': row['pid'],
+            'price_delta': row['price_delta'],
+            'stock_delta': 0 if row['pid'] in shards else row['stock_delta'],
+            'check': row['expected'] is not None,
+            'expected': row['expected']
+        } for row in rows.values()]
+    )
+    current = dict(db.session.execute(
+        db.select(table.c.product_id, table.c.updated_at).where(table.c.product_id.in_(list(rows)))
+    ).all())
+    updated = {product_id for product_id, updated_at in current.items() if updated_at == stamp}
+
+    results: Dict[int, str] = {}
+    for product_id, shard_count in shards.items():
+        delta = rows[product_id]['stock_delta']
+        if product_id not in updated or not delta:
+            continue
+        nested = db.session.begin_nested()
+        try:
+            if delta > 0:
+                release_stock([(product_id, delta)], shards={product_id: shard_count})
+            else:
+                reserve_stock({product_id: -delta}, shards={product_id: shard_count})
+            nested.commit()
+        except InsufficientStockError:
+            nested.rollback()
+            # Цена уже изменена общим UPDATE — возвращаем ее и прежний updated_at
+            # (явное значение не дает onupdate выдать товару новую версию)
+            db.session.execute(
+                table.update().where(table.c.product_id == product_id)
+                .values(price=table.c.price - rows[product_id]['price_delta'],
+                        updated_at=original_versions[product_id])
+            )
+            updated.discard(product_id)
+            results[product_id] = 'insufficient_stock'
+    db.session.commit()
+    if updated:
+        catalog_cache.bump_version()
+
+    for product_id, row in rows.items():
+        if product_id in results:
+            continue
+        if product_id in updated:
+            results[product_id] = 'updated'
+        elif product_id not in current:
+            results[product_id] = 'not_found'
+        elif row['expected'] is not None and current[product_id] != row['expected']:
+            results[product_id] = 'conflict'
+        else:
+            results[product_id] = 'out_of_range'
+    return _summary(results)
+
+
+def _summary(results: Dict[int, str]) -> Dict[str, Any]:
+    counts: Dict[str, int] = {}
+    for result in results.values():
+        counts[result] = counts.get(result, 0) + 1
+    return {'counts': counts, 'results': {str(key): value for key, value in results.items()}}
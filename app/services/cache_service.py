@@ -0,0 +1,146 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+
+
+class LRUCache:
+    """
+    Процессный LRU-кэш с TTL и версией.
+
+    Ключи хранятся вместе с версией: bump_version() делает недоступными
+    все ранее закэшированные значения (для каталога — после любой записи).
+    Версия локальна для процесса, поэтому устаревание между воркерами
+    ограничено TTL.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clear()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get((self.version, key))
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < now:
+                del self._data[(self.version, key)]
+                self.misses += 1
+                return None
+            self._data.move_to_end((self.version, key))
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, version: Optional[int] = None) -> None:
+        """
+        version — версия кэша на момент чтения данных для value: если с тех пор
+        был bump_version(), значение уже может быть устаревшим и не сохраняется
+        """
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            full_key = (self.version, key)
+            self._data[full_key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(full_key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop((self.version, key), None)
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        # Версия до промаха: запись и bump_version() во время factory() не дадут
+        # сохранить старые данные под новой версией
+        version = self.version
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.set(key, value, version=version)
+        return value
+
+    def bump_version(self) -> int:
+        """
+        Инвалидирует все значения: старые ключи больше не совпадут
+        """
+        with self._lock:
+            self.version += 1
+            self._data.clear()
+            return self.version
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'version': self.version,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / total if total else 0.0
+            }
+
+
+catalog_cache = LRUCache()
+
+
+def init_catalog_cache(app) -> None:
+    catalog_cache.configure(app.config['CATALOG_CACHE_SIZE'], app.config['CATALOG_CACHE_TTL'])
+
+
+def invalidate_catalog_on_commit() -> None:
+    """
+    Сбросит кэш каталога после коммита текущей транзакции. Для записей
+    в обход маршрутов каталога (списание остатков при заказе, отмена,
+    истечение резерва): сброс до коммита позволил бы параллельному
+    запросу снова закэшировать еще не измененные данные.
+    """
+    db.session.info['catalog_dirty'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_catalog_after_commit(session) -> None:
+    # Фиксация точки сохранения еще не видна другим — ждем внешнюю транзакцию
+    if session.in_nested_transaction():
+        return
+    if session.info.pop('catalog_dirty', False):
+        catalog_cache.bump_version()
+
+
+def cached_json_response(key: Hashable, build_payload: Callable[[], Any]):
+    """
+    Возвращает JSON-ответ из кэша каталога, при промахе строит и сериализует payload
+    """
+    body = catalog_cache.get_or_set(key, lambda: current_app.json.dumps(build_payload()) + '\n')
+    response = current_app.response_class(body, mimetype=current_app.json.mimetype)
+    # По ключу compression_service кэширует сжатые варианты тела
+    response.catalog_cache_key = key
+    return response
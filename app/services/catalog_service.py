@@ -0,0 +1,181 @@
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import and_, func, or_
+
+from app.extensions import db
+from app.models import Product
+
+SORT_COLUMNS = {
+    'created_at': Product.created_at,
+    'price': Product.price,
+}
+
+
+def _parse_bool(value: Optional[str]) -> Optional[bool]:
+    if value is None:
+        return None
+    value = value.strip().lower()
+    if value in ('1', 'true', 'yes'):
+        return True
+    if value in ('0', 'false', 'no'):
+        return False
+    raise ValueError(f"Invalid boolean value: {value}")
+
+
+def _parse_decimal(value: Optional[str], name: str) -> Optional[Decimal]:
+    if value is None or value == '':
+        return None
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"Invalid {name}")
+
+
+def encode_cursor(sort: str, order: str, key: Any, product_id: int) -> str:
+    """
+    Кодирует позицию последней записи страницы в непрозрачный токен
+    """
+    if isinstance(key, datetime):
+        key = key.isoformat()
+    elif isinstance(key, Decimal):
+        key = str(key)
+    payload = json.dumps({'s': sort, 'o': order, 'k': key, 'id': product_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token: str, sort: str, order: str) -> Tuple[Any, int]:
+    """
+    Разбирает токен курсора и возвращает (значение ключа сортировки, product_id)
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload['s'] != sort or payload['o'] != order:
+            raise ValueError("Cursor does not match sort order")
+        key = payload['k']
+        if sort == 'created_at':
+            key = datetime.fromisoformat(key)
+        else:
+            key = Decimal(key)
+        return key, int(payload['id'])
+    except (KeyError, TypeError, ValueError, InvalidOperation, json.JSONDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+def parse_catalog_params(args) -> Dict[str, Any]:
+    """
+    Разбирает query-параметры листинга каталога.
+    Бросает ValueError при некорректных значениях.
+    """
+    sort = args.get('sort', 'created_at')
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"Unsupported sort: {sort}")
+    order = args.get('order', 'desc' if sort == 'created_at' else 'asc')
+    if order not in ('asc', 'desc'):
+        raise ValueError(f"Unsupported order: {order}")
+
+    default_limit = current_app.config['CATALOG_PAGE_SIZE']
+    max_limit = current_app.config['CATALOG_MAX_PAGE_SIZE']
+    try:
+        limit = int(args.get('limit', default_limit))
+    except ValueError:
+        raise ValueError("Invalid limit")
+    limit = max(1, min(limit, max_limit))
+
+    return {
+        'sort': sort,
+        'order': order,
+        'limit': limit,
+        'cursor': args.get('cursor'),
+        'category_id': args.get('category_id'),
+        'is_active': _parse_bool(args.get('is_active')),
+        'min_price': _parse_decimal(args.get('min_price'), 'min_price'),
+        'max_price': _parse_decimal(args.get('max_price'), 'max_price'),
+        'in_stock': _parse_bool(args.get('in_stock')),
+    }
+
+
+def build_catalog_query(params: Dict[str, Any]):
+    """
+    Строит запрос к Product с фильтрами и keyset-условием по (ключ сортировки, product_id).
+    Стоимость любой страницы одинакова: позиция задается курсором, а не OFFSET.
+    """
+    sort, order = params['sort'], params['order']
+    sort_column = SORT_COLUMNS[sort]
+    query = Product.query
+
+    if params['category_id'] is not None:
+        query = query.filter(Product.category_id == params['category_id'])
+    if params['is_active'] is not None:
+        query = query.filter(Product.is_active == params['is_active'])
+    if params['min_price'] is not None:
+        query = query.filter(Product.price >= params['min_price'])
+    if params['max_price'] is not None:
+        query = query.filter(Product.price <= params['max_price'])
+    if params['in_stock'] is True:
+        query = query.filter(Product.stock_quantity > 0)
+    elif params['in_stock'] is False:
+        query = query.filter(or_(Product.stock_quantity <= 0, Product.stock_quantity.is_(None)))
+
+    if params['cursor']:
+        key, last_id = decode_cursor(params['cursor'], sort, order)
+        if order == 'desc':
+            query = query.filter(or_(
+                sort_column < key,
+                and_(sort_column == key, Product.product_id < last_id)
+            ))
+        else:
+            query = query.filter(or_(
+                sort_column > key,
+                and_(sort_column == key, Product.product_id > last_id)
+            ))
+
+    if order == 'desc':
+        query = query.order_by(sort_column.desc(), Product.product_id.desc())
+    else:
+        query = query.order_by(sort_column.asc(), Product.product_id.asc())
+    return query
+
+
+def get_catalog_page(params: Dict[str, Any], columns: List[Any]) -> Tuple[List[Any], Optional[str]]:
+    """
+    Возвращает страницу товаров и токен следующей страницы (None, если страница последняя).
+    Выбираются только columns (см. read_model_service) — строки, а не объекты Product.
+    """
+    sort_column = SORT_COLUMNS[params['sort']]
+    rows = (
+        build_catalog_query(params)
+        .with_entities(*columns, sort_column.label('_sort_key'), Product.product_id.label('_product_id'))
+        .limit(params['limit'] + 1)
+        .all()
+    )
+    has_more = len(rows) > params['limit']
+    rows = rows[:params['limit']]
+
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        next_cursor = encode_cursor(params['sort'], params['order'], last._sort_key, last._product_id)
+    return rows, next_cursor
+
+
+def catalog_validator() -> Tuple[int, Optional[datetime]]:
+    """
+    Число товаров и max(updated_at): меняется при любой записи в каталог,
+    включая удаление. Один агрегатный запрос вместо построения страницы.
+    """
+    count, last_modified = db.session.execute(
+        db.select(func.count(Product.product_id), func.max(Product.updated_at))
+    ).one()
+    return count, last_modified
+
+
+def product_validator(product_id: int) -> Optional[datetime]:
+    return db.session.execute(
+        db.select(Product.updated_at).where(Product.product_id == product_id)
+    ).scalar()
@@ -0,0 +1,107 @@
+import gzip
+from typing import Optional
+
+from flask import request
+
+from app.services.cache_service import catalog_cache
+
+try:
+    import brotli
+except ImportError:  # Brotli не установлен — сжимаем только gzip
+    brotli = None
+
+# Текстовые типы, которые стоит сжимать; изображения и архивы уже сжаты
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/x-ndjson', 'application/javascript', 'application/xml',
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'text/javascript', 'text/xml', 'image/svg+xml',
+}
+SKIP_PATH_PREFIXES = ('/static/uploads/',)
+
+
+def available_encodings():
+    # Порядок — предпочтение сервера при равном q клиента
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encodings) -> Optional[str]:
+    """
+    Кодировка по Accept-Encoding; identity, если клиент не принимает ни одну (q=0 — запрет)
+    """
+    return accept_encodings.best_match(available_encodings())
+
+
+def compress(data: bytes, encoding: str, config) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=config['COMPRESS_BROTLI_LEVEL'])
+    # mtime=0: одинаковый вход дает одинаковые байты
+    return gzip.compress(data, compresslevel=config['COMPRESS_GZIP_LEVEL'], mtime=0)
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """
+    Сжатое представление — другой набор байтов, поэтому и сильный ETag у него свой
+    """
+    return f'{etag}-{encoding}'
+
+
+def matches_encoded_etag(if_none_match, etag: str) -> bool:
+    return any(if_none_match.contains(encoded_etag(etag, encoding)) for encoding in available_encodings())
+
+
+def _compressible(response, min_size: int) -> bool:
+    if response.status_code != 200 or response.direct_passthrough or response.is_streamed:
+        return False
+    if 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return False
+    if request.path.startswith(SKIP_PATH_PREFIXES):
+        return False
+    return response.content_length is not None and response.content_length >= min_size
+
+
+def init_compression(app) -> None:
+    """
+    Сжимает ответы gzip/brotli после обработки запроса.
+
+    Ответы меньше COMPRESS_MIN_SIZE, потоковые выгрузки, файлы и уже сжатые
+    типы отдаются как есть. Тела из кэша каталога (cached_json_response)
+    сжимаются один раз: байты каждой кодировки хранятся в том же кэше рядом
+    с несжатым телом, под ключом с ETag, и сбрасываются вместе с ним.
+    """
+    if not app.config['COMPRESS_ENABLED']:
+        return
+    min_size = app.config['COMPRESS_MIN_SIZE']
+
+    @app.after_request
+    def compress_response(response):
+        if response.mimetype in COMPRESSIBLE_MIMETYPES:
+            response.vary.add('Accept-Encoding')
+        etag, weak = response.get_etag()
+
+        if response.status_code == 304:
+            # 304 подтверждает то представление, ETag которого прислал клиент
+            if etag and request.if_none_match:
+                for encoding in available_encodings():
+                    if request.if_none_match.contains(encoded_etag(etag, encoding)):
+                        response.set_etag(encoded_etag(etag, encoding), weak)
+                        break
+            return response
+
+        if not _compressible(response, min_size):
+            return response
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        cache_key = getattr(response, 'catalog_cache_key', None)
+        if cache_key is not None:
+            body = catalog_cache.get_or_set(
+                ('compressed', cache_key, encoding),
+                lambda: compress(response.get_data(), encoding, app.config)
+            )
+        else:
+            body = compress(response.get_data(), encoding, app.config)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            response.set_etag(encoded_etag(etag, encoding), weak)
+        return response
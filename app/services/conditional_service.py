@@ -0,0 +1,58 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional
+
+from flask import current_app, request
+
+from app.services.compression_service import matches_encoded_etag
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Сильный ETag из дешевых признаков версии ресурса (max(updated_at), число строк, параметры)
+    """
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    # В БД время хранится наивным UTC; HTTP-даты имеют секундную точность.
+    # Берем конец секунды изменения (усечение + 1 с), чтобы дата не была раньше самого изменения
+    return value.replace(tzinfo=timezone.utc, microsecond=0) + timedelta(seconds=1)
+
+
+def _not_modified(etag: str, last_modified: Optional[datetime]) -> bool:
+    if request.if_none_match:
+        # If-None-Match приоритетнее If-Modified-Since (RFC 9110, 13.2.2)
+        # Клиент мог закэшировать сжатое представление с ETag вида "<etag>-gzip"
+        return request.if_none_match.contains(etag) or matches_encoded_etag(request.if_none_match, etag)
+    if request.if_modified_since and last_modified is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def _set_validators(response, etag: str, last_modified: Optional[datetime]):
+    response.set_etag(etag)
+    # Пока секунда last_modified не закончилась, в нее еще может попасть изменение
+    # с той же HTTP-датой — такой Last-Modified не отдаем, остается ETag
+    if last_modified is not None and last_modified <= datetime.now(timezone.utc):
+        response.last_modified = last_modified
+    # Данные персональные: хранить можно, но перед использованием — перепроверять
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Authorization')
+    return response
+
+
+def conditional_response(etag: str, last_modified: Optional[datetime], build_response: Callable[[], Any]):
+    """
+    Отвечает 304 по If-None-Match / If-Modified-Since, не строя тело;
+    иначе вызывает build_response и добавляет ETag и Last-Modified
+    """
+    last_modified = _as_utc(last_modified)
+    if _not_modified(etag, last_modified):
+        return _set_validators(current_app.response_class(status=304), etag, last_modified)
+    response = current_app.make_response(build_response())
+    if response.status_code != 200:
+        return response
+    return _set_validators(response, etag, last_modified)
@@ -0,0 +1,84 @@
+"""
+Локальная имитация Яндекс OAuth (oauth.yandex.ru/token и login.yandex.ru/info)
+для тестов и нагрузочных прогонов без сети.
+
+    python -m app.services.fake_yandex_oauth --port 8082 --latency 0.05
+
+и YANDEX_OAUTH_URL=http://localhost:8082, YANDEX_LOGIN_URL=http://localhost:8082
+в окружении приложения. Любой код вида "<email>" обменивается на токен
+пользователя с этим email; код "expired" имитирует просроченный код.
+"""
+import argparse
+import random
+import threading
+import time
+import uuid
+
+from flask import Flask, jsonify, request
+
+
+def create_fake_app(latency: float = 0.0, error_rate: float = 0.0) -> Flask:
+    """
+    latency: искусственная задержка ответа, секунды
+    error_rate: доля ответов 503 (для проверки повторов и предохранителя)
+    """
+    app = Flask(__name__)
+    tokens = {}
+    lock = threading.Lock()
+    app.config['stats'] = {'token': 0, 'info': 0}
+
+    @app.before_request
+    def simulate_network():
+        if latency:
+            time.sleep(latency)
+        if error_rate and random.random() < error_rate:
+            return jsonify({'error': 'internal_error'}), 503
+
+    @app.route('/token', methods=['POST'])
+    def token():
+        app.config['stats']['token'] += 1
+        code = request.form.get('code', '')
+        if request.form.get('grant_type') != 'authorization_code' or not code:
+            return jsonify({'error': 'invalid_request'}), 400
+        if code == 'expired':
+            return jsonify({'error': 'bad_verification_code'}), 400
+        access_token = uuid.uuid4().hex
+        with lock:
+            tokens[access_token] = code
+        return jsonify({'access_token': access_token, 'token_type': 'bearer', 'expires_in': 31536000})
+
+    @app.route('/info', methods=['GET'])
+    def info():
+        app.config['stats']['info'] += 1
+        header = request.headers.get('Authorization', '')
+        with lock:
+            email = tokens.get(header[len('OAuth '):]) if header.startswith('OAuth ') else None
+        if email is None:
+            return jsonify({'error': 'invalid_token'}), 401
+        login = email.split('@')[0]
+        return jsonify({
+            'id': str(uuid.uuid5(uuid.NAMESPACE_DNS, email).int % 10 ** 9),
+            'login': login,
+            'default_email': email,
+            'emails': [email],
+            'first_name': login.capitalize(),
+            'last_name': 'Test'
+        })
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8082)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    app = create_fake_app(args.latency, args.error_rate)
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
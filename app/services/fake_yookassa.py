@@ -0,0 +1,143 @@
+"""
+Локальная имитация API YooKassa для тестов и нагрузочных прогонов без сети.
+
+    python -m app.services.fake_yookassa --port 8081 --settle-after 5 --latency 0.05
+
+и YOOMONEY_API_URL=http://localhost:8081/v3 в окружении приложения.
+"""
+import argparse
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from flask import Flask, abort, jsonify, request
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def create_fake_app(settle_after: float = 5.0, cancel_ratio: float = 0.1,
+                    latency: float = 0.0, error_rate: float = 0.0) -> Flask:
+    """
+    settle_after: через сколько секунд pending-платеж завершается
+    cancel_ratio: доля платежей, завершающихся отменой
+    latency: искусственная задержка ответа, секунды
+    error_rate: доля ответов 503 (для проверки повторов)
+    """
+    app = Flask(__name__)
+    payments = {}
+    created_at = {}
+    idempotency = {}
+    lock = threading.Lock()
+
+    def settle(payment_id):
+        payment = payments[payment_id]
+        if payment['status'] == 'pending' and time.monotonic() - created_at[payment_id] >= settle_after:
+            if random.random() < cancel_ratio:
+                payment['status'] = 'canceled'
+                payment['cancellation_details'] = {'party': 'yoo_money', 'reason': 'expired_on_confirmation'}
+            else:
+                payment['status'] = 'succeeded'
+                payment['paid'] = True
+                payment['captured_at'] = _now()
+        return payment
+
+    @app.before_request
+    def simulate_network():
+        if latency:
+            time.sleep(latency)
+        if error_rate and random.random() < error_rate:
+            return jsonify({'type': 'error', 'code': 'internal_server_error'}), 503
+
+    @app.route('/v3/payments', methods=['POST'])
+    def create_payment():
+        key = request.headers.get('Idempotence-Key')
+        data = request.get_json(force=True)
+        with lock:
+            if key and key in idempotency:
+                return jsonify(payments[idempotency[key]])
+            payment_id = str(uuid.uuid4())
+            payments[payment_id] = {
+                'id': payment_id,
+                'status': 'pending',
+                'paid': False,
+                'amount': data['amount'],
+                'confirmation': {
+                    'type': 'redirect',
+                    'confirmation_url': f'{request.host_url}checkout/{payment_id}'
+                },
+                'created_at': _now(),
+                'description': data.get('description'),
+                'metadata': data.get('metadata', {}),
+                'recipient': {'account_id': '1', 'gateway_id': '1'},
+                'refundable': False,
+                'test': True
+            }
+            created_at[payment_id] = time.monotonic()
+            if key:
+                idempotency[key] = payment_id
+            return jsonify(payments[payment_id])
+
+    @app.route('/v3/payments/<payment_id>', methods=['GET'])
+    def get_payment(payment_id):
+        with lock:
+            if payment_id not in payments:
+                return jsonify({'type': 'error', 'code': 'not_found', 'description': 'Payment not found'}), 404
+            return jsonify(settle(payment_id))
+
+    @app.route('/v3/payments/<payment_id>/cancel', methods=['POST'])
+    def cancel_payment(payment_id):
+        with lock:
+            if payment_id not in payments:
+                abort(404)
+            payment = payments[payment_id]
+            if payment['status'] in ('pending', 'waiting_for_capture'):
+                payment['status'] = 'canceled'
+            return jsonify(payment)
+
+    @app.route('/fake/payments', methods=['POST'])
+    def seed_payments():
+        """
+        Создает count платежей сразу — для нагрузочных прогонов сверки.
+        status — начальный статус (например, неизвестный приложению)
+        """
+        data = request.get_json(force=True)
+        count = int(data.get('count', 1))
+        status = data.get('status', 'pending')
+        ids = []
+        with lock:
+            for _ in range(count):
+                payment_id = str(uuid.uuid4())
+                payments[payment_id] = {
+                    'id': payment_id, 'status': status, 'paid': False,
+                    'amount': {'value': '100.00', 'currency': 'RUB'},
+                    'created_at': _now(), 'metadata': {},
+                    'recipient': {'account_id': '1', 'gateway_id': '1'},
+                    'refundable': False, 'test': True
+                }
+                created_at[payment_id] = time.monotonic()
+                ids.append(payment_id)
+        return jsonify({'ids': ids})
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--settle-after', type=float, default=5.0)
+    parser.add_argument('--cancel-ratio', type=float, default=0.1)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    app = create_fake_app(args.settle_after, args.cancel_ratio, args.latency, args.error_rate)
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class CircuitOpenError(Exception):
+    """Внешний сервис временно отключен предохранителем"""
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для внешнего сервиса.
+
+    После failure_threshold ошибок подряд вызовы отклоняются сразу
+    в течение reset_timeout секунд, затем пропускается один пробный вызов:
+    успех замыкает цепь, ошибка снова размыкает ее. Пробный вызов, не
+    вернувший результат за reset_timeout, считается потерянным, и
+    пропускается следующий.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+        self._probe_started_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return 'closed'
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.opened_at is None:
+                return
+            now = time.monotonic()
+            probe_pending = self._probe_in_flight and now - self._probe_started_at < self.reset_timeout
+            if now - self.opened_at < self.reset_timeout or probe_pending:
+                raise CircuitOpenError('Circuit is open')
+            self._probe_in_flight = True
+            self._probe_started_at = now
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._probe_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+def create_session(pool_size: int, retries: int, backoff: float) -> requests.Session:
+    """
+    Session с пулом соединений и повторами.
+
+    Повторы по статусам 502/503/504 и ошибкам чтения — только для GET;
+    ошибки соединения повторяются для любых методов, так как запрос
+    до сервера не дошел.
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({'GET', 'HEAD'}),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
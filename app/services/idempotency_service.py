@@ -0,0 +1,154 @@
+import hashlib
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models import IdempotencyRecord
+
+HEADER = 'Idempotency-Key'
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha256('\x1f'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _replay(record: IdempotencyRecord):
+    response = current_app.response_class(
+        record.response_body, status=record.status_code, mimetype=record.mimetype
+    )
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _acquire(key: str, fingerprint: str):
+    """
+    Занимает ключ: вставляет запись «в работе» с коротким сроком аренды
+    IDEMPOTENCY_LEASE или перехватывает просроченную запись (истекший ответ
+    или аренда упавшего воркера). Возвращает created_at записи — метку
+    владельца, либо None, если ключ занят.
+    """
+    now = datetime.utcnow()
+    lease = now + timedelta(seconds=current_app.config['IDEMPOTENCY_LEASE'])
+    try:
+        db.session.add(IdempotencyRecord(key=key, fingerprint=fingerprint, created_at=now, expires_at=lease))
+        db.session.commit()
+        return now
+    except IntegrityError:
+        db.session.rollback()
+    table = IdempotencyRecord.__table__
+    taken = db.session.execute(
+        table.update()
+        .where(table.c.key == key, table.c.expires_at < now)
+        .values(fingerprint=fingerprint, created_at=now, expires_at=lease,
+                status_code=None, response_body=None, mimetype=None)
+    ).rowcount
+    db.session.commit()
+    return now if taken == 1 else None
+
+
+def _wait_for_result(key: str, fingerprint: str):
+    """
+    Ждет завершения параллельного запроса с тем же ключом и возвращает его ответ.
+    None — ключ свободен или просрочен, его можно занять.
+    """
+    deadline = time.monotonic() + current_app.config['IDEMPOTENCY_WAIT_TIMEOUT']
+    delay = 0.01
+    while True:
+        db.session.rollback()
+        record = db.session.get(IdempotencyRecord, key)
+        if record is None or record.expires_at < datetime.utcnow():
+            return None
+        if record.fingerprint != fingerprint:
+            return jsonify({"msg": f"{HEADER} was already used with a different request"}), 422
+        if record.status_code is not None:
+            return _replay(record)
+        if time.monotonic() >= deadline:
+            return jsonify({"msg": "A request with this Idempotency-Key is still in progress"}), 409
+        time.sleep(delay)
+        delay = min(delay * 2, 0.25)
+
+
+def idempotent(f):
+    """
+    Делает POST-обработчик идемпотентным по заголовку Idempotency-Key.
+
+    Первый запрос с ключом выполняет обработчик и сохраняет ответ,
+    повторы получают сохраненный ответ без повторного выполнения,
+    параллельные дубликаты ждут завершения первого. Ответы 5xx не сохраняются,
+    чтобы клиент мог повторить запрос. Незавершенный запрос держит ключ
+    только IDEMPOTENCY_LEASE секунд: если воркер упал, повтор после аренды
+    выполнится заново. Сохраненный ответ живет IDEMPOTENCY_TTL, просроченная
+    запись считается отсутствующей. Применяется после @jwt_required().
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        client_key = request.headers.get(HEADER)
+        if not client_key:
+            return f(*args, **kwargs)
+        if len(client_key) > 255:
+            return jsonify({"msg": f"{HEADER} is too long"}), 400
+
+        key = _digest(get_jwt_identity(), request.method, request.path, client_key)
+        fingerprint = _digest(request.get_data())
+
+        for _ in range(2):
+            owner = _acquire(key, fingerprint)
+            if owner is not None:
+                break
+            result = _wait_for_result(key, fingerprint)
+            if result is not None:
+                return result
+            # Первый запрос завершился ошибкой или его аренда истекла — пробуем выполнить сами
+        else:
+            return jsonify({"msg": "A request with this Idempotency-Key is still in progress"}), 409
+
+        table = IdempotencyRecord.__table__
+        # Запись меняет только владелец: после истечения аренды ключ мог перейти к повтору
+        owned = (table.c.key == key) & (table.c.created_at == owner)
+        try:
+            response = make_response(f(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            db.session.execute(table.delete().where(owned))
+            db.session.commit()
+            raise
+
+        if response.status_code >= 500:
+            db.session.execute(table.delete().where(owned))
+        else:
+            db.session.execute(
+                table.update()
+                .where(owned)
+                .values(status_code=response.status_code,
+                        response_body=response.get_data(),
+                        mimetype=response.mimetype,
+                        expires_at=datetime.utcnow() + timedelta(seconds=current_app.config['IDEMPOTENCY_TTL']))
+            )
+        db.session.commit()
+        return response
+    return decorated_function
+
+
+def purge_expired(batch_size: int = 1000) -> int:
+    """
+    Удаляет просроченные записи пачками по индексу expires_at
+    """
+    table = IdempotencyRecord.__table__
+    total = 0
+    while True:
+        keys = db.session.execute(
+            db.select(table.c.key)
+            .where(table.c.expires_at < datetime.utcnow())
+            .limit(batch_size)
+        ).scalars().all()
+        if not keys:
+            db.session.rollback()
+            return total
+        db.session.execute(table.delete().where(table.c.key.in_(keys)))
+        db.session.commit()
+        total += len(keys)
@@ -0,0 +1,171 @@
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from flask import current_app
+from werkzeug.datastructures import FileStorage
+
+from app.extensions import db
+from app.models import Product
+from app.services.cache_service import catalog_cache
+from app.services.s3_service import get_s3_client
+from app.services.storage_service import store_image
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow не установлен — производные не строятся
+    Image = None
+
+# Формат -> (параметры Pillow, расширение, Content-Type)
+FORMATS = {
+    'webp': ('WEBP', 'webp', 'image/webp'),
+    'jpeg': ('JPEG', 'jpg', 'image/jpeg'),
+    'avif': ('AVIF', 'avif', 'image/avif')
+}
+
+
+def _load_original(image_url: str) -> Optional[bytes]:
+    """
+    Читает оригинал из нашего хранилища; чужие URL не обрабатываются
+    """
+    if image_url.startswith('/static/uploads/'):
+        uploads = os.path.realpath(os.path.join(current_app.static_folder, 'uploads'))
+        path = os.path.realpath(os.path.join(current_app.static_folder, image_url[len('/static/'):]))
+        # image_url приходит от клиента: "../" и симлинки не должны выводить за пределы uploads
+        if os.path.commonpath([uploads, path]) != uploads:
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+    bucket_url = current_app.config['S3_BUCKET_URL'] + '/'
+    if current_app.config['S3_BUCKET'] and image_url.startswith(bucket_url):
+        response = get_s3_client().get_object(Bucket=current_app.config['S3_BUCKET'], Key=image_url[len(bucket_url):])
+        return response['Body'].read()
+    return None
+
+
+def build_variants(original: bytes) -> Dict[str, Dict[str, str]]:
+    """
+    Строит уменьшенные копии во всех форматах и сохраняет их в хранилище.
+    Результат: {"200": {"webp": url, "jpeg": url}, ...}. Увеличения нет:
+    ширины больше оригинала пропускаются.
+    """
+    quality = current_app.config['IMAGE_VARIANT_QUALITY']
+    with Image.open(io.BytesIO(original)) as source:
+        source = ImageOps.exif_transpose(source)
+        if source.mode not in ('RGB', 'RGBA'):
+            source = source.convert('RGBA' if 'transparency' in source.info else 'RGB')
+        variants = {}
+        for width in current_app.config['IMAGE_VARIANT_WIDTHS']:
+            if width > source.width and variants:
+                continue
+            resized = source.copy()
+            resized.thumbnail((width, width * 10), Image.LANCZOS)
+            urls = {}
+            for name in current_app.config['IMAGE_VARIANT_FORMATS']:
+                pil_format, extension, content_type = FORMATS[name]
+                image = resized.convert('RGB') if pil_format == 'JPEG' else resized
+                buffer = io.BytesIO()
+                image.save(buffer, pil_format, quality=quality, optimize=True)
+                buffer.seek(0)
+                urls[name] = store_image(
+                    FileStorage(buffer, filename=f'variant.{extension}', content_type=content_type),
+                    folder='products/variants'
+                )
+            variants[str(resized.width)] = urls
+    return variants
+
+
+def _set_variants(product_id: int, image_url: str, status: str, variants: Optional[Dict] = None) -> None:
+    # Условие по image_url: если картинку успели заменить, старый результат не записываем
+    table = Product.__table__
+    db.session.execute(
+        table.update()
+        .where(table.c.product_id == product_id, table.c.image_url == image_url)
+        .values(image_variants=variants, image_variants_status=status)
+    )
+    db.session.commit()
+    catalog_cache.bump_version()
+
+
+def process_image(product_id: int, image_url: str, max_attempts: int = 1, base_delay: float = 0) -> bool:
+    """
+    Строит производные для изображения товара с повторами при ошибках
+    """
+    for attempt in range(max_attempts):
+        try:
+            original = _load_original(image_url)
+            if original is None:
+                _set_variants(product_id, image_url, 'skipped')
+                return False
+            _set_variants(product_id, image_url, 'ready', build_variants(original))
+            return True
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.warning(
+                f"Image variants for product {product_id} failed (attempt {attempt + 1}): {str(e)}"
+            )
+            if attempt < max_attempts - 1:
+                time.sleep(base_delay * (2 ** attempt))
+    _set_variants(product_id, image_url, 'failed')
+    return False
+
+
+class ImagePipeline:
+    """
+    Фоновый пул построения производных изображений.
+
+    Pillow отпускает GIL при масштабировании и кодировании, поэтому
+    хватает потоков. Загрузка не ждет результата: товар получает статус
+    pending, а варианты появляются в выдаче после обработки. Задачи,
+    потерянные при перезапуске, и окончательно упавшие
+    перезапускаются командой `flask images regenerate`.
+    """
+
+    def __init__(self) -> None:
+        self.app = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def init_app(self, app) -> None:
+        self.app = app
+        if Image is None:
+            app.logger.warning("Pillow is not installed: image variants are disabled")
+            return
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config['IMAGE_PIPELINE_WORKERS'], thread_name_prefix='image-variants'
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self._executor is not None
+
+    def enqueue(self, product_id: int, image_url: Optional[str]) -> None:
+        """
+        Ставит задачу после коммита товара; возвращается сразу
+        """
+        if not self.enabled or not image_url:
+            return
+        _set_variants(product_id, image_url, 'pending')
+        self._executor.submit(self._run, product_id, image_url)
+
+    def _run(self, product_id: int, image_url: str) -> None:
+        with self.app.app_context():
+            try:
+                process_image(
+                    product_id,
+                    image_url,
+                    self.app.config['IMAGE_PIPELINE_MAX_ATTEMPTS'],
+                    self.app.config['IMAGE_PIPELINE_RETRY_DELAY']
+                )
+            finally:
+                db.session.remove()
+
+
+image_pipeline = ImagePipeline()
+
+
+def init_image_pipeline(app) -> None:
+    image_pipeline.init_app(app)
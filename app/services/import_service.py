@@ -0,0 +1,255 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import bindparam, tuple_
+
+from app.extensions import db
+from app.models import Product
+from app.services.cache_service import catalog_cache
+from app.services.inventory_service import set_stock
+
+FORMATS = ('csv', 'ndjson')
+# Поля, которые можно задать импортом; остальные колонки CSV игнорируются
+FIELDS = ('sku', 'name', 'description', 'price', 'category_id', 'image_url', 'stock_quantity', 'is_active')
+
+
+def _empty(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and value.strip() == '')
+
+
+def _parse_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    normalized = str(value).strip().lower()
+    if normalized in ('1', 'true', 'yes'):
+        return True
+    if normalized in ('0', 'false', 'no'):
+        return False
+    raise ValueError("Invalid is_active")
+
+
+def validate_row(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Приводит строку к значениям колонок Product. Отсутствующие и пустые
+    поля не попадают в результат, чтобы обновление их не затирало.
+    Бросает ValueError с описанием первой ошибки.
+    """
+    row: Dict[str, Any] = {}
+    for field in FIELDS:
+        if field in raw and not _empty(raw[field]):
+            value = raw[field]
+            row[field] = value.strip() if isinstance(value, str) else value
+
+    if 'name' not in row and 'sku' not in row:
+        raise ValueError("Missing name or sku")
+    if 'name' in row and len(str(row['name'])) > 100:
+        raise ValueError("Name is too long")
+    if 'sku' in row and len(str(row['sku'])) > 64:
+        raise ValueError("SKU is too long")
+    if 'price' in row:
+        try:
+            row['price'] = Decimal(str(row['price']))
+        except InvalidOperation:
+            raise ValueError("Invalid price")
+        if row['price'] < 0 or not row['price'].is_finite():
+            raise ValueError("Invalid price")
+    if 'stock_quantity' in row:
+        try:
+            row['stock_quantity'] = int(row['stock_quantity'])
+        except (TypeError, ValueError):
+            raise ValueError("Invalid stock_quantity")
+        if row['stock_quantity'] < 0:
+            raise ValueError("Invalid stock_quantity")
+    if 'is_active' in row:
+        row['is_active'] = _parse_bool(row['is_active'])
+    for field in ('sku', 'name', 'description', 'category_id', 'image_url'):
+        if field in row:
+            row[field] = str(row[field])
+    return row
+
+
+def read_records(stream, fmt: str) -> Iterator[Tuple[int, Any]]:
+    """
+    Читает бинарный поток построчно: (номер строки, сырая запись).
+    Для NDJSON невалидный JSON отдается как исключение в позиции записи.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_no, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError as e:
+            yield line_no, ValueError(f"Invalid JSON: {e}")
+
+
+def _natural_key(row: Dict[str, Any]) -> Tuple:
+    if 'sku' in row:
+        return ('sku', row['sku'])
+    return ('name', row['name'], row.get('category_id'))
+
+
+def _find_existing(rows: List[Dict[str, Any]]) -> Dict[Tuple, Tuple[int, int]]:
+    """
+    Существующие товары пачки по естественному ключу: два запроса на пачку
+    """
+    table = Product.__table__
+    existing: Dict[Tuple, Tuple[int, int]] = {}
+    skus = [row['sku'] for row in rows if 'sku' in row]
+    if skus:
+        for product_id, sku, shards in db.session.execute(
+            db.select(table.c.product_id, table.c.sku, table.c.stock_shards).where(table.c.sku.in_(skus))
+        ):
+            existing[('sku', sku)] = (product_id, shards)
+
+    names = {(row['name'], row.get('category_id')) for row in rows if 'sku' not in row}
+    with_category = [key for key in names if key[1] is not None]
+    without_category = [name for name, category in names if category is None]
+    conditions = []
+    if with_category:
+        conditions.append(tuple_(table.c.name, table.c.category_id).in_(with_category))
+    if without_category:
+        conditions.append(db.and_(table.c.name.in_(without_category), table.c.category_id.is_(None)))
+    if conditions:
+        for product_id, name, category_id, shards in db.session.execute(
+            db.select(table.c.product_id, table.c.name, table.c.category_id, table.c.stock_shards)
+            .where(db.or_(*conditions))
+            .order_by(table.c.product_id)
+        ):
+            # При дублях в каталоге обновляется самый старый товар
+            existing.setdefault(('name', name, category_id), (product_id, shards))
+    return existing
+
+
+def _write_batch(batch: List[Tuple[int, Dict[str, Any]]],
+                 created_by: Optional[int]) -> Tuple[int, int, List[Tuple[int, str]]]:
+    """
+    Одна пачка: executemany-INSERT новых и executemany-UPDATE существующих
+    (сгруппированных по набору заданных полей). Без коммита.
+    Возвращает (вставлено, обновлено, ошибки строк).
+    """
+    table = Product.__table__
+    # Повтор ключа внутри пачки: побеждает последняя строка
+    unique = list({_natural_key(row): (line_no, row) for line_no, row in batch}.values())
+    existing = _find_existing([row for _, row in unique])
+
+    inserts = []
+    updates: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+    sharded_stock = []
+    errors = []
+    updated = 0
+    for line_no, row in unique:
+        found = existing.get(_natural_key(row))
+        if found is None:
+            if 'name' not in row or 'price' not in row:
+                errors.append((line_no, "New product requires name and price"))
+                continue
+            inserts.append({
+                'sku': None, 'description': None, 'category_id': None, 'image_url': None,
+                'stock_quantity': 0, 'is_active': True, 'created_by': created_by, **row
+            })
+            continue
+        updated += 1
+        product_id, shards = found
+        values = {key: value for key, value in row.items() if key != 'sku'}
+        if shards and 'stock_quantity' in values:
+            sharded_stock.append((product_id, values.pop('stock_quantity')))
+        if values:
+            columns = tuple(sorted(values))
+            updates.setdefault(columns, []).append({'pid': product_id, **{f'v_{k}': v for k, v in values.items()}})
+
+    if inserts:
+        db.session.execute(table.insert(), inserts)
+    for columns, params in updates.items():
+        db.session.execute(
+            table.update()
+            .where(table.c.product_id == bindparam('pid'))
+            .values({column: bindparam(f'v_{column}') for column in columns}),
+            params
+        )
+    for product_id, quantity in sharded_stock:
+        # Шардированные остатки раскладываются по шардам — такие товары редки
+        set_stock(db.session.get(Product, product_id), quantity)
+    return len(inserts), updated, errors
+
+
+def import_products(records: Iterable[Tuple[int, Any]], batch_size: int,
+                    created_by: Optional[int] = None, dry_run: bool = False,
+                    max_errors: int = 1000) -> Dict[str, Any]:
+    """
+    Импортирует товары с upsert по SKU или, если его нет, по (name, category_id).
+
+    Строки валидируются на лету и пишутся пачками по batch_size, каждая
+    пачка — отдельная транзакция. Ошибочные строки пропускаются и попадают
+    в отчет (не больше max_errors записей), остальные импортируются.
+    """
+    report: Dict[str, Any] = {'rows': 0, 'inserted': 0, 'updated': 0, 'failed': 0, 'errors': []}
+
+    def fail(line_no: int, message: str) -> None:
+        report['failed'] += 1
+        if len(report['errors']) < max_errors:
+            report['errors'].append({'row': line_no, 'error': message})
+
+    def flush(batch: List[Tuple[int, Dict[str, Any]]]) -> None:
+        try:
+            inserted, updated, errors = _write_batch(batch, created_by)
+            if dry_run:
+                db.session.rollback()
+            else:
+                db.session.commit()
+            report['inserted'] += inserted
+            report['updated'] += updated
+            for line_no, message in errors:
+                fail(line_no, message)
+        except Exception as e:
+            db.session.rollback()
+            if len(batch) == 1:
+                fail(batch[0][0], str(e))
+                return
+            # Ошибка БД в пачке: делим пополам, чтобы найти виновные строки
+            middle = len(batch) // 2
+            flush(batch[:middle])
+            flush(batch[middle:])
+
+    batch: List[Tuple[int, Dict[str, Any]]] = []
+    for line_no, raw in records:
+        report['rows'] += 1
+        if isinstance(raw, Exception):
+            fail(line_no, str(raw))
+            continue
+        if not isinstance(raw, dict):
+            fail(line_no, "Record must be an object")
+            continue
+        try:
+            batch.append((line_no, validate_row(raw)))
+        except ValueError as e:
+            fail(line_no, str(e))
+            continue
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    if not dry_run and (report['inserted'] or report['updated']):
+        catalog_cache.bump_version()
+    return report
+
+
+def import_from_stream(stream, fmt: str, created_by: Optional[int] = None, dry_run: bool = False) -> Dict[str, Any]:
+    return import_products(
+        read_records(stream, fmt),
+        current_app.config['IMPORT_BATCH_SIZE'],
+        created_by=created_by,
+        dry_run=dry_run,
+        max_errors=current_app.config['IMPORT_MAX_ERRORS']
+    )
@@ -0,0 +1,274 @@
+import random
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam
+
+from app.extensions import db
+from app.models import InventoryShard, Product
+from app.services.cache_service import invalidate_catalog_on_commit
+
+
+class InsufficientStockError(Exception):
+    def __init__(self, product_id: int, requested: int, available: int) -> None:
+        super().__init__(f"Not enough stock for product {product_id}")
+        self.product_id = product_id
+        self.requested = requested
+        self.available = available
+
+
+def aggregate_quantities(product_ids: Iterable, quantities: Iterable) -> Dict[int, int]:
+    """
+    Сопоставляет товары и количества по позиции в запросе и суммирует повторы.
+    Бросает ValueError при некорректных значениях.
+    """
+    result: Dict[int, int] = {}
+    for product_id, quantity in zip(product_ids, quantities):
+        if isinstance(product_id, bool) or isinstance(quantity, bool):
+            raise ValueError("Invalid order details")
+        try:
+            product_id, quantity = int(product_id), int(quantity)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid order details")
+        if quantity <= 0:
+            raise ValueError("Quantity must be positive")
+        result[product_id] = result.get(product_id, 0) + quantity
+    return result
+
+
+def _split(total: int, parts: int) -> List[int]:
+    base, extra = divmod(max(total, 0), parts)
+    return [base + (1 if i < extra else 0) for i in range(parts)]
+
+
+def _shard_order(shard_count: int) -> List[int]:
+    # Случайный стартовый шард разводит параллельные заказы по разным строкам
+    start = random.randrange(shard_count)
+    return [(start + i) % shard_count for i in range(shard_count)]
+
+
+def _reserve_single(product_id: int, quantity: int) -> None:
+    table = Product.__table__
+    result = db.session.execute(
+        table.update()
+        .where(table.c.product_id == product_id, table.c.stock_quantity >= quantity)
+        .values(stock_quantity=table.c.stock_quantity - quantity)
+    )
+    if result.rowcount != 1:
+        available = db.session.execute(
+            db.select(table.c.stock_quantity).where(table.c.product_id == product_id)
+        ).scalar()
+        raise InsufficientStockError(product_id, quantity, available or 0)
+    invalidate_catalog_on_commit()
+
+
+def _reserve_sharded(product_id: int, quantity: int, shard_count: int) -> None:
+    table = InventoryShard.__table__
+    order = _shard_order(shard_count)
+
+    def take(shard_no: int, amount: int) -> bool:
+        result = db.session.execute(
+            table.update()
+            .where(table.c.product_id == product_id,
+                   table.c.shard_no == shard_no,
+                   table.c.quantity >= amount)
+            .values(quantity=table.c.quantity - amount)
+        )
+        return result.rowcount == 1
+
+    for shard_no in order:
+        if take(shard_no, quantity):
+            return
+
+    # Ни в одном шарде нет нужного количества целиком: собираем из нескольких.
+    # Частичные списания откатятся вместе с транзакцией, если остатка не хватит.
+    remaining = quantity
+    for shard_no in order:
+        available = db.session.execute(
+            db.select(table.c.quantity)
+            .where(table.c.product_id == product_id, table.c.shard_no == shard_no)
+        ).scalar() or 0
+        amount = min(available, remaining)
+        if amount > 0 and take(shard_no, amount):
+            remaining -= amount
+        if remaining == 0:
+            return
+
+    total = db.session.execute(
+        db.select(db.func.coalesce(db.func.sum(table.c.quantity), 0))
+        .where(table.c.product_id == product_id)
+    ).scalar()
+    raise InsufficientStockError(product_id, quantity, total + quantity - remaining)
+
+
+def reserve_stock(quantities: Dict[int, int], shards: Optional[Dict[int, int]] = None) -> None:
+    """
+    Списывает остатки условными UPDATE в текущей транзакции.
+
+    Каждый UPDATE проверяет остаток и уменьшает его атомарно, поэтому
+    параллельные заказы не могут уйти в минус. Товары обрабатываются
+    в порядке product_id, чтобы блокировки строк брались в одном порядке.
+    Для товаров из shards (product_id -> число шардов) списание идет
+    со случайного шарда InventoryShard с переходом на соседние.
+    При нехватке бросает InsufficientStockError; откат транзакции — на вызывающем.
+    """
+    shards = shards or {}
+    for product_id in sorted(quantities):
+        if shards.get(product_id):
+            _reserve_sharded(product_id, quantities[product_id], shards[product_id])
+        else:
+            _reserve_single(product_id, quantities[product_id])
+
+
+def release_stock(items: Iterable[Tuple[int, int]], shards: Optional[Dict[int, int]] = None) -> None:
+    """
+    Возвращает остатки на склад в текущей транзакции.
+    Обычные товары обновляются одним executemany-UPDATE.
+    """
+    shards = shards or {}
+    totals: Dict[int, int] = {}
+    for product_id, quantity in items:
+        totals[product_id] = totals.get(product_id, 0) + quantity
+
+    plain = [{'pid': pid, 'qty': totals[pid]} for pid in sorted(totals) if not shards.get(pid)]
+    if plain:
+        table = Product.__table__
+        db.session.execute(
+            table.update()
+            .where(table.c.product_id == bindparam('pid'))
+            .values(stock_quantity=table.c.stock_quantity + bindparam('qty')),
+            plain
+        )
+        invalidate_catalog_on_commit()
+
+    sharded = [
+        {'pid': pid, 'shard': random.randrange(shards[pid]), 'qty': totals[pid]}
+        for pid in sorted(totals) if shards.get(pid)
+    ]
+    if sharded:
+        table = InventoryShard.__table__
+        db.session.execute(
+            table.update()
+            .where(table.c.product_id == bindparam('pid'), table.c.shard_no == bindparam('shard'))
+            .values(quantity=table.c.quantity + bindparam('qty')),
+            sharded
+        )
+
+
+def enable_sharding(product_id: int, shard_count: int) -> None:
+    """
+    Переносит остаток товара в shard_count шардов.
+    Product.stock_quantity после этого — снимок суммы, обновляемый при ребалансировке.
+    """
+    if shard_count < 1:
+        raise ValueError("Shard count must be positive")
+    product = db.session.execute(
+        db.select(Product).where(Product.product_id == product_id).with_for_update()
+    ).scalar_one()
+
+    total = product.stock_quantity or 0
+    if product.stock_shards:
+        total = _shard_total(product_id)
+    InventoryShard.query.filter_by(product_id=product_id).delete()
+    db.session.add_all([
+        InventoryShard(product_id=product_id, shard_no=i, quantity=quantity)
+        for i, quantity in enumerate(_split(total, shard_count))
+    ])
+    product.stock_quantity = total
+    product.stock_shards = shard_count
+    db.session.commit()
+
+
+def disable_sharding(product_id: int) -> None:
+    """
+    Собирает остаток из шардов обратно в Product.stock_quantity
+    """
+    product = db.session.execute(
+        db.select(Product).where(Product.product_id == product_id).with_for_update()
+    ).scalar_one()
+    if not product.stock_shards:
+        return
+    product.stock_quantity = _shard_total(product_id)
+    product.stock_shards = 0
+    InventoryShard.query.filter_by(product_id=product_id).delete()
+    db.session.commit()
+
+
+def set_stock(product: Product, quantity: int) -> None:
+    """
+    Устанавливает остаток товара с учетом шардов (без коммита)
+    """
+    product.stock_quantity = quantity
+    if product.stock_shards:
+        table = InventoryShard.__table__
+        for shard_no, shard_quantity in enumerate(_split(int(quantity), product.stock_shards)):
+            db.session.execute(
+                table.update()
+                .where(table.c.product_id == product.product_id, table.c.shard_no == shard_no)
+                .values(quantity=shard_quantity)
+            )
+
+
+def _shard_total(product_id: int) -> int:
+    table = InventoryShard.__table__
+    return db.session.execute(
+        db.select(db.func.coalesce(db.func.sum(table.c.quantity), 0))
+        .where(table.c.product_id == product_id)
+    ).scalar()
+
+
+def rebalance(product_id: int) -> int:
+    """
+    Выравнивает остаток между шардами и обновляет снимок Product.stock_quantity.
+
+    Шарды меняются относительными UPDATE с суммой изменений ноль, поэтому
+    параллельные списания не теряются: если шард успели опустошить,
+    транзакция откатывается и ребалансировка повторится в следующий раз.
+    Возвращает суммарный остаток.
+    """
+    table = InventoryShard.__table__
+    rows = db.session.execute(
+        db.select(table.c.shard_no, table.c.quantity)
+        .where(table.c.product_id == product_id)
+        .order_by(table.c.shard_no)
+        .with_for_update()
+    ).all()
+    if not rows:
+        return 0
+
+    total = sum(quantity for _, quantity in rows)
+    targets = _split(total, len(rows))
+    for (shard_no, quantity), target in zip(rows, targets):
+        delta = target - quantity
+        if delta == 0:
+            continue
+        result = db.session.execute(
+            table.update()
+            .where(table.c.product_id == product_id,
+                   table.c.shard_no == shard_no,
+                   table.c.quantity + delta >= 0)
+            .values(quantity=table.c.quantity + delta)
+        )
+        if result.rowcount != 1:
+            db.session.rollback()
+            return total
+
+    product_table = Product.__table__
+    db.session.execute(
+        product_table.update()
+        .where(product_table.c.product_id == product_id)
+        .values(stock_quantity=db.select(db.func.sum(table.c.quantity))
+                .where(table.c.product_id == product_id)
+                .scalar_subquery())
+    )
+    invalidate_catalog_on_commit()
+    db.session.commit()
+    return total
+
+
+def rebalance_all() -> Dict[int, int]:
+    product_ids = [
+        row[0] for row in db.session.execute(
+            db.select(Product.product_id).where(Product.stock_shards > 0)
+        ).all()
+    ]
+    return {product_id: rebalance(product_id) for product_id in product_ids}
@@ -0,0 +1,65 @@
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson не установлен — остается стандартный json
+    orjson = None
+
+# Аргументы json.dumps, которые понимает быстрый путь; с остальными — стандартный json
+_FAST_KWARGS = {'default', 'sort_keys', 'indent', 'separators', 'ensure_ascii'}
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON-провайдер на orjson. Вывод совпадает с DefaultJSONProvider:
+    Decimal — строкой, datetime и date — HTTP-датой (их orjson передает
+    в тот же default), ключи сортируются. Отличие одно: не-ASCII символы
+    пишутся как есть в UTF-8, а не \\u-последовательностями.
+    """
+
+    def _options(self, sort_keys: bool, indent: Any) -> int:
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def _fast(self, kwargs) -> bool:
+        return set(kwargs) <= _FAST_KWARGS and kwargs.get('indent') in (None, 2)
+
+    def encode(self, obj: Any, **kwargs: Any) -> bytes:
+        if not self._fast(kwargs):
+            return super().dumps(obj, **kwargs).encode()
+        return orjson.dumps(
+            obj,
+            default=kwargs.get('default', self.default),
+            option=self._options(kwargs.get('sort_keys', self.sort_keys), kwargs.get('indent'))
+        )
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if not self._fast(kwargs):
+            return super().dumps(obj, **kwargs)
+        return self.encode(obj, **kwargs).decode()
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        # Тело собирается сразу в байтах, без промежуточной str
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        body = self.encode(obj, indent=2 if pretty else None) + b'\n'
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def init_json(app) -> None:
+    """
+    Ставит быстрый JSON-провайдер, если он включен (JSON_PROVIDER=fast) и orjson установлен
+    """
+    if app.config['JSON_PROVIDER'] == 'fast' and orjson is not None:
+        app.json = FastJSONProvider(app)
@@ -0,0 +1,135 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import joinedload, selectinload
+
+from app.extensions import db
+from app.models import Order, OrderProducts, Payment, Product
+from app.services.catalog_service import decode_cursor, encode_cursor
+
+
+def with_items(query):
+    """
+    Подгружает позиции заказа вместе с товарами: один дополнительный запрос на страницу
+    """
+    return query.options(selectinload(Order.items).joinedload(OrderProducts.product))
+
+
+def _parse_datetime(value: Optional[str], name: str) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid {name}")
+
+
+def parse_order_filters(args) -> Dict[str, Any]:
+    """
+    Разбирает query-параметры админского списка заказов.
+    Бросает ValueError при некорректных значениях.
+    """
+    default_limit = current_app.config['ORDERS_PAGE_SIZE']
+    max_limit = current_app.config['ORDERS_MAX_PAGE_SIZE']
+    try:
+        limit = int(args.get('limit', default_limit))
+    except ValueError:
+        raise ValueError("Invalid limit")
+
+    return {
+        'limit': max(1, min(limit, max_limit)),
+        'cursor': args.get('cursor'),
+        'status': args.get('status'),
+        'payment_status': args.get('payment_status'),
+        'user_id': args.get('user_id', type=int),
+        'date_from': _parse_datetime(args.get('date_from'), 'date_from'),
+        'date_to': _parse_datetime(args.get('date_to'), 'date_to'),
+    }
+
+
+def get_orders_page(params: Dict[str, Any], columns: List[Any]) -> Tuple[List[Any], Optional[str]]:
+    """
+    Возвращает страницу заказов (новые сначала) и токен следующей страницы.
+    Выбираются только columns; позиции догружает read_model_service.
+    """
+    query = Order.query
+    if params['status']:
+        query = query.filter(Order.status == params['status'])
+    if params['payment_status']:
+        query = query.filter(Order.payment_status == params['payment_status'])
+    if params['user_id'] is not None:
+        query = query.filter(Order.user_id == params['user_id'])
+    if params['date_from']:
+        query = query.filter(Order.created_at >= params['date_from'])
+    if params['date_to']:
+        query = query.filter(Order.created_at < params['date_to'])
+
+    if params['cursor']:
+        created_at, last_id = decode_cursor(params['cursor'], 'created_at', 'desc')
+        query = query.filter(or_(
+            Order.created_at < created_at,
+            and_(Order.created_at == created_at, Order.order_id < last_id)
+        ))
+
+    query = query.order_by(Order.created_at.desc(), Order.order_id.desc())
+    orders = query.with_entities(
+        *columns, Order.created_at.label('_created_at'), Order.order_id.label('_order_id')
+    ).limit(params['limit'] + 1).all()
+
+    has_more = len(orders) > params['limit']
+    orders = orders[:params['limit']]
+    next_cursor = None
+    if has_more and orders:
+        last = orders[-1]
+        next_cursor = encode_cursor('created_at', 'desc', last._created_at, last._order_id)
+    return orders, next_cursor
+
+
+def _latest(*values: Optional[datetime]) -> Optional[datetime]:
+    present = [value for value in values if value is not None]
+    return max(present) if present else None
+
+
+def user_orders_validator(user_id) -> Tuple[Tuple, Optional[datetime]]:
+    """
+    Признаки версии списка заказов пользователя: число заказов и позиций,
+    max(updated_at) заказов и входящих в них товаров (в выдаче их имена и цены).
+    """
+    row = db.session.execute(
+        db.select(
+            func.count(func.distinct(Order.order_id)),
+            func.count(Product.product_id),
+            func.max(Order.updated_at),
+            func.max(Product.updated_at)
+        )
+        .select_from(Order)
+        .outerjoin(OrderProducts, OrderProducts.order_id == Order.order_id)
+        .outerjoin(Product, Product.product_id == OrderProducts.product_id)
+        .where(Order.user_id == user_id)
+    ).one()
+    return tuple(row), _latest(row[2], row[3])
+
+
+def order_validator(order_id: int) -> Optional[Tuple[Tuple, Optional[datetime]]]:
+    """
+    То же для одного заказа, включая его платежи. None — заказа нет.
+    """
+    order_updated_at = db.session.execute(
+        db.select(Order.updated_at).where(Order.order_id == order_id)
+    ).first()
+    if order_updated_at is None:
+        return None
+    items = db.session.execute(
+        db.select(func.count(Product.product_id), func.max(Product.updated_at))
+        .select_from(OrderProducts)
+        .join(Product, Product.product_id == OrderProducts.product_id)
+        .where(OrderProducts.order_id == order_id)
+    ).one()
+    payments = db.session.execute(
+        db.select(func.count(Payment.payment_id), func.max(Payment.updated_at))
+        .where(Payment.order_id == order_id)
+    ).one()
+    parts = (order_updated_at[0],) + tuple(items) + tuple(payments)
+    return parts, _latest(order_updated_at[0], items[1], payments[1])
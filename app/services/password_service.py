@@ -0,0 +1,114 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from app.extensions import db
+from app.models import User
+
+
+class PasswordHasherBusyError(Exception):
+    """Очередь хеширования переполнена — запрос стоит повторить позже"""
+
+
+class PasswordHasher:
+    """
+    Хеширование паролей в ограниченном пуле процессов.
+
+    Один хеш scrypt/pbkdf2 занимает ядро на десятки миллисекунд, поэтому
+    пачка логинов в потоках запросов забирает весь CPU воркера и тормозит
+    остальные маршруты. Пул отделяет эту работу и ограничивает ее параллелизм.
+    Пул создается лениво при первом вызове; число одновременно ожидающих
+    задач ограничено, при переполнении вызов ждет не дольше queue_timeout.
+    При workers=0 хеширование выполняется в текущем потоке.
+    """
+
+    def __init__(self) -> None:
+        self.method = 'scrypt:32768:8:1'
+        self.salt_length = 16
+        # Префикс метода в том виде, как его пишет werkzeug (с параметрами по умолчанию)
+        self.method_prefix = 'scrypt:32768:8:1'
+        self.workers = 0
+        self.queue_timeout = 5.0
+        self._slots: Optional[threading.BoundedSemaphore] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        self.shutdown()
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.salt_length = app.config['PASSWORD_SALT_LENGTH']
+        # Короткие записи вида 'scrypt' или 'pbkdf2:sha256' werkzeug дополняет
+        # параметрами по умолчанию — берем их из пробного хеша один раз при старте
+        self.method_prefix = generate_password_hash('x', self.method, self.salt_length).split('$', 1)[0]
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.queue_timeout = app.config['PASSWORD_HASH_QUEUE_TIMEOUT']
+        self._slots = threading.BoundedSemaphore(max(1, self.workers) * app.config['PASSWORD_HASH_QUEUE_FACTOR'])
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def _run(self, func, *args):
+        if self.workers <= 0:
+            return func(*args)
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise PasswordHasherBusyError('Password hashing queue is full')
+        try:
+            return self._get_pool().submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, password_hash: Optional[str], password: str) -> bool:
+        if not password_hash:
+            return False
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """
+        Хеш построен с другими алгоритмом, параметрами или длиной соли, чем заданы в конфиге
+        """
+        parts = password_hash.split('$', 2)
+        if len(parts) != 3:
+            return True
+        method, salt, _ = parts
+        return method != self.method_prefix or len(salt) != self.salt_length
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+password_hasher = PasswordHasher()
+
+
+def init_password_hasher(app) -> None:
+    password_hasher.init_app(app)
+
+
+def verify_and_update(user: Optional[User], password: str) -> bool:
+    """
+    Проверяет пароль и при успехе перехеширует его с текущими параметрами,
+    если сохраненный хеш построен по устаревшим. Изменение коммитится сразу.
+    """
+    if user is None or not password_hasher.verify(user.password, password):
+        return False
+    if password_hasher.needs_rehash(user.password):
+        try:
+            user.password = password_hasher.hash(password)
+            db.session.commit()
+        except Exception as e:
+            # Вход не блокируем: перехеширование повторится при следующем входе
+            db.session.rollback()
+            current_app.logger.warning(f"Password rehash failed for user {user.user_id}: {str(e)}")
+    return True
@@ -16,6 +16,7 @@ class PaymentService:
         
         Configuration.account_id = app.config['YOOMONEY_SHOP_ID']
         Configuration.secret_key = self.api_key
+        Configuration.api_url = app.config['YOOMONEY_API_URL']
 
     def create_payment(self, amount: float, description: str, order_id: str) -> Dict:
         """
@@ -88,6 +89,7 @@ class PaymentService:
                     'currency': payment.amount.currency
                 },
                 'created_at': payment.created_at,
+                'captured_at': payment.captured_at,
                 'description': payment.description,
                 'metadata': payment.metadata
             }
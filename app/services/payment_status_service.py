@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from flask import current_app
+
+from app.extensions import db
+from app.models import Order, Payment
+from app.services.inventory_service import InsufficientStockError
+from app.services.reservation_service import release_hold, reserve_orders_stock
+
+# Статусы YooKassa упорядочены: переход возможен только "вперед",
+# поэтому повторные и запоздавшие уведомления ничего не меняют
+STATUS_RANK = {
+    None: -1,
+    'pending': 0,
+    'waiting_for_capture': 1,
+    'succeeded': 2,
+    'canceled': 2,
+    'cancelled': 2,
+}
+
+TERMINAL_STATUSES = {status for status, rank in STATUS_RANK.items() if rank == 2}
+
+
+def parse_provider_datetime(value) -> Optional[datetime]:
+    """
+    Переводит время YooKassa (ISO 8601 с Z) в наивный UTC, как в остальных моделях
+    """
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def apply_payment_status(payment_id: str, status: str, paid_at: Optional[datetime] = None) -> bool:
+    """
+    Применяет статус платежа к Payment и связанному Order.
+
+    Обновление условное: статус меняется только если новый "старше" текущего,
+    так что повторная или пришедшая не по порядку доставка безопасна.
+    Возвращает True, если статус изменился. Коммит — на вызывающем.
+    """
+    if status is None or status not in STATUS_RANK:
+        raise ValueError(f"Unknown payment status: {status}")
+
+    previous = [s for s, rank in STATUS_RANK.items() if rank < STATUS_RANK[status] and s is not None]
+    table = Payment.__table__
+    values = {'status': status}
+    if status == 'succeeded':
+        values['paid_at'] = paid_at or datetime.utcnow()
+
+    result = db.session.execute(
+        table.update()
+        .where(table.c.payment_id == payment_id,
+               db.or_(table.c.status.in_(previous), table.c.status.is_(None)))
+        .values(**values)
+    )
+    if result.rowcount != 1:
+        return False
+
+    order_id = db.session.execute(
+        db.select(table.c.order_id).where(table.c.payment_id == payment_id)
+    ).scalar()
+    if order_id is None:
+        return True
+
+    order_table = Order.__table__
+    if status == 'succeeded':
+        db.session.execute(
+            order_table.update()
+            .where(order_table.c.order_id == order_id)
+            .values(payment_status='succeeded')
+        )
+        confirmed = db.session.execute(
+            order_table.update()
+            .where(order_table.c.order_id == order_id, order_table.c.status == 'pending')
+            .values(status='processing')
+        ).rowcount
+        if not confirmed:
+            # Заказ мог быть отменен по истечении резерва, пока покупатель платил
+            _revive_paid_order(order_id)
+        release_hold(order_id)
+    elif status in TERMINAL_STATUSES:
+        db.session.execute(
+            order_table.update()
+            .where(order_table.c.order_id == order_id,
+                   order_table.c.payment_status != 'succeeded')
+            .values(payment_status=status)
+        )
+    return True
+
+
+def _revive_paid_order(order_id: int) -> None:
+    """
+    Оплаченный, но уже отмененный заказ: снова списывает его позиции и
+    переводит в processing. Если товара больше нет — помечает заказ
+    refund_required и пишет в лог, чтобы деньги вернули вручную.
+    """
+    order_table = Order.__table__
+    try:
+        with db.session.begin_nested():
+            revived = db.session.execute(
+                order_table.update()
+                .where(order_table.c.order_id == order_id, order_table.c.status == 'cancelled')
+                .values(status='processing')
+            ).rowcount
+            if not revived:
+                return
+            reserve_orders_stock([order_id])
+        current_app.logger.info(f"Order {order_id} was paid after cancellation: stock reserved again")
+    except InsufficientStockError as e:
+        db.session.execute(
+            order_table.update()
+            .where(order_table.c.order_id == order_id, order_table.c.status == 'cancelled')
+            .values(status='refund_required')
+        )
+        current_app.logger.warning(
+            f"Order {order_id} was paid after cancellation and product {e.product_id} is out of stock: refund required"
+        )
+
+
+def claim_refresh(payment_id: str) -> bool:
+    """
+    Отмечает, что этот запрос проверит платеж у провайдера.
+    Не чаще одного раза за YOOMONEY_STATUS_REFRESH_INTERVAL на платеж во всех воркерах.
+    """
+    now = datetime.utcnow()
+    threshold = now - timedelta(seconds=current_app.config['YOOMONEY_STATUS_REFRESH_INTERVAL'])
+    table = Payment.__table__
+    result = db.session.execute(
+        table.update()
+        .where(table.c.payment_id == payment_id,
+               table.c.status.notin_(TERMINAL_STATUSES),
+               db.or_(table.c.last_checked_at.is_(None), table.c.last_checked_at < threshold))
+        .values(last_checked_at=now)
+    )
+    db.session.commit()
+    return result.rowcount == 1
@@ -0,0 +1,69 @@
+from functools import wraps
+from typing import Dict, Optional
+
+from flask import jsonify
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models import User
+from app.services.cache_service import LRUCache
+
+# user_id -> роль; короткий TTL ограничивает устаревание между воркерами
+principal_cache = LRUCache(maxsize=10000, ttl=60)
+
+
+def init_principal_cache(app) -> None:
+    principal_cache.configure(app.config['PRINCIPAL_CACHE_SIZE'], app.config['PRINCIPAL_CACHE_TTL'])
+
+
+def role_claims(user: User) -> Dict[str, str]:
+    """
+    Дополнительные claims для JWT: роль пользователя на момент выдачи токена
+    """
+    return {'role': user.role}
+
+
+def get_user_role(user_id) -> Optional[str]:
+    """
+    Роль пользователя из процессного кэша, при промахе — один запрос к БД
+    """
+    user_id = int(user_id)
+    role = principal_cache.get(user_id)
+    if role is None:
+        role = db.session.execute(
+            db.select(User.role).where(User.user_id == user_id)
+        ).scalar()
+        if role is not None:
+            principal_cache.set(user_id, role)
+    return role
+
+
+def invalidate_principal(user_id) -> None:
+    principal_cache.delete(int(user_id))
+
+
+@event.listens_for(User.role, 'set')
+def _on_role_change(target, value, oldvalue, initiator):
+    # Смена роли сразу сбрасывает закэшированного пользователя в этом процессе
+    if target.user_id is not None and value != oldvalue:
+        invalidate_principal(target.user_id)
+
+
+def admin_required(f):
+    """
+    Пропускает только администраторов. Применяется после @jwt_required().
+
+    Токен без роли admin в claims отклоняется без обращения к БД.
+    Для admin-токена роль подтверждается по кэшу, чтобы понижение
+    в правах действовало до истечения токена.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        claimed_role = get_jwt().get('role')
+        if claimed_role is not None and claimed_role != 'admin':
+            return jsonify({"msg": "Admin access required"}), 403
+        if get_user_role(get_jwt_identity()) != 'admin':
+            return jsonify({"msg": "Admin access required"}), 403
+        return f(*args, **kwargs)
+    return decorated_function
@@ -0,0 +1,267 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.extensions import db
+from app.models import Order, OrderProducts, Payment, Product
+
+
+def _as_is(value: Any) -> Any:
+    return value
+
+
+def _str(value: Any) -> Optional[str]:
+    return str(value) if value is not None else None
+
+
+def _float(value: Any) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+def _iso(value: Any) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def _dict(value: Any) -> Any:
+    return value or {}
+
+
+class ReadModel:
+    """
+    Проекция ресурса для чтения: поле ответа -> (колонка, форматтер).
+
+    Запрос выбирает только колонки запрошенных полей и возвращает
+    простые строки без ORM-объектов и identity map, поэтому листинг,
+    которому нужны имя и цена, не тянет description и прочее.
+    """
+
+    def __init__(self, fields: Dict[str, Tuple[Any, Callable[[Any], Any]]], default: Sequence[str],
+                 required: Sequence[str] = ()) -> None:
+        self.fields = fields
+        self.default = tuple(default)
+        self.required = tuple(required)
+        self._compiled: Dict[Tuple[str, Tuple[str, ...]], Callable[[Any], Dict[str, Any]]] = {}
+
+    def parse_fields(self, value: Optional[str]) -> Tuple[str, ...]:
+        """
+        Разбирает ?fields=a,b,c; без параметра — поля по умолчанию.
+        Бросает ValueError на неизвестное поле.
+        """
+        if not value:
+            return self.default
+        names = []
+        for name in value.split(','):
+            name = name.strip()
+            if not name:
+                continue
+            if name not in self.fields:
+                raise ValueError(f"Unknown field: {name}")
+            if name not in names:
+                names.append(name)
+        if not names:
+            return self.default
+        return tuple(name for name in self.required if name not in names) + tuple(names)
+
+    def columns(self, fields: Iterable[str]) -> List[Any]:
+        return [self.fields[name][0].label(name) for name in fields if self.fields[name][0] is not None]
+
+    def serializer(self, fields: Sequence[str]) -> Callable[[Any], Dict[str, Any]]:
+        """
+        Сериализатор строки для набора полей, скомпилированный один раз:
+        функция вида lambda row: {'name': row[1], 'price': f2(row[2])}, где
+        row — кортеж колонок в порядке columns(fields). Поля без форматтера
+        читаются по индексу без вызова функции.
+        """
+        key = ('row', tuple(fields))
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            compiled = self._compiled[key] = self._compile(key[1], 'row[{index}]')
+        return compiled
+
+    def dumper(self, fields: Optional[Sequence[str]] = None) -> Callable[[Any], Dict[str, Any]]:
+        """
+        То же для ORM-объекта: имена полей совпадают с атрибутами модели
+        """
+        key = ('obj', tuple(fields or self.default))
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            compiled = self._compiled[key] = self._compile(key[1], 'row.{name}')
+        return compiled
+
+    def _compile(self, fields: Tuple[str, ...], access: str) -> Callable[[Any], Dict[str, Any]]:
+        names = [name for name in fields if self.fields[name][0] is not None]
+        namespace: Dict[str, Any] = {}
+        items = []
+        for index, name in enumerate(names):
+            value = access.format(index=index, name=name)
+            formatter = self.fields[name][1]
+            if formatter is not _as_is:
+                namespace[f'f{index}'] = formatter
+                value = f'f{index}({value})'
+            items.append(f'{name!r}: {value}')
+        exec(f"def serialize(row):\n    return {{{', '.join(items)}}}\n", namespace)
+        return namespace['serialize']
+
+    def serialize(self, row, fields: Sequence[str]) -> Dict[str, Any]:
+        return self.serializer(fields)(row)
+
+    def dump(self, obj: Any, fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        return self.dumper(fields)(obj)
+
+
+def _product_fields(price: Callable[[Any], Any], created_at: Callable[[Any], Any]):
+    return {
+        'product_id': (Product.product_id, _as_is),
+        'sku': (Product.sku, _as_is),
+        'name': (Product.name, _as_is),
+        'description': (Product.description, _as_is),
+        'price': (Product.price, price),
+        'category_id': (Product.category_id, _as_is),
+        'image_url': (Product.image_url, _as_is),
+        'image_variants': (Product.image_variants, _dict),
+        'stock_quantity': (Product.stock_quantity, _as_is),
+        'is_active': (Product.is_active, _as_is),
+        'created_at': (Product.created_at, created_at),
+        'updated_at': (Product.updated_at, created_at),
+    }
+
+
+# Форматы полей повторяют прежние ответы: публичный каталог отдавал цену строкой,
+# админка (Product.to_dict) — числом
+CATALOG = ReadModel(
+    _product_fields(_str, _iso),
+    default=('product_id', 'name', 'price', 'image_url', 'image_variants'),
+    required=('product_id',)
+)
+ADMIN_PRODUCT = ReadModel(
+    _product_fields(_float, _iso),
+    default=('product_id', 'sku', 'name', 'description', 'price', 'category_id', 'image_url',
+             'image_variants', 'stock_quantity', 'is_active', 'created_at', 'updated_at'),
+    required=('product_id',)
+)
+
+# Позиции заказа: колонки товара, к которым присоединены OrderProducts
+ORDER_ITEM = ReadModel({
+    'product_id': (Product.product_id, _as_is),
+    'name': (Product.name, _as_is),
+    'price': (Product.price, _float),
+    'quantity': (OrderProducts.quantity, _as_is),
+}, default=('product_id', 'name', 'price', 'quantity'))
+ADMIN_ORDER_ITEM = ReadModel({
+    **ORDER_ITEM.fields,
+    'price': (Product.price, _str),
+}, default=ORDER_ITEM.default)
+
+# products и payment — вложенные поля без колонки, их выбирают отдельные запросы
+ORDER = ReadModel({
+    'order_id': (Order.order_id, _as_is),
+    'total_amount': (Order.total_amount, _float),
+    'status': (Order.status, _as_is),
+    'payment_status': (Order.payment_status, _as_is),
+    'created_at': (Order.created_at, _iso),
+    'products': (None, _as_is),
+}, default=('order_id', 'total_amount', 'status', 'payment_status', 'created_at', 'products'),
+    required=('order_id',))
+# updated_at — версия заказа для оптимистической проверки в массовых операциях
+ORDER_DETAIL = ReadModel({
+    **ORDER.fields,
+    'updated_at': (Order.updated_at, _iso),
+    'payment': (None, _as_is),
+}, default=ORDER.default + ('updated_at', 'payment'), required=ORDER.required)
+ADMIN_ORDER = ReadModel({
+    'order_id': (Order.order_id, _as_is),
+    'user_id': (Order.user_id, _as_is),
+    'status': (Order.status, _as_is),
+    'payment_status': (Order.payment_status, _as_is),
+    # Админский список исторически отдает дату в формате jsonify (HTTP-date)
+    'created_at': (Order.created_at, _as_is),
+    'total_amount': (Order.total_amount, _str),
+    'updated_at': (Order.updated_at, _iso),
+    'products': (None, _as_is),
+}, default=('order_id', 'user_id', 'status', 'payment_status', 'created_at', 'total_amount', 'updated_at',
+            'products'),
+    required=('order_id',))
+
+PAYMENT = ReadModel({
+    'payment_id': (Payment.payment_id, _as_is),
+    'order_id': (Payment.order_id, _as_is),
+    'user_id': (Payment.user_id, _as_is),
+    'amount': (Payment.amount, _float),
+    'currency': (Payment.currency, _as_is),
+    'status': (Payment.status, _as_is),
+    'payment_method': (Payment.payment_method, _as_is),
+    'payment_details': (Payment.payment_details, _as_is),
+    'error_code': (Payment.error_code, _as_is),
+    'error_description': (Payment.error_description, _as_is),
+    'created_at': (Payment.created_at, _iso),
+    'updated_at': (Payment.updated_at, _iso),
+    'paid_at': (Payment.paid_at, _iso),
+}, default=('payment_id', 'order_id', 'user_id', 'amount', 'currency', 'status', 'payment_method',
+            'payment_details', 'error_code', 'error_description', 'created_at', 'updated_at', 'paid_at'))
+
+
+def get_product(product_id: int, fields: Sequence[str], model: ReadModel = ADMIN_PRODUCT) -> Optional[Dict[str, Any]]:
+    row = db.session.execute(
+        db.select(*model.columns(fields)).where(Product.product_id == product_id)
+    ).first()
+    return model.serialize(row, fields) if row is not None else None
+
+
+def order_items(order_ids: List[int], model: ReadModel = ORDER_ITEM) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Позиции нескольких заказов одним запросом с join на товар
+    """
+    items: Dict[int, List[Dict[str, Any]]] = {order_id: [] for order_id in order_ids}
+    if not order_ids:
+        return items
+    result = db.session.execute(
+        db.select(*model.columns(model.default), OrderProducts.order_id.label('_order_id'))
+        .join(Product, Product.product_id == OrderProducts.product_id)
+        .where(OrderProducts.order_id.in_(order_ids))
+        .order_by(OrderProducts.order_id, OrderProducts.product_id)
+    )
+    for row in result:
+        items[row._order_id].append(model.serialize(row, model.default))
+    return items
+
+
+def last_payment(order_id: int) -> Optional[Dict[str, Any]]:
+    row = db.session.execute(
+        db.select(*PAYMENT.columns(PAYMENT.default))
+        .where(Payment.order_id == order_id)
+        .order_by(Payment.created_at.desc())
+        .limit(1)
+    ).first()
+    return PAYMENT.serialize(row, PAYMENT.default) if row is not None else None
+
+
+def serialize_orders(rows, fields: Sequence[str], model: ReadModel = ORDER,
+                     item_model: ReadModel = ORDER_ITEM) -> List[Dict[str, Any]]:
+    """
+    Строки заказов в ответ; позиции догружаются, только если запрошено поле products
+    """
+    orders = [model.serialize(row, fields) for row in rows]
+    if 'products' in fields:
+        items = order_items([order['order_id'] for order in orders], item_model)
+        for order in orders:
+            order['products'] = items[order['order_id']]
+    return orders
+
+
+def get_user_orders(user_id, fields: Sequence[str]) -> List[Dict[str, Any]]:
+    rows = db.session.execute(
+        db.select(*ORDER.columns(fields))
+        .where(Order.user_id == user_id)
+        .order_by(Order.created_at.desc(), Order.order_id.desc())
+    ).all()
+    return serialize_orders(rows, fields)
+
+
+def get_order(order_id: int, fields: Sequence[str]) -> Optional[Dict[str, Any]]:
+    row = db.session.execute(
+        db.select(*ORDER_DETAIL.columns(fields)).where(Order.order_id == order_id)
+    ).first()
+    if row is None:
+        return None
+    order = serialize_orders([row], fields, ORDER_DETAIL)[0]
+    if 'payment' in fields:
+        order['payment'] = last_payment(order_id)
+    return order
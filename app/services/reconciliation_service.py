@@ -0,0 +1,123 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from flask import current_app
+
+from app.extensions import db
+from app.models import Payment
+from app.services.payment_status_service import apply_payment_status, parse_provider_datetime
+
+
+class RateLimiter:
+    """
+    Token bucket: не больше rate запросов в секунду на все потоки
+    """
+
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def fetch_with_backoff(fetch: Callable[[str], Optional[Dict]], payment_id: str, limiter: RateLimiter,
+                       max_attempts: int, base_delay: float) -> Optional[Dict]:
+    """
+    Запрашивает платеж у провайдера с экспоненциальной задержкой между попытками
+    """
+    for attempt in range(max_attempts):
+        limiter.acquire()
+        try:
+            return fetch(payment_id)
+        except Exception as e:
+            if attempt == max_attempts - 1:
+                current_app.logger.warning(f"Reconciliation failed for payment {payment_id}: {str(e)}")
+                return None
+            time.sleep(base_delay * (2 ** attempt) * (1 + random.random()))
+    return None
+
+
+def reconcile_pending(fetch: Callable[[str], Optional[Dict]], batch_size: int, workers: int,
+                      rate: float, max_attempts: int, base_delay: float, min_age: float) -> Dict[str, int]:
+    """
+    Сверяет зависшие pending-платежи с провайдером.
+
+    Платежи читаются пачками по индексу (status, created_at, payment_id)
+    с keyset-продолжением, запросы к провайдеру идут через ограниченный
+    пул потоков и общий rate limiter, результаты пачки применяются одной транзакцией.
+    """
+    app = current_app._get_current_object()
+    limiter = RateLimiter(rate)
+    stats = {'checked': 0, 'updated': 0, 'failed': 0}
+    cutoff = datetime.utcnow() - timedelta(seconds=min_age)
+    last = None
+
+    def fetch_one(payment_id):
+        with app.app_context():
+            return fetch_with_backoff(fetch, payment_id, limiter, max_attempts, base_delay)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            query = (
+                db.select(Payment.payment_id, Payment.created_at)
+                .where(Payment.status == 'pending', Payment.created_at < cutoff)
+            )
+            if last:
+                query = query.where(db.or_(
+                    Payment.created_at > last.created_at,
+                    db.and_(Payment.created_at == last.created_at, Payment.payment_id > last.payment_id)
+                ))
+            rows = db.session.execute(
+                query.order_by(Payment.created_at, Payment.payment_id).limit(batch_size)
+            ).all()
+            db.session.rollback()
+            if not rows:
+                break
+            last = rows[-1]
+
+            payment_ids = [row.payment_id for row in rows]
+            results = list(executor.map(fetch_one, payment_ids))
+
+            for payment_id, info in zip(payment_ids, results):
+                stats['checked'] += 1
+                if info is None:
+                    stats['failed'] += 1
+                    continue
+                try:
+                    changed = apply_payment_status(payment_id, info.get('status'),
+                                                   parse_provider_datetime(info.get('captured_at')))
+                except ValueError as e:
+                    # Неизвестный статус или дата провайдера — пропускаем платеж, а не всю пачку
+                    current_app.logger.warning(f"Reconciliation skipped payment {payment_id}: {str(e)}")
+                    stats['failed'] += 1
+                    continue
+                if changed:
+                    stats['updated'] += 1
+            db.session.execute(
+                Payment.__table__.update()
+                .where(Payment.payment_id.in_(payment_ids))
+                .values(last_checked_at=datetime.utcnow())
+            )
+            db.session.commit()
+
+            if len(rows) < batch_size:
+                break
+    return stats
@@ -0,0 +1,143 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from flask import current_app
+
+from app.extensions import db
+from app.models import Order, OrderProducts, Product, StockHold
+from app.services.inventory_service import release_stock, reserve_stock
+
+
+def new_hold() -> StockHold:
+    """
+    Резерв для только что созданного неоплаченного заказа
+    """
+    ttl = current_app.config['ORDER_HOLD_TTL']
+    return StockHold(expires_at=datetime.utcnow() + timedelta(seconds=ttl))
+
+
+def release_hold(order_id: int) -> None:
+    """
+    Снимает резерв (заказ оплачен или отменен); коммит — на вызывающем
+    """
+    StockHold.query.filter_by(order_id=order_id).delete(synchronize_session=False)
+
+
+def _orders_items(order_ids: List[int]) -> Tuple[List[Tuple[int, int]], Dict[int, int]]:
+    """
+    Суммарные количества по товарам заказов и число шардов у шардированных товаров
+    """
+    items = db.session.execute(
+        db.select(OrderProducts.product_id, db.func.sum(OrderProducts.quantity))
+        .where(OrderProducts.order_id.in_(order_ids))
+        .group_by(OrderProducts.product_id)
+    ).all()
+    shards = dict(db.session.execute(
+        db.select(Product.product_id, Product.stock_shards)
+        .where(Product.product_id.in_([product_id for product_id, _ in items]),
+               Product.stock_shards > 0)
+    ).all())
+    return items, shards
+
+
+def release_orders_stock(order_ids: List[int]) -> None:
+    """
+    Возвращает на склад позиции отмененных заказов: одна агрегирующая
+    выборка и executemany-UPDATE остатков. Коммит — на вызывающем.
+    """
+    if not order_ids:
+        return
+    items, shards = _orders_items(order_ids)
+    release_stock(items, shards=shards)
+
+
+def reserve_orders_stock(order_ids: List[int]) -> None:
+    """
+    Снова списывает остатки под заказы, выходящие из отмены.
+    При нехватке бросает InsufficientStockError; откат — на вызывающем.
+    """
+    if not order_ids:
+        return
+    items, shards = _orders_items(order_ids)
+    reserve_stock({product_id: int(quantity) for product_id, quantity in items}, shards=shards)
+
+
+def expire_batch(batch_size: int) -> Tuple[int, List[int]]:
+    """
+    Отменяет одну пачку неоплаченных заказов с истекшим резервом.
+
+    Пачка выбирается по индексу StockHold.expires_at, поэтому проход
+    не читает таблицу заказов целиком. Заказы отменяются условным UPDATE,
+    и только реально отмененные возвращают остатки.
+    Возвращает (число обработанных резервов, id отмененных заказов).
+    """
+    now = datetime.utcnow()
+    holds = db.session.execute(
+        db.select(StockHold.order_id)
+        .where(StockHold.expires_at <= now)
+        .order_by(StockHold.expires_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+    if not holds:
+        db.session.rollback()
+        return 0, []
+
+    order_table = Order.__table__
+    cancelled = db.session.execute(
+        order_table.update()
+        .where(order_table.c.order_id.in_(holds),
+               order_table.c.status == 'pending',
+               order_table.c.payment_status != 'succeeded')
+        .values(status='cancelled')
+        .returning(order_table.c.order_id)
+    ).scalars().all()
+
+    release_orders_stock(cancelled)
+
+    # Резервы оплаченных или уже отмененных заказов просто удаляем
+    db.session.execute(
+        StockHold.__table__.delete().where(StockHold.order_id.in_(holds))
+    )
+    db.session.commit()
+    return len(holds), cancelled
+
+
+def expire_holds(batch_size: int, max_batches: int = 100) -> int:
+    """
+    Обрабатывает истекшие резервы пачками, пока они не закончатся
+    """
+    total = 0
+    for _ in range(max_batches):
+        processed, cancelled = expire_batch(batch_size)
+        total += len(cancelled)
+        if processed < batch_size:
+            break
+    return total
+
+
+def start_hold_sweeper(app) -> threading.Thread:
+    """
+    Запускает фоновый поток, периодически снимающий истекшие резервы
+    """
+    def run():
+        interval = app.config['ORDER_HOLD_SWEEP_INTERVAL']
+        batch_size = app.config['ORDER_HOLD_SWEEP_BATCH']
+        while True:
+            with app.app_context():
+                try:
+                    expired = expire_holds(batch_size)
+                    if expired:
+                        app.logger.info(f"Expired {expired} unpaid orders")
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.error(f"Error expiring stock holds: {str(e)}")
+                finally:
+                    db.session.remove()
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name='stock-hold-sweeper', daemon=True)
+    thread.start()
+    return thread
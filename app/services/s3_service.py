@@ -1,39 +1,87 @@
+import os
+import threading
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config as BotoConfig
 from flask import current_app
 import uuid
 
+# Клиент boto3 потокобезопасен, но дорог в создании: держим один на процесс.
+# pid нужен, чтобы после fork (gunicorn --preload) не делить пул соединений с родителем.
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
 def get_s3_client():
-    return boto3.client(
-        's3',
-        aws_access_key_id=current_app.config['AWS_ACCESS_KEY_ID'],
-        aws_secret_access_key=current_app.config['AWS_SECRET_ACCESS_KEY'],
-        region_name=current_app.config['AWS_REGION']
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _client_lock:
+            if _client is None or _client_pid != os.getpid():
+                # Отдельная сессия: создание клиента через общую сессию boto3 не потокобезопасно
+                session = boto3.session.Session()
+                _client = session.client(
+                    's3',
+                    aws_access_key_id=current_app.config['AWS_ACCESS_KEY_ID'],
+                    aws_secret_access_key=current_app.config['AWS_SECRET_ACCESS_KEY'],
+                    region_name=current_app.config['AWS_REGION'],
+                    endpoint_url=current_app.config['S3_ENDPOINT_URL'],
+                    config=BotoConfig(
+                        max_pool_connections=current_app.config['S3_MAX_POOL_CONNECTIONS'],
+                        connect_timeout=current_app.config['S3_CONNECT_TIMEOUT'],
+                        read_timeout=current_app.config['S3_READ_TIMEOUT'],
+                        retries={'max_attempts': current_app.config['S3_MAX_ATTEMPTS'], 'mode': 'standard'}
+                    )
+                )
+                _client_pid = os.getpid()
+    return _client
+
+def reset_s3_client():
+    """
+    Сбрасывает закэшированный клиент (после смены конфигурации)
+    """
+    global _client, _client_pid
+    with _client_lock:
+        _client = None
+        _client_pid = None
+
+def get_transfer_config():
+    """
+    Файлы больше порога грузятся multipart-загрузкой, части уходят параллельно
+    """
+    return TransferConfig(
+        multipart_threshold=current_app.config['S3_MULTIPART_THRESHOLD'],
+        multipart_chunksize=current_app.config['S3_MULTIPART_CHUNKSIZE'],
+        max_concurrency=current_app.config['S3_MAX_CONCURRENCY'],
+        use_threads=True
     )
 
 def upload_file_to_s3(file, folder="products"):
     """
-    Загружает файл в S3 и возвращает URL
+    Загружает файл в S3 и возвращает URL.
+
+    Содержимое читается из потока частями, без загрузки всего файла в память.
     """
     try:
         s3_client = get_s3_client()
-        
+
         file_extension = file.filename.rsplit('.', 1)[1].lower()
         unique_filename = f"{folder}/{uuid.uuid4()}.{file_extension}"
-        
+
         # Загружаем файл
         s3_client.upload_fileobj(
-            file,
+            file.stream,
             current_app.config['S3_BUCKET'],
             unique_filename,
             ExtraArgs={
                 'ACL': 'public-read',
                 'ContentType': file.content_type
-            }
+            },
+            Config=get_transfer_config()
         )
 
         file_url = f"{current_app.config['S3_BUCKET_URL']}/{unique_filename}"
         return file_url
-        
+
     except Exception as e:
         current_app.logger.error(f"Error uploading file to S3: {str(e)}")
-        raise 
\ No newline at end of file
+        raise
@@ -0,0 +1,274 @@
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Float, Integer, Numeric, String, text
+
+from app.extensions import db
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+RESULT_COLUMNS = {
+    'product_id': Integer,
+    'name': String,
+    'price': Numeric(10, 2),
+    'image_url': String,
+    'score': Float,
+}
+
+SQLITE_SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5(
+        name, description,
+        content='product', content_rowid='product_id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    "CREATE VIRTUAL TABLE IF NOT EXISTS product_fts_vocab USING fts5vocab(product_fts, 'row')",
+    # Триггеры поддерживают индекс инкрементально при любой записи в product
+    """
+    CREATE TRIGGER IF NOT EXISTS product_fts_ai AFTER INSERT ON product BEGIN
+        INSERT INTO product_fts(rowid, name, description)
+        VALUES (new.product_id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS product_fts_ad AFTER DELETE ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, name, description)
+        VALUES ('delete', old.product_id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS product_fts_au AFTER UPDATE OF name, description ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, name, description)
+        VALUES ('delete', old.product_id, old.name, old.description);
+        INSERT INTO product_fts(rowid, name, description)
+        VALUES (new.product_id, new.name, new.description);
+    END
+    """,
+]
+
+PG_DOCUMENT = "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, ''))"
+
+POSTGRES_SCHEMA = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS ix_product_search_tsv ON product USING gin ({PG_DOCUMENT})",
+    "CREATE INDEX IF NOT EXISTS ix_product_name_trgm ON product USING gin (name gin_trgm_ops)",
+]
+
+
+def _fold(term: str) -> str:
+    """
+    Приводит слово к виду из словаря FTS5: unicode61 снимает диакритику
+    только с латиницы (café -> cafe), кириллица остается как есть
+    """
+    folded = []
+    for ch in term.lower():
+        base = unicodedata.normalize('NFD', ch)[0]
+        folded.append(base if ch.isascii() is False and base.isascii() else ch)
+    return ''.join(folded)
+
+
+def _max_typos(term: str) -> int:
+    if len(term) <= 3:
+        return 0
+    if len(term) <= 6:
+        return 1
+    return 2
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Расстояние Дамерау-Левенштейна с ранним выходом при превышении limit
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev_prev = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev_prev is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev_prev[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev_prev, prev = prev, cur
+    return prev[-1]
+
+
+class SearchService:
+    """
+    Полнотекстовый поиск по Product.name и Product.description.
+
+    SQLite: FTS5 с ранжированием bm25, префиксными индексами и исправлением
+    опечаток по словарю fts5vocab. PostgreSQL: GIN-индекс по tsvector
+    с ts_rank_cd и триграммный индекс pg_trgm для нечеткого совпадения.
+    """
+
+    def __init__(self) -> None:
+        self.default_limit = 20
+        self.max_limit = 100
+        self.max_candidates = 3
+        self.typo_scan_limit = 50000
+        self._ready = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        """Initialize the service with app configuration"""
+        self.default_limit = app.config['SEARCH_DEFAULT_LIMIT']
+        self.max_limit = app.config['SEARCH_MAX_LIMIT']
+        self.max_candidates = app.config['SEARCH_TYPO_CANDIDATES']
+        self.typo_scan_limit = app.config['SEARCH_TYPO_SCAN_LIMIT']
+
+    @property
+    def dialect(self) -> str:
+        return db.engine.dialect.name
+
+    def ensure_index(self) -> None:
+        """
+        Создает поисковый индекс, если его еще нет (один раз на процесс)
+        """
+        key = str(db.engine.url)
+        if key in self._ready:
+            return
+        with self._lock:
+            if key in self._ready:
+                return
+            if self.dialect == 'sqlite':
+                exists = db.session.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'product_fts'"
+                )).first()
+                for statement in SQLITE_SCHEMA:
+                    db.session.execute(text(statement))
+                if not exists:
+                    db.session.execute(text("INSERT INTO product_fts(product_fts) VALUES ('rebuild')"))
+            elif self.dialect == 'postgresql':
+                for statement in POSTGRES_SCHEMA:
+                    db.session.execute(text(statement))
+            db.session.commit()
+            self._ready.add(key)
+
+    def rebuild_index(self) -> None:
+        """
+        Полностью перестраивает индекс (после массовых изменений в обход триггеров)
+        """
+        self.ensure_index()
+        if self.dialect == 'sqlite':
+            db.session.execute(text("INSERT INTO product_fts(product_fts) VALUES ('rebuild')"))
+            db.session.execute(text("INSERT INTO product_fts(product_fts) VALUES ('optimize')"))
+        elif self.dialect == 'postgresql':
+            db.session.execute(text("REINDEX INDEX ix_product_search_tsv"))
+            db.session.execute(text("REINDEX INDEX ix_product_name_trgm"))
+        db.session.commit()
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Ищет активные товары по запросу и возвращает их в порядке релевантности
+        """
+        terms = [_fold(t) for t in TOKEN_RE.findall(query or '')]
+        if not terms:
+            return []
+        limit = max(1, min(limit or self.default_limit, self.max_limit))
+
+        self.ensure_index()
+        if self.dialect == 'sqlite':
+            return self._search_sqlite(terms, limit)
+        if self.dialect == 'postgresql':
+            return self._search_postgres(terms, limit)
+        raise RuntimeError(f"Search is not supported for dialect {self.dialect}")
+
+    def _typo_candidates(self, term: str) -> List[str]:
+        max_typos = _max_typos(term)
+        if max_typos == 0:
+            return []
+        lengths = {'min_len': len(term) - max_typos, 'max_len': len(term) + max_typos}
+        # Сначала сужаем словарь по первым двум буквам, затем по первой;
+        # опечатку в первой букве ловит последний проход — по всему словарю
+        # в пределах длины, не больше typo_scan_limit слов
+        passes = [(
+            "SELECT term, doc FROM product_fts_vocab "
+            "WHERE term >= :lo AND term < :hi AND length(term) BETWEEN :min_len AND :max_len",
+            {'lo': prefix, 'hi': prefix + '\U0010ffff', **lengths}
+        ) for prefix in (term[:2], term[:1])]
+        passes.append((
+            "SELECT term, doc FROM product_fts_vocab "
+            "WHERE length(term) BETWEEN :min_len AND :max_len AND substr(term, 1, 1) != :first "
+            "LIMIT :scan_limit",
+            {'first': term[:1], 'scan_limit': self.typo_scan_limit, **lengths}
+        ))
+        for sql, params in passes:
+            rows = db.session.execute(text(sql), params).all()
+            scored = []
+            for candidate, doc in rows:
+                distance = _edit_distance(term, candidate, max_typos)
+                if distance <= max_typos:
+                    scored.append((distance, -doc, candidate))
+            if scored:
+                scored.sort()
+                return [candidate for _, _, candidate in scored[:self.max_candidates]]
+        return []
+
+    def _has_prefix(self, term: str) -> bool:
+        return db.session.execute(text(
+            "SELECT 1 FROM product_fts_vocab WHERE term >= :lo AND term < :hi LIMIT 1"
+        ), {'lo': term, 'hi': term + '\U0010ffff'}).first() is not None
+
+    def _sqlite_match_expression(self, terms: List[str], operator: str) -> str:
+        groups = []
+        for term in terms:
+            variants = [f'"{term}"*']
+            if not self._has_prefix(term):
+                variants += [f'"{candidate}"' for candidate in self._typo_candidates(term)]
+            groups.append('(' + ' OR '.join(variants) + ')')
+        return f' {operator} '.join(groups)
+
+    def _search_sqlite(self, terms: List[str], limit: int) -> List[Dict[str, Any]]:
+        sql = text(
+            "SELECT p.product_id, p.name, p.price, p.image_url, "
+            "bm25(product_fts, 10.0, 1.0) AS score "
+            "FROM product_fts JOIN product p ON p.product_id = product_fts.rowid "
+            "WHERE product_fts MATCH :match AND p.is_active = 1 "
+            "ORDER BY score LIMIT :limit"
+        ).columns(**RESULT_COLUMNS)
+        rows = db.session.execute(sql, {
+            'match': self._sqlite_match_expression(terms, 'AND'), 'limit': limit
+        }).all()
+        if not rows and len(terms) > 1:
+            rows = db.session.execute(sql, {
+                'match': self._sqlite_match_expression(terms, 'OR'), 'limit': limit
+            }).all()
+        # bm25 в SQLite отрицателен: чем меньше, тем релевантнее
+        return [self._row_to_dict(row, -row.score) for row in rows]
+
+    def _search_postgres(self, terms: List[str], limit: int) -> List[Dict[str, Any]]:
+        raw = ' '.join(terms)
+        tsquery = ' & '.join(f"{term}:*" for term in terms)
+        rows = db.session.execute(text(
+            "SELECT product_id, name, price, image_url, "
+            f"ts_rank_cd({PG_DOCUMENT}, query) * 2 + word_similarity(:raw, name) AS score "
+            "FROM product, to_tsquery('simple', :tsquery) AS query "
+            f"WHERE is_active AND ({PG_DOCUMENT} @@ query OR :raw <% name) "
+            "ORDER BY score DESC LIMIT :limit"
+        ).columns(**RESULT_COLUMNS), {'raw': raw, 'tsquery': tsquery, 'limit': limit}).all()
+        return [self._row_to_dict(row, row.score) for row in rows]
+
+    @staticmethod
+    def _row_to_dict(row, score: float) -> Dict[str, Any]:
+        return {
+            'product_id': row.product_id,
+            'name': row.name,
+            'price': str(row.price),
+            'image_url': row.image_url,
+            'score': round(float(score), 4)
+        }
+
+
+search_service = SearchService()
+
+
+def init_search_service(app) -> None:
+    search_service.init_app(app)
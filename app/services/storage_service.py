@@ -0,0 +1,136 @@
+import hashlib
+import os
+import re
+import tempfile
+
+from botocore.exceptions import ClientError
+from flask import current_app, request
+
+from app.services.s3_service import get_s3_client, get_transfer_config
+
+CHUNK_SIZE = 64 * 1024
+# Содержимое по адресу не меняется, поэтому кэшировать можно «навсегда»
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DIGEST_NAME = re.compile(r'/[0-9a-f]{2}/[0-9a-f]{64}\.[a-z0-9]+$')
+
+
+def _extension(filename: str) -> str:
+    return filename.rsplit('.', 1)[1].lower()
+
+
+def _relative_path(folder: str, digest: str, extension: str) -> str:
+    # Двухсимвольный префикс не дает одной директории разрастись до миллионов файлов
+    return f"{folder}/{digest[:2]}/{digest}.{extension}"
+
+
+def _copy_hashing(source, target) -> str:
+    """
+    Копирует поток частями, попутно считая sha256
+    """
+    digest = hashlib.sha256()
+    while True:
+        chunk = source.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        target.write(chunk)
+    return digest.hexdigest()
+
+
+class LocalStorage:
+    """
+    Файлы в static/uploads под именем sha256 содержимого
+    """
+
+    def save(self, file, folder: str) -> str:
+        upload_root = os.path.join(current_app.static_folder, 'uploads')
+        os.makedirs(os.path.join(upload_root, folder), exist_ok=True)
+        # Временный файл в той же ФС, чтобы os.replace был атомарным
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(upload_root, folder), prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                digest = _copy_hashing(file.stream, tmp)
+            relative = _relative_path(folder, digest, _extension(file.filename))
+            target = os.path.join(upload_root, relative)
+            if os.path.exists(target):
+                os.unlink(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(tmp_path, target)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return f"/static/uploads/{relative}"
+
+
+class S3Storage:
+    """
+    Объекты в S3 под ключом sha256 содержимого.
+
+    Ключ известен только после чтения всего потока, поэтому файл
+    сначала проходит через временный файл (в памяти до 1 МБ).
+    """
+
+    def save(self, file, folder: str) -> str:
+        bucket = current_app.config['S3_BUCKET']
+        with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as tmp:
+            digest = _copy_hashing(file.stream, tmp)
+            key = _relative_path(folder, digest, _extension(file.filename))
+            s3_client = get_s3_client()
+            if not self._exists(s3_client, bucket, key):
+                tmp.seek(0)
+                s3_client.upload_fileobj(
+                    tmp,
+                    bucket,
+                    key,
+                    ExtraArgs={
+                        'ACL': 'public-read',
+                        'ContentType': file.content_type,
+                        'CacheControl': IMMUTABLE_CACHE_CONTROL
+                    },
+                    Config=get_transfer_config()
+                )
+        return f"{current_app.config['S3_BUCKET_URL']}/{key}"
+
+    @staticmethod
+    def _exists(s3_client, bucket: str, key: str) -> bool:
+        try:
+            s3_client.head_object(Bucket=bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+
+BACKENDS = {'local': LocalStorage, 's3': S3Storage}
+
+
+def get_storage():
+    return BACKENDS[current_app.config['IMAGE_STORAGE']]()
+
+
+def store_image(file, folder: str = "products") -> str:
+    """
+    Сохраняет изображение по адресу его содержимого и возвращает URL.
+    Повторная загрузка того же файла не пишет ничего и дает тот же URL.
+    """
+    try:
+        return get_storage().save(file, folder)
+    except Exception as e:
+        current_app.logger.error(f"Error storing file: {str(e)}")
+        raise
+
+
+def init_storage(app) -> None:
+    if app.config['IMAGE_STORAGE'] not in BACKENDS:
+        raise ValueError(f"Unknown IMAGE_STORAGE: {app.config['IMAGE_STORAGE']}")
+
+    @app.after_request
+    def immutable_upload_cache(response):
+        # Локальные файлы с именем-хешем отдаются с far-future заголовками
+        if (response.status_code in (200, 304) and request.path.startswith('/static/uploads/')
+                and DIGEST_NAME.search(request.path)):
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
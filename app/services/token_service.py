@@ -0,0 +1,220 @@
+import hashlib
+import math
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models import RevokedToken, User
+from app.services.cache_service import LRUCache
+
+
+class BloomFilter:
+    """
+    Битовый фильтр Блума: без ложноотрицательных ответов, с долей ложноположительных error_rate
+    """
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value: str) -> None:
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class TokenDenylist:
+    """
+    Список отозванных jti для stateless-токенов.
+
+    В памяти процесса хранится фильтр Блума по всем отозванным jti.
+    Срабатывание фильтра подтверждается запросом к БД (с кэшем),
+    поэтому подавляющее большинство проверок не трогает БД вовсе.
+    Отзыв сразу пишется в таблицу revoked_token, а новые записи
+    других воркеров подтягиваются инкрементально по created_at
+    не реже раза в sync_interval.
+    """
+
+    def __init__(self) -> None:
+        self.capacity = 100000
+        self.error_rate = 0.001
+        self.sync_interval = 5.0
+        self.reload_interval = 3600.0
+        self._bloom = BloomFilter(self.capacity, self.error_rate)
+        self._confirmed = LRUCache(maxsize=10000, ttl=300)
+        self._last_seen: Optional[datetime] = None
+        self._next_sync = 0.0
+        self._next_reload = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        """Настраивает denylist по конфигу приложения"""
+        self.capacity = app.config['JWT_DENYLIST_CAPACITY']
+        self.error_rate = app.config['JWT_DENYLIST_ERROR_RATE']
+        self.sync_interval = app.config['JWT_DENYLIST_SYNC_INTERVAL']
+        self.reload_interval = app.config['JWT_DENYLIST_RELOAD_INTERVAL']
+        self._bloom = BloomFilter(self.capacity, self.error_rate)
+        self._next_sync = self._next_reload = 0.0
+
+    def revoke(self, *tokens: Tuple[str, datetime]) -> int:
+        """
+        Сохраняет отзывы (jti, expires_at) до возврата из запроса: отложенная
+        запись терялась бы при падении воркера, а другие воркеры не видели бы
+        отзыв, пока не наберется пачка
+        """
+        jtis = [jti for jti, _ in tokens]
+        if not jtis:
+            return 0
+        table = RevokedToken.__table__
+        existing = set(db.session.execute(
+            db.select(table.c.jti).where(table.c.jti.in_(jtis))
+        ).scalars())
+        now = datetime.utcnow()
+        rows = [
+            {'jti': jti, 'expires_at': expires_at, 'created_at': now}
+            for jti, expires_at in dict(tokens).items() if jti not in existing
+        ]
+        if rows:
+            try:
+                db.session.execute(table.insert(), rows)
+                db.session.commit()
+            except IntegrityError:
+                # Тот же jti параллельно отозвал другой запрос — запись уже есть
+                db.session.rollback()
+        with self._lock:
+            for jti in jtis:
+                self._bloom.add(jti)
+        for jti in jtis:
+            self._confirmed.set(jti, True)
+        return len(rows)
+
+    def is_revoked(self, *jtis: Optional[str]) -> bool:
+        """
+        True, если отозван хотя бы один из jti (токен или его сессия)
+        """
+        self.sync()
+        with self._lock:
+            candidates = [jti for jti in jtis if jti and jti in self._bloom]
+        for jti in candidates:
+            confirmed = self._confirmed.get(jti)
+            if confirmed is None:
+                confirmed = db.session.get(RevokedToken, jti) is not None
+                self._confirmed.set(jti, confirmed)
+            if confirmed:
+                return True
+        return False
+
+    def sync(self, force: bool = False) -> None:
+        """
+        Подтягивает отзывы других воркеров: не чаще раза в sync_interval
+        """
+        now = time.monotonic()
+        if not force and now < self._next_sync:
+            return
+        with self._lock:
+            if not force and now < self._next_sync:
+                return
+            self._next_sync = now + self.sync_interval
+            reload = force or now >= self._next_reload
+            if reload:
+                self._next_reload = now + self.reload_interval
+
+        table = RevokedToken.__table__
+        query = db.select(table.c.jti, table.c.created_at).where(table.c.expires_at > datetime.utcnow())
+        if not reload and self._last_seen is not None:
+            # Небольшой перехват назад покрывает расхождение часов между воркерами
+            query = query.where(table.c.created_at >= self._last_seen - timedelta(seconds=5))
+        rows = db.session.execute(query).all()
+        db.session.rollback()
+
+        with self._lock:
+            if reload:
+                self._bloom = BloomFilter(max(self.capacity, len(rows) * 2), self.error_rate)
+            for jti, created_at in rows:
+                self._bloom.add(jti)
+                self._confirmed.delete(jti)
+                if self._last_seen is None or created_at > self._last_seen:
+                    self._last_seen = created_at
+
+    def purge_expired(self, batch_size: int = 1000) -> int:
+        table = RevokedToken.__table__
+        total = 0
+        while True:
+            jtis = db.session.execute(
+                db.select(table.c.jti).where(table.c.expires_at < datetime.utcnow()).limit(batch_size)
+            ).scalars().all()
+            if not jtis:
+                db.session.rollback()
+                return total
+            db.session.execute(table.delete().where(table.c.jti.in_(jtis)))
+            db.session.commit()
+            total += len(jtis)
+
+
+denylist = TokenDenylist()
+
+
+# Срок жизни refresh-токена, а с ним и сессии входа
+REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+
+
+def init_token_service(app, jwt) -> None:
+    denylist.init_app(app)
+
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload) -> bool:
+        return denylist.is_revoked(jwt_payload['jti'], jwt_payload.get('sid'))
+
+
+def session_claims(jwt_payload: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+    """
+    Идентификатор сессии входа (sid) — общий для refresh-токена и всех
+    access-токенов, выпущенных по нему. Отзыв sid гасит всю пару разом.
+    Без jwt_payload начинается новая сессия, иначе sid переносится из токена.
+    """
+    if jwt_payload is None:
+        return {'sid': uuid.uuid4().hex}
+    return {'sid': jwt_payload['sid']} if 'sid' in jwt_payload else {}
+
+
+def revoke_token(jwt_payload) -> None:
+    """
+    Отзывает предъявленный токен и его сессию: после выхода не работают
+    ни access-, ни refresh-токен пары
+    """
+    expires_at = datetime.fromtimestamp(jwt_payload['exp'], tz=timezone.utc).replace(tzinfo=None)
+    tokens = [(jwt_payload['jti'], expires_at)]
+    if jwt_payload.get('sid'):
+        if jwt_payload.get('type') == 'refresh':
+            session_expires_at = expires_at
+        else:
+            # Сессия живет не дольше refresh-токена, выпущенного не позже этого access-токена
+            issued_at = datetime.fromtimestamp(jwt_payload['iat'], tz=timezone.utc).replace(tzinfo=None)
+            session_expires_at = issued_at + REFRESH_TOKEN_EXPIRES
+        tokens.append((jwt_payload['sid'], session_expires_at))
+    denylist.revoke(*tokens)
+
+
+def remember_tokens(user: User, access_token: str, refresh_token: Optional[str]) -> None:
+    """
+    В stateless-режиме токены не сохраняются: отзыв идет по jti через denylist.
+    Иначе — прежнее поведение с записью токенов в строку пользователя.
+    """
+    if current_app.config['JWT_STATELESS_TOKENS']:
+        return
+    user.update_tokens(access_token, refresh_token)
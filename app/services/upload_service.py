@@ -0,0 +1,155 @@
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from botocore.exceptions import ClientError
+from flask import current_app
+
+from app.extensions import db
+from app.models import Product
+from app.services.s3_service import get_s3_client
+
+# Расширение -> Content-Type, который разрешено загружать напрямую в S3
+IMAGE_CONTENT_TYPES = {
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'gif': 'image/gif'
+}
+
+# Ключи, которые выдает create_presigned_upload: products/<id>/<uuid>.<ext>
+UPLOAD_KEY_RE = re.compile(r'^products/\d+/[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.\w+$')
+
+
+class UploadError(Exception):
+    """Некорректный запрос на загрузку или загруженный объект не прошел проверку"""
+
+
+def direct_uploads_enabled() -> bool:
+    return bool(current_app.config['S3_BUCKET'])
+
+
+def _key_prefix(product_id: int) -> str:
+    return f"products/{product_id}/"
+
+
+def create_presigned_upload(product_id: int, filename: str, size: Optional[int] = None,
+                            method: str = 'post') -> Dict[str, Any]:
+    """
+    Выдает подписанный URL для загрузки изображения товара напрямую в S3.
+
+    POST-форма ограничивает размер и Content-Type условиями политики.
+    Для PUT размер и тип входят в подпись, поэтому клиент обязан
+    передать их заранее и отправить ровно такие заголовки.
+    """
+    if '.' not in filename:
+        raise UploadError('File type not allowed')
+    extension = filename.rsplit('.', 1)[1].lower()
+    content_type = IMAGE_CONTENT_TYPES.get(extension)
+    if content_type is None:
+        raise UploadError('File type not allowed')
+
+    max_size = current_app.config['S3_UPLOAD_MAX_SIZE']
+    expires_in = current_app.config['S3_UPLOAD_URL_TTL']
+    bucket = current_app.config['S3_BUCKET']
+    key = f"{_key_prefix(product_id)}{uuid.uuid4()}.{extension}"
+    s3_client = get_s3_client()
+
+    if method == 'post':
+        presigned = s3_client.generate_presigned_post(
+            bucket,
+            key,
+            Fields={'acl': 'public-read', 'Content-Type': content_type},
+            Conditions=[
+                {'acl': 'public-read'},
+                {'Content-Type': content_type},
+                ['content-length-range', 1, max_size]
+            ],
+            ExpiresIn=expires_in
+        )
+        return {'method': 'POST', 'key': key, 'url': presigned['url'],
+                'fields': presigned['fields'], 'max_size': max_size, 'expires_in': expires_in}
+
+    if method == 'put':
+        if not isinstance(size, int) or not 0 < size <= max_size:
+            raise UploadError(f'Size must be between 1 and {max_size} bytes')
+        headers = {'Content-Type': content_type, 'Content-Length': str(size), 'x-amz-acl': 'public-read'}
+        url = s3_client.generate_presigned_url(
+            'put_object',
+            Params={'Bucket': bucket, 'Key': key, 'ContentType': content_type,
+                    'ContentLength': size, 'ACL': 'public-read'},
+            ExpiresIn=expires_in
+        )
+        return {'method': 'PUT', 'key': key, 'url': url, 'headers': headers,
+                'max_size': max_size, 'expires_in': expires_in}
+
+    raise UploadError("Method must be 'post' or 'put'")
+
+
+def complete_upload(product_id: int, key: str) -> str:
+    """
+    Проверяет загруженный объект и возвращает его публичный URL.
+    Ключ должен принадлежать товару, объект — существовать и пройти ограничения.
+    """
+    if not key or not key.startswith(_key_prefix(product_id)) or '..' in key:
+        raise UploadError('Key does not belong to this product')
+    try:
+        head = get_s3_client().head_object(Bucket=current_app.config['S3_BUCKET'], Key=key)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+            raise UploadError('Uploaded object not found')
+        raise
+    error = None
+    if head['ContentLength'] > current_app.config['S3_UPLOAD_MAX_SIZE']:
+        error = 'Uploaded file is too large'
+    elif head.get('ContentType') not in IMAGE_CONTENT_TYPES.values():
+        error = 'Uploaded file has a disallowed content type'
+    if error is not None:
+        # Отклоненный объект к товару уже не привяжется — не держим его в бакете
+        get_s3_client().delete_object(Bucket=current_app.config['S3_BUCKET'], Key=key)
+        raise UploadError(error)
+    return f"{current_app.config['S3_BUCKET_URL']}/{key}"
+
+
+def purge_unfinished_uploads(max_age: int) -> Dict[str, int]:
+    """
+    Удаляет прямые загрузки, которые так и не привязали к товару.
+
+    Объекты products/<id>/<uuid>.<ext> старше max_age секунд, на которые
+    не ссылается ни один Product.image_url (загрузку не завершили или
+    изображение потом заменили), удаляются пачками delete_objects.
+    Незавершенные multipart-загрузки под products/ старше max_age прерываются.
+    Возвращает {'deleted': ..., 'aborted': ...}.
+    """
+    bucket = current_app.config['S3_BUCKET']
+    s3_client = get_s3_client()
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_age)
+
+    candidates = []
+    for page in s3_client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix='products/'):
+        for obj in page.get('Contents', []):
+            if obj['LastModified'] < cutoff and UPLOAD_KEY_RE.match(obj['Key']):
+                candidates.append(obj['Key'])
+
+    # Ссылки читаются после листинга: загрузка, завершенная во время обхода, уже видна
+    bucket_url = current_app.config['S3_BUCKET_URL'] + '/'
+    referenced = {
+        url[len(bucket_url):] for url in db.session.execute(
+            db.select(Product.image_url).where(Product.image_url.startswith(bucket_url + 'products/'))
+        ).scalars()
+    }
+    db.session.rollback()
+    stale = [key for key in candidates if key not in referenced]
+    for start in range(0, len(stale), 1000):
+        s3_client.delete_objects(Bucket=bucket, Delete={
+            'Objects': [{'Key': key} for key in stale[start:start + 1000]], 'Quiet': True
+        })
+
+    aborted = 0
+    for page in s3_client.get_paginator('list_multipart_uploads').paginate(Bucket=bucket, Prefix='products/'):
+        for upload in page.get('Uploads', []):
+            if upload['Initiated'] < cutoff:
+                s3_client.abort_multipart_upload(Bucket=bucket, Key=upload['Key'], UploadId=upload['UploadId'])
+                aborted += 1
+    return {'deleted': len(stale), 'aborted': aborted}
@@ -1,9 +1,18 @@
 from typing import Dict, Any, Optional, Tuple
+import hashlib
 import requests
 from datetime import datetime, timedelta
+from flask import current_app
 from app import db
 from app.models import User
 from flask_jwt_extended import create_access_token, get_jwt_identity
+from app.services.cache_service import LRUCache
+from app.services.http_service import CircuitBreaker, CircuitOpenError, create_session
+from app.services.principal_service import role_claims
+from app.services.token_service import remember_tokens
+
+# Ошибка, которую маршруты отдают клиенту как 503
+UNAVAILABLE = 'temporarily_unavailable'
 
 class YandexAuthService:
     def __init__(self) -> None:
@@ -12,6 +21,56 @@ class YandexAuthService:
         self.token_url: str = "https://oauth.yandex.ru/token"
         self.userinfo_url: str = "https://login.yandex.ru/info"
         self.redirect_uri: str = "http://localhost:5000/auth/yandex/callback"
+        self.timeout: Tuple[float, float] = (3.0, 10.0)
+        self.session: requests.Session = create_session(pool_size=10, retries=2, backoff=0.2)
+        self.breaker = CircuitBreaker()
+        self.user_info_cache = LRUCache(maxsize=10000, ttl=60)
+
+    def init_app(self, app) -> None:
+        """
+        Настройки OAuth-клиента из конфига; URL можно направить на локальную заглушку
+        """
+        self.client_id = app.config['YANDEX_CLIENT_ID']
+        self.client_secret = app.config['YANDEX_CLIENT_SECRET']
+        self.token_url = app.config['YANDEX_OAUTH_URL'].rstrip('/') + '/token'
+        self.userinfo_url = app.config['YANDEX_LOGIN_URL'].rstrip('/') + '/info'
+        self.timeout = (app.config['YANDEX_CONNECT_TIMEOUT'], app.config['YANDEX_READ_TIMEOUT'])
+        self.session.close()
+        self.session = create_session(
+            pool_size=app.config['YANDEX_POOL_SIZE'],
+            retries=app.config['YANDEX_RETRIES'],
+            backoff=app.config['YANDEX_RETRY_BACKOFF']
+        )
+        self.breaker = CircuitBreaker(app.config['YANDEX_BREAKER_THRESHOLD'], app.config['YANDEX_BREAKER_RESET'])
+        self.user_info_cache.configure(app.config['YANDEX_USERINFO_CACHE_SIZE'], app.config['YANDEX_USERINFO_CACHE_TTL'])
+
+    def _request(self, method: str, url: str, **kwargs) -> Dict[str, Any]:
+        """
+        Запрос через общий session и предохранитель.
+        Сетевые ошибки и 5xx считаются отказом Яндекса, 4xx — нет.
+        """
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            return {'error': UNAVAILABLE}
+        try:
+            response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+        except requests.RequestException as e:
+            self.breaker.record_failure()
+            current_app.logger.warning(f"Yandex OAuth request to {url} failed: {str(e)}")
+            return {'error': UNAVAILABLE}
+        except BaseException:
+            # Любой другой сбой тоже закрывает пробный вызов, иначе предохранитель не сбросится
+            self.breaker.record_failure()
+            raise
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+            return {'error': UNAVAILABLE}
+        self.breaker.record_success()
+        try:
+            return response.json()
+        except ValueError:
+            return {'error': f'Invalid response from Yandex ({response.status_code})'}
 
     def get_access_token(self, code: str) -> Dict[str, Any]:
         data = {
@@ -20,21 +79,21 @@ class YandexAuthService:
             'client_id': self.client_id,
             'client_secret': self.client_secret
         }
-        try:
-            response = requests.post(self.token_url, data=data)
-            return response.json()
-        except Exception as e:
-            return {'error': str(e)}
+        return self._request('POST', self.token_url, data=data)
 
     def get_user_info(self, access_token: str) -> Dict[str, Any]:
+        # Ключ — хеш токена, чтобы сами токены не лежали в памяти
+        key = hashlib.sha256(access_token.encode()).hexdigest()
+        user_info = self.user_info_cache.get(key)
+        if user_info is not None:
+            return user_info
         headers = {
             'Authorization': f'OAuth {access_token}'
         }
-        try:
-            response = requests.get(self.userinfo_url, headers=headers)
-            return response.json()
-        except Exception as e:
-            return {'error': str(e)}
+        user_info = self._request('GET', self.userinfo_url, headers=headers)
+        if 'error' not in user_info:
+            self.user_info_cache.set(key, user_info)
+        return user_info
 
     def create_or_update_user(self, user_info: Dict[str, Any], current_user_id: Optional[int] = None) -> Tuple[User, bool]:
         """
@@ -82,9 +141,10 @@ class YandexAuthService:
     def create_jwt_token(self, user: User) -> str:
         access_token = create_access_token(
             identity=str(user.user_id),
+            additional_claims=role_claims(user),
             expires_delta=timedelta(days=7)
         )
-        user.update_tokens(access_token, None)  # Для Яндекс авторизации refresh token не нужен
+        remember_tokens(user, access_token, None)  # Для Яндекс авторизации refresh token не нужен
         return access_token
 
     def validate_token(self, user: User) -> bool:
@@ -94,8 +154,9 @@ class YandexAuthService:
         if not user.is_token_valid:
             new_token = create_access_token(
                 identity=str(user.user_id),
+                additional_claims=role_claims(user),
                 expires_delta=timedelta(days=7)
             )
-            user.update_tokens(new_token, None)
+            remember_tokens(user, new_token, None)
             return new_token
         return None 
\ No newline at end of file
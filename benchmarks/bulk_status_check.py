@@ -0,0 +1,147 @@
+"""
+Проверка массовых операций админки:
+
+  - отмена возможна только из pending/processing: from_status без таких
+    статусов — 400, отгруженный заказ не отменяется и товар не возвращается;
+  - отмена разрешенного заказа возвращает товар на склад;
+  - смена статуса одного заказа следует тем же правилам: отгруженный не
+    отменяется, отмененный оживает только с from_status и списывает товар;
+  - товар, у которого не хватило шардированного остатка, не меняется
+    целиком: ни цена, ни версия (updated_at).
+
+    python benchmarks/bulk_status_check.py --database-url sqlite:////tmp/bulk_check.db
+
+Скрипт пересоздает все таблицы в указанной базе — используйте отдельную БД.
+При нарушении — код выхода 1.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from app.extensions import db
+from app.models import Order, OrderProducts, Product, User
+from app.services.inventory_service import enable_sharding
+from app.services.principal_service import role_claims
+
+
+def check(name, condition, failures):
+    print(f'  {"OK  " if condition else "FAIL"} {name}')
+    if not condition:
+        failures.append(name)
+
+
+def make_order(user, products, status, quantity=2):
+    """
+    Заказ по одному товару каждого вида; остаток уже списан, как при оформлении
+    """
+    order = Order(user_id=user.user_id, status=status, payment_status='pending',
+                  total_amount=quantity * len(products))
+    db.session.add(order)
+    db.session.flush()
+    for product in products:
+        db.session.add(OrderProducts(order_id=order.order_id, product_id=product.product_id, quantity=quantity))
+        product.stock_quantity -= quantity
+    db.session.commit()
+    return order.order_id
+
+
+def state(order_id, product_ids):
+    db.session.rollback()
+    status = db.session.get(Order, order_id).status
+    return status, [db.session.get(Product, product_id).stock_quantity for product_id in product_ids]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', required=True)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url
+    app = create_app()
+    app.config['SQLALCHEMY_DATABASE_URI'] = args.database_url
+    client = app.test_client()
+    failures = []
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        admin = User(username='admin', email='admin@example.com', role='admin')
+        buyer = User(username='buyer', email='buyer@example.com', role='customer')
+        products = [Product(name=f'coffee {i}', price=10, stock_quantity=10) for i in range(2)]
+        db.session.add_all([admin, buyer] + products)
+        db.session.commit()
+        product_ids = [product.product_id for product in products]
+        headers = {'Authorization': f'Bearer {create_access_token(identity=str(admin.user_id), additional_claims=role_claims(admin))}'}
+
+        def bulk(body):
+            return client.post('/admin/orders/bulk-status', json=body, headers=headers)
+
+        print('cancel guard')
+        shipped = make_order(buyer, products, 'shipped')
+        response = bulk({'order_ids': [shipped], 'status': 'cancelled', 'from_status': ['shipped']})
+        check(f'from_status without cancellable statuses is rejected ({response.status_code})',
+              response.status_code == 400, failures)
+        check('shipped order keeps its status and stock', state(shipped, product_ids) == ('shipped', [8, 8]), failures)
+
+        response = bulk({'order_ids': [shipped], 'status': 'cancelled'})
+        check('shipped order is a conflict without from_status',
+              response.status_code == 200 and response.get_json()['results'][str(shipped)] == 'conflict', failures)
+        check('stock is not released for the shipped order', state(shipped, product_ids) == ('shipped', [8, 8]), failures)
+
+        pending = make_order(buyer, products, 'pending')
+        response = bulk({'order_ids': [pending], 'status': 'cancelled', 'from_status': ['pending', 'shipped']})
+        check('pending order is cancelled', response.get_json()['results'][str(pending)] == 'updated', failures)
+        check('its stock is released', state(pending, product_ids) == ('cancelled', [8, 8]), failures)
+
+        print('single order status')
+
+        def single(order_id, body):
+            return client.post(f'/admin/change_order_status/{order_id}', json=body, headers=headers)
+
+        response = single(shipped, {'status': 'cancelled'})
+        check(f'shipped order cannot be cancelled ({response.status_code})', response.status_code == 409, failures)
+        check('shipped order keeps its stock', state(shipped, product_ids) == ('shipped', [8, 8]), failures)
+
+        pending = make_order(buyer, products, 'pending')
+        response = single(pending, {'status': 'cancelled'})
+        check('pending order is cancelled', response.status_code == 200, failures)
+        check('its stock is released', state(pending, product_ids) == ('cancelled', [8, 8]), failures)
+
+        response = single(pending, {'status': 'processing'})
+        check(f'cancelled order is not revived implicitly ({response.status_code})',
+              response.status_code == 409 and state(pending, product_ids) == ('cancelled', [8, 8]), failures)
+        response = single(pending, {'status': 'processing', 'from_status': ['cancelled']})
+        check('cancelled order is revived with from_status', response.status_code == 200, failures)
+        check('its stock is taken again', state(pending, product_ids) == ('processing', [6, 6]), failures)
+
+        check('missing order is 404', single(10 ** 6, {'status': 'shipped'}).status_code == 404, failures)
+        check('invalid status is 400', single(pending, {}).status_code == 400, failures)
+
+        print('bulk adjust')
+        sharded = Product(name='sharded', price=10, stock_quantity=4)
+        db.session.add(sharded)
+        db.session.commit()
+        enable_sharding(sharded.product_id, 2)
+        db.session.rollback()
+        before = db.session.get(Product, sharded.product_id)
+        price, version = before.price, before.updated_at
+        response = client.post('/admin/products/bulk', headers=headers, json={'items': [
+            {'product_id': sharded.product_id, 'price_delta': '1.00', 'stock_delta': -10}
+        ]})
+        check('shortage is reported',
+              response.get_json()['results'][str(sharded.product_id)] == 'insufficient_stock', failures)
+        db.session.rollback()
+        after = db.session.get(Product, sharded.product_id)
+        check('price is restored', after.price == price, failures)
+        check('updated_at is restored', after.updated_at == version, failures)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Сериализация ответа API без базы: страница товаров и платежей.
+
+  - hand-written + json: словарь собирается вручную (прежний to_dict), стандартный json
+  - compiled + json:     скомпилированный сериализатор read_model_service, стандартный json
+  - compiled + orjson:   тот же сериализатор и FastJSONProvider
+  - rows + orjson:       сериализатор по кортежам колонок (путь read_model_service)
+
+    python benchmarks/json_bench.py
+    python benchmarks/json_bench.py --rows 1000 --repeat 200
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.json.provider import DefaultJSONProvider
+
+from app import create_app
+from app.models import Payment, Product
+from app.services.json_service import FastJSONProvider, orjson
+from app.services.read_model_service import ADMIN_PRODUCT, PAYMENT
+
+
+def product_to_dict(product):
+    return {
+        'product_id': product.product_id,
+        'sku': product.sku,
+        'name': product.name,
+        'description': product.description,
+        'price': float(product.price),
+        'category_id': product.category_id,
+        'image_url': product.image_url,
+        'image_variants': product.image_variants or {},
+        'stock_quantity': product.stock_quantity,
+        'is_active': product.is_active,
+        'created_at': product.created_at.isoformat(),
+        'updated_at': product.updated_at.isoformat()
+    }
+
+
+def payment_to_dict(payment):
+    return {
+        'payment_id': payment.payment_id,
+        'order_id': payment.order_id,
+        'user_id': payment.user_id,
+        'amount': float(payment.amount),
+        'currency': payment.currency,
+        'status': payment.status,
+        'payment_method': payment.payment_method,
+        'payment_details': payment.payment_details,
+        'error_code': payment.error_code,
+        'error_description': payment.error_description,
+        'created_at': payment.created_at.isoformat(),
+        'updated_at': payment.updated_at.isoformat(),
+        'paid_at': payment.paid_at.isoformat() if payment.paid_at else None
+    }
+
+
+def make_products(count):
+    now = datetime.utcnow()
+    return [Product(
+        product_id=i, sku=f'sku-{i}', name=f'Кофе {i}', description='Свежая обжарка, ноты шоколада',
+        price=Decimal('100.50') + i, category_id=f'cat-{i % 20}', image_url=f'/static/uploads/{i}.jpg',
+        image_variants={'320': {'webp': f'/static/uploads/{i}-320.webp'}}, stock_quantity=i % 50,
+        is_active=True, created_at=now, updated_at=now
+    ) for i in range(count)]
+
+
+def make_payments(count):
+    now = datetime.utcnow()
+    return [Payment(
+        payment_id=f'pay-{i}', order_id=i, user_id=i % 100, amount=Decimal('1500.00'), currency='RUB',
+        status='succeeded', payment_method='bank_card', payment_details={'card': '4444'},
+        created_at=now, updated_at=now, paid_at=now
+    ) for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+
+    app = create_app()
+    std = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app) if orjson is not None else None
+    products = make_products(args.rows)
+    payments = make_payments(args.rows)
+
+    with app.app_context():
+        for name, objects, legacy, model in (('products', products, product_to_dict, ADMIN_PRODUCT),
+                                             ('payments', payments, payment_to_dict, PAYMENT)):
+            dump = model.dumper()
+            serialize = model.serializer(model.default)
+            # Строки, как их возвращает колоночный запрос read_model_service
+            rows = [tuple(getattr(obj, field) for field in model.default) for obj in objects]
+            cases = [
+                ('hand-written + json', lambda: std.response({name: [legacy(obj) for obj in objects]})),
+                ('compiled + json', lambda: std.response({name: [dump(obj) for obj in objects]})),
+            ]
+            if fast is not None:
+                cases.append(('compiled + orjson', lambda: fast.response({name: [dump(obj) for obj in objects]})))
+                cases.append(('rows + orjson', lambda: fast.response({name: [serialize(row) for row in rows]})))
+            print(f'{name}: {args.rows} rows per response, {args.repeat} responses')
+            baseline = None
+            for label, build in cases:
+                elapsed = min(timeit.repeat(build, number=args.repeat, repeat=3)) / args.repeat
+                baseline = baseline or elapsed
+                print(f'  {label:20} {elapsed * 1000:7.3f} ms/response  ({baseline / elapsed:4.1f}x)')
+    if fast is None:
+        print('orjson не установлен — быстрый путь не измерен')
+
+
+if __name__ == '__main__':
+    main()
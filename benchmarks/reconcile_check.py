@@ -0,0 +1,131 @@
+"""
+Проверка сверки pending-платежей против локальной имитации YooKassa
+(app.services.fake_yookassa) через настоящий клиент yookassa:
+
+  - завершенные у провайдера платежи получают succeeded/canceled,
+    оплаченные заказы переходят в processing;
+  - платеж с неизвестным приложению статусом и платеж, которого нет у
+    провайдера, считаются failed и остаются pending, а остальные платежи
+    той же пачки применяются.
+
+    python benchmarks/reconcile_check.py --database-url sqlite:////tmp/reconcile_check.db
+
+Скрипт пересоздает все таблицы в указанной базе — используйте отдельную БД.
+При нарушении — код выхода 1.
+"""
+import argparse
+import logging
+import os
+import socket
+import sys
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from werkzeug.serving import make_server
+
+from app import create_app
+from app.extensions import db
+from app.models import Order, Payment, User
+from app.routes.payment_routes import payment_service
+from app.services.fake_yookassa import create_fake_app
+from app.services.reconciliation_service import reconcile_pending
+
+SUCCEEDED = 12
+CANCELED = 3
+UNKNOWN = 2
+
+
+def check(name, condition, failures):
+    print(f'  {"OK  " if condition else "FAIL"} {name}')
+    if not condition:
+        failures.append(name)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', required=True)
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    port = free_port()
+    server = make_server('127.0.0.1', port, create_fake_app(settle_after=0, cancel_ratio=0), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    fake_url = f'http://127.0.0.1:{port}'
+
+    os.environ['DATABASE_URL'] = args.database_url
+    app = create_app()
+    app.config.update(SQLALCHEMY_DATABASE_URI=args.database_url, YOOMONEY_API_URL=f'{fake_url}/v3')
+    payment_service.init_app(app)
+    failures = []
+
+    try:
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+
+            def seed(count, status='pending'):
+                return requests.post(f'{fake_url}/fake/payments', json={'count': count, 'status': status}).json()['ids']
+
+            succeeded = seed(SUCCEEDED + CANCELED)
+            canceled = succeeded[SUCCEEDED:]
+            succeeded = succeeded[:SUCCEEDED]
+            for payment_id in canceled:
+                requests.post(f'{fake_url}/v3/payments/{payment_id}/cancel')
+            unknown = seed(UNKNOWN, 'refund_pending')
+            missing = [str(uuid.uuid4())]
+
+            buyer = User(username='buyer', email='buyer@example.com', role='customer')
+            db.session.add(buyer)
+            db.session.flush()
+            # Неизвестный статус — в середине выборки, чтобы пачка с ним применялась целиком
+            created = datetime.utcnow() - timedelta(hours=1)
+            orders = {}
+            for index, payment_id in enumerate(succeeded[:6] + unknown + missing + succeeded[6:] + canceled):
+                order = Order(user_id=buyer.user_id, status='pending', payment_status='pending', total_amount=100)
+                db.session.add(order)
+                db.session.flush()
+                orders[payment_id] = order.order_id
+                db.session.add(Payment(payment_id=payment_id, order_id=order.order_id, user_id=buyer.user_id,
+                                       amount=100, status='pending', created_at=created + timedelta(seconds=index)))
+            db.session.commit()
+
+            stats = reconcile_pending(payment_service.verify_payment, batch_size=8, workers=4, rate=0,
+                                      max_attempts=2, base_delay=0.01, min_age=0)
+            total = SUCCEEDED + CANCELED + UNKNOWN + len(missing)
+            check(f'every payment is checked ({stats})', stats['checked'] == total, failures)
+            check('known statuses are applied', stats['updated'] == SUCCEEDED + CANCELED, failures)
+            check('unknown status and missing payment count as failed', stats['failed'] == UNKNOWN + len(missing),
+                  failures)
+
+            db.session.rollback()
+
+            def statuses(payment_ids):
+                return {(db.session.get(Payment, payment_id).status, db.session.get(Order, orders[payment_id]).status)
+                        for payment_id in payment_ids}
+
+            check('succeeded payments confirm their orders', statuses(succeeded) == {('succeeded', 'processing')},
+                  failures)
+            check('canceled payments are recorded', statuses(canceled) == {('canceled', 'pending')}, failures)
+            check('unknown status leaves the payment pending', statuses(unknown) == {('pending', 'pending')},
+                  failures)
+            check('missing payment stays pending', statuses(missing) == {('pending', 'pending')}, failures)
+            check('all payments are marked as checked',
+                  db.session.query(Payment).filter(Payment.last_checked_at.is_(None)).count() == 0, failures)
+    finally:
+        server.shutdown()
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Проверка клиента S3 против moto (в памяти, без сети):
+
+  - get_s3_client() возвращает один и тот же клиент в пределах процесса,
+    в том числе из разных потоков;
+  - после смены pid (fork воркера) клиент создается заново;
+  - файл больше S3_MULTIPART_THRESHOLD уходит multipart-загрузкой
+    (ETag объекта вида "<md5>-<число частей>"), меньший — одним PUT.
+
+    pip install "moto[s3]"
+    python benchmarks/s3_client_check.py
+
+При нарушении — код выхода 1.
+"""
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import current_app
+from moto import mock_aws
+from werkzeug.datastructures import FileStorage
+
+from app import create_app
+from app.services import s3_service
+
+BUCKET = 'brew-check'
+MB = 1024 * 1024
+
+
+def check(name, condition, failures):
+    print(f'  {"OK  " if condition else "FAIL"} {name}')
+    if not condition:
+        failures.append(name)
+
+
+def upload(data):
+    file = FileStorage(io.BytesIO(data), filename='big.bin', content_type='application/octet-stream')
+    url = s3_service.upload_file_to_s3(file, folder='check')
+    key = url[len(current_app.config['S3_BUCKET_URL']) + 1:]
+    return s3_service.get_s3_client().head_object(Bucket=BUCKET, Key=key)['ETag'].strip('"')
+
+
+def main():
+    os.environ.update(AWS_ACCESS_KEY_ID='testing', AWS_SECRET_ACCESS_KEY='testing', S3_BUCKET=BUCKET)
+    app = create_app()
+    app.config.update(
+        S3_BUCKET=BUCKET, S3_BUCKET_URL=f'https://{BUCKET}.s3.{app.config["AWS_REGION"]}.amazonaws.com',
+        AWS_ACCESS_KEY_ID='testing', AWS_SECRET_ACCESS_KEY='testing', S3_ENDPOINT_URL=None,
+        S3_MULTIPART_THRESHOLD=5 * MB, S3_MULTIPART_CHUNKSIZE=5 * MB
+    )
+    failures = []
+
+    with mock_aws(), app.app_context():
+        s3_service.reset_s3_client()
+        client = s3_service.get_s3_client()
+        if app.config['AWS_REGION'] == 'us-east-1':
+            client.create_bucket(Bucket=BUCKET)
+        else:
+            client.create_bucket(Bucket=BUCKET,
+                                 CreateBucketConfiguration={'LocationConstraint': app.config['AWS_REGION']})
+
+        def from_thread(_):
+            with app.app_context():
+                return s3_service.get_s3_client()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            clients = set(map(id, executor.map(from_thread, range(32))))
+        check('client reused within the process', s3_service.get_s3_client() is client, failures)
+        check('client reused across threads', clients == {id(client)}, failures)
+
+        with mock.patch.object(s3_service.os, 'getpid', return_value=os.getpid() + 100000):
+            forked = s3_service.get_s3_client()
+            check('client rebuilt after pid change', forked is not client, failures)
+            check('rebuilt client reused in the new pid', s3_service.get_s3_client() is forked, failures)
+
+        big = upload(os.urandom(12 * MB))
+        check(f'12 MB upload is multipart (ETag {big})', big.endswith('-3'), failures)
+        small = upload(os.urandom(1 * MB))
+        check(f'1 MB upload is a single PUT (ETag {small})', '-' not in small, failures)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
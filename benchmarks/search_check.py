@@ -0,0 +1,70 @@
+"""
+Проверка исправления опечаток в поиске (SQLite FTS5): опечатка в середине
+слова, в первой букве и перестановка букв находят товар, а посторонний
+запрос — нет.
+
+    python benchmarks/search_check.py --database-url sqlite:////tmp/search_check.db
+
+Скрипт пересоздает все таблицы в указанной базе — используйте отдельную БД.
+При нарушении — код выхода 1.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.extensions import db
+from app.models import Product
+from app.services.search_service import search_service
+
+PRODUCTS = ['Эфиопия Иргачеффе', 'Колумбия Супремо', 'Кения АА', 'Гватемала Антигуа']
+
+# запрос -> ожидаемый первый результат (None — ничего не найдено)
+CASES = {
+    'эфиопия': 'Эфиопия Иргачеффе',
+    'ефиопия': 'Эфиопия Иргачеффе',
+    'эфиопея': 'Эфиопия Иргачеффе',
+    'калумбия': 'Колумбия Супремо',
+    'гватемлаа': 'Гватемала Антигуа',
+    'бразилия': None,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', required=True)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url
+    app = create_app()
+    app.config['SQLALCHEMY_DATABASE_URI'] = args.database_url
+    failures = []
+
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            sys.exit('search_check проверяет только SQLite FTS5')
+        db.drop_all()
+        db.session.execute(db.text('DROP TABLE IF EXISTS product_fts'))
+        db.session.execute(db.text('DROP TABLE IF EXISTS product_fts_vocab'))
+        db.session.commit()
+        db.create_all()
+        search_service._ready.clear()
+        search_service.ensure_index()
+        db.session.add_all([Product(name=name, price=100, stock_quantity=1, is_active=True) for name in PRODUCTS])
+        db.session.commit()
+
+        for query, expected in CASES.items():
+            results = search_service.search(query)
+            found = results[0]['name'] if results else None
+            ok = found == expected
+            print(f'  {"OK  " if ok else "FAIL"} {query!r} -> {found!r}')
+            if not ok:
+                failures.append(query)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
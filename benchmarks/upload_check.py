@@ -0,0 +1,180 @@
+"""
+Проверка прямых загрузок изображений против локального S3 (moto server):
+
+  - подписанные POST-форма и PUT-URL выдаются и принимают файл, complete
+    привязывает объект к товару;
+  - запрос на недопустимый тип, PUT больше S3_UPLOAD_MAX_SIZE и чужой ключ
+    отклоняются;
+  - complete отклоняет и удаляет объект неверного размера или Content-Type
+    (moto, как и часть S3-совместимых хранилищ, не проверяет content-length-range);
+  - purge_unfinished_uploads удаляет непривязанные загрузки, не трогает
+    привязанные и производные, прерывает зависшие multipart-загрузки.
+
+    pip install "moto[server]"
+    python benchmarks/upload_check.py --database-url sqlite:////tmp/upload_check.db
+
+Скрипт пересоздает все таблицы в указанной базе — используйте отдельную БД.
+При нарушении — код выхода 1.
+"""
+import argparse
+import logging
+import os
+import socket
+import sys
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from flask_jwt_extended import create_access_token
+from moto.server import ThreadedMotoServer
+
+from app import create_app
+from app.extensions import db
+from app.models import Product, User
+from app.services import s3_service
+from app.services.image_service import image_pipeline
+from app.services.principal_service import role_claims
+from app.services.upload_service import purge_unfinished_uploads
+
+BUCKET = 'brew-uploads'
+MAX_SIZE = 64 * 1024
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 1024
+
+
+def check(name, condition, failures):
+    print(f'  {"OK  " if condition else "FAIL"} {name}')
+    if not condition:
+        failures.append(name)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def exists(client, key):
+    return client.list_objects_v2(Bucket=BUCKET, Prefix=key).get('KeyCount', 0) > 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', required=True)
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    port = free_port()
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=port, verbose=False)
+    server.start()
+    endpoint = f'http://127.0.0.1:{port}'
+
+    os.environ.update(DATABASE_URL=args.database_url, AWS_ACCESS_KEY_ID='testing',
+                      AWS_SECRET_ACCESS_KEY='testing', S3_BUCKET=BUCKET)
+    app = create_app()
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=args.database_url, S3_BUCKET=BUCKET, S3_BUCKET_URL=f'{endpoint}/{BUCKET}',
+        S3_ENDPOINT_URL=endpoint, AWS_ACCESS_KEY_ID='testing', AWS_SECRET_ACCESS_KEY='testing',
+        S3_UPLOAD_MAX_SIZE=MAX_SIZE
+    )
+    client = app.test_client()
+    failures = []
+
+    # Производные здесь не проверяются: тестовые байты — не настоящее изображение
+    try:
+        with app.app_context(), mock.patch.object(image_pipeline, 'enqueue'):
+            db.drop_all()
+            db.create_all()
+            admin = User(username='admin', email='admin@example.com', role='admin')
+            product = Product(name='coffee', price=10, stock_quantity=1)
+            db.session.add_all([admin, product])
+            db.session.commit()
+            product_id = product.product_id
+            headers = {'Authorization': f'Bearer {create_access_token(identity=str(admin.user_id), additional_claims=role_claims(admin))}'}
+
+            s3_service.reset_s3_client()
+            s3 = s3_service.get_s3_client()
+            if app.config['AWS_REGION'] == 'us-east-1':
+                s3.create_bucket(Bucket=BUCKET)
+            else:
+                s3.create_bucket(Bucket=BUCKET,
+                                 CreateBucketConfiguration={'LocationConstraint': app.config['AWS_REGION']})
+
+            def upload_url(body):
+                return client.post(f'/products/{product_id}/image/upload-url', json=body, headers=headers)
+
+            def complete(key):
+                return client.post(f'/products/{product_id}/image/complete', json={'key': key}, headers=headers)
+
+            def image_url():
+                db.session.rollback()
+                return db.session.get(Product, product_id).image_url
+
+            print('presign and complete')
+            target = upload_url({'filename': 'photo.png'}).get_json()
+            posted = requests.post(target['url'], data=target['fields'], files={'file': ('photo.png', PNG)})
+            check(f'POST form upload accepted ({posted.status_code})', posted.status_code in (200, 201, 204), failures)
+            post_key = target['key']
+            response = complete(post_key)
+            check('POST upload completes', response.status_code == 200, failures)
+            check('image_url points to the POST upload', image_url() == f'{endpoint}/{BUCKET}/{post_key}', failures)
+
+            target = upload_url({'filename': 'photo.jpg', 'method': 'put', 'size': len(PNG)}).get_json()
+            put = requests.put(target['url'], data=PNG, headers=target['headers'])
+            check(f'PUT upload accepted ({put.status_code})', put.status_code == 200, failures)
+            put_key = target['key']
+            check('PUT upload completes', complete(put_key).status_code == 200, failures)
+            check('image_url points to the PUT upload', image_url() == f'{endpoint}/{BUCKET}/{put_key}', failures)
+
+            print('limits')
+            check('disallowed extension is rejected', upload_url({'filename': 'run.exe'}).status_code == 400, failures)
+            check('PUT above S3_UPLOAD_MAX_SIZE is rejected',
+                  upload_url({'filename': 'big.png', 'method': 'put', 'size': MAX_SIZE + 1}).status_code == 400,
+                  failures)
+            check('key of another product is rejected',
+                  complete(f'products/{product_id + 1}/{put_key.rsplit("/", 1)[1]}').status_code == 400, failures)
+            check('missing object is rejected', complete(f'products/{product_id}/missing.png').status_code == 400,
+                  failures)
+
+            oversized = upload_url({'filename': 'big.png'}).get_json()['key']
+            s3.put_object(Bucket=BUCKET, Key=oversized, Body=b'\x00' * (MAX_SIZE + 1), ContentType='image/png')
+            check('oversized object fails completion', complete(oversized).status_code == 400, failures)
+            check('oversized object is deleted', not exists(s3, oversized), failures)
+
+            wrong_type = upload_url({'filename': 'page.png'}).get_json()['key']
+            s3.put_object(Bucket=BUCKET, Key=wrong_type, Body=b'<html></html>', ContentType='text/html')
+            check('wrong Content-Type fails completion', complete(wrong_type).status_code == 400, failures)
+            check('wrong Content-Type object is deleted', not exists(s3, wrong_type), failures)
+            check('image_url is unchanged by rejected uploads',
+                  image_url() == f'{endpoint}/{BUCKET}/{put_key}', failures)
+
+            print('cleanup')
+            orphan = upload_url({'filename': 'orphan.png'}).get_json()['key']
+            s3.put_object(Bucket=BUCKET, Key=orphan, Body=PNG, ContentType='image/png')
+            variant = 'products/variants/0123456789abcdef.webp'
+            s3.put_object(Bucket=BUCKET, Key=variant, Body=PNG, ContentType='image/webp')
+            multipart = s3.create_multipart_upload(Bucket=BUCKET, Key=f'products/{product_id}/unfinished.png')
+            # LastModified в S3 — с точностью до секунды
+            time.sleep(1.1)
+            fresh = upload_url({'filename': 'fresh.png'}).get_json()['key']
+            s3.put_object(Bucket=BUCKET, Key=fresh, Body=PNG, ContentType='image/png')
+
+            stats = purge_unfinished_uploads(max_age=1)
+            check(f'unattached uploads are deleted ({stats})', stats['deleted'] == 2, failures)
+            check('orphan upload is gone', not exists(s3, orphan), failures)
+            check('replaced POST upload is gone', not exists(s3, post_key), failures)
+            check('attached upload is kept', exists(s3, put_key), failures)
+            check('upload younger than max_age is kept', exists(s3, fresh), failures)
+            check('image variants are kept', exists(s3, variant), failures)
+            uploads = s3.list_multipart_uploads(Bucket=BUCKET).get('Uploads', [])
+            check('stale multipart upload is aborted',
+                  stats['aborted'] == 1 and all(u['UploadId'] != multipart['UploadId'] for u in uploads), failures)
+    finally:
+        server.stop()
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -13,16 +13,125 @@ class Config:
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'your-jwt-secret-key'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(days=1)
     JWT_REFRESH_TOKEN_EXPIRES = 604800  # 7 дней в секундах
+    # Хеширование паролей: полная спецификация метода werkzeug; хеши с другой
+    # спецификацией перехешируются при успешном входе
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_SALT_LENGTH = int(os.getenv('PASSWORD_SALT_LENGTH', 16))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))  # 0 — хешировать в потоке запроса
+    PASSWORD_HASH_QUEUE_FACTOR = int(os.getenv('PASSWORD_HASH_QUEUE_FACTOR', 4))  # задач в очереди на процесс
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT', 5))
+
+    # Яндекс OAuth
+    YANDEX_CLIENT_ID = os.getenv('YANDEX_CLIENT_ID', '96d622e3132846ed89e685c5cdd109ef')
+    YANDEX_CLIENT_SECRET = os.getenv('YANDEX_CLIENT_SECRET', '6b2af9713e684c9094e7ff32ca8e8708')
+    YANDEX_OAUTH_URL = os.getenv('YANDEX_OAUTH_URL', 'https://oauth.yandex.ru')
+    YANDEX_LOGIN_URL = os.getenv('YANDEX_LOGIN_URL', 'https://login.yandex.ru')
+    YANDEX_CONNECT_TIMEOUT = float(os.getenv('YANDEX_CONNECT_TIMEOUT', 3))
+    YANDEX_READ_TIMEOUT = float(os.getenv('YANDEX_READ_TIMEOUT', 10))
+    YANDEX_POOL_SIZE = int(os.getenv('YANDEX_POOL_SIZE', 10))
+    YANDEX_RETRIES = int(os.getenv('YANDEX_RETRIES', 2))
+    YANDEX_RETRY_BACKOFF = float(os.getenv('YANDEX_RETRY_BACKOFF', 0.2))
+    YANDEX_BREAKER_THRESHOLD = int(os.getenv('YANDEX_BREAKER_THRESHOLD', 5))  # ошибок подряд
+    YANDEX_BREAKER_RESET = float(os.getenv('YANDEX_BREAKER_RESET', 30))  # секунды
+    YANDEX_USERINFO_CACHE_SIZE = int(os.getenv('YANDEX_USERINFO_CACHE_SIZE', 10000))
+    YANDEX_USERINFO_CACHE_TTL = float(os.getenv('YANDEX_USERINFO_CACHE_TTL', 60))
+
+    # Stateless-режим: токены не пишутся в таблицу пользователей, отзыв — по jti
+    JWT_STATELESS_TOKENS = os.getenv('JWT_STATELESS_TOKENS', 'true').lower() == 'true'
+    JWT_DENYLIST_CAPACITY = int(os.getenv('JWT_DENYLIST_CAPACITY', 100000))
+    JWT_DENYLIST_ERROR_RATE = float(os.getenv('JWT_DENYLIST_ERROR_RATE', 0.001))
+    JWT_DENYLIST_SYNC_INTERVAL = float(os.getenv('JWT_DENYLIST_SYNC_INTERVAL', 5))  # секунды
+    JWT_DENYLIST_RELOAD_INTERVAL = float(os.getenv('JWT_DENYLIST_RELOAD_INTERVAL', 3600))
+    PRINCIPAL_CACHE_SIZE = int(os.getenv('PRINCIPAL_CACHE_SIZE', 10000))
+    PRINCIPAL_CACHE_TTL = float(os.getenv('PRINCIPAL_CACHE_TTL', 60))  # секунды
+
+    # Ответы API
+    JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'fast')  # fast — orjson, если установлен; std — стандартный json
+    COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))  # байты; меньшие ответы не сжимаются
+    COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))  # 1-9
+    COMPRESS_BROTLI_LEVEL = int(os.getenv('COMPRESS_BROTLI_LEVEL', 5))  # 0-11; brotli — если установлен
+
+    # Каталог
+    CATALOG_PAGE_SIZE = int(os.getenv('CATALOG_PAGE_SIZE', 50))
+    CATALOG_MAX_PAGE_SIZE = int(os.getenv('CATALOG_MAX_PAGE_SIZE', 200))
+    CATALOG_CACHE_SIZE = int(os.getenv('CATALOG_CACHE_SIZE', 1024))
+    CATALOG_CACHE_TTL = float(os.getenv('CATALOG_CACHE_TTL', 30))
+
+    # Заказы
+    ORDERS_PAGE_SIZE = int(os.getenv('ORDERS_PAGE_SIZE', 50))
+    ORDERS_MAX_PAGE_SIZE = int(os.getenv('ORDERS_MAX_PAGE_SIZE', 200))
+    ORDER_HOLD_TTL = int(os.getenv('ORDER_HOLD_TTL', 900))  # резерв неоплаченного заказа, секунды
+    ORDER_HOLD_SWEEP_BATCH = int(os.getenv('ORDER_HOLD_SWEEP_BATCH', 500))
+    ORDER_HOLD_SWEEP_INTERVAL = float(os.getenv('ORDER_HOLD_SWEEP_INTERVAL', 60))
+    ORDER_HOLD_SWEEPER_ENABLED = os.getenv('ORDER_HOLD_SWEEPER_ENABLED', 'false').lower() == 'true'
+
+    # Выгрузки и импорт админки
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))  # строк на пачку серверного курсора
+    IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 1000))  # строк на транзакцию импорта
+    IMPORT_MAX_ERRORS = int(os.getenv('IMPORT_MAX_ERRORS', 1000))  # ошибок строк в отчете
+    BULK_MAX_ROWS = int(os.getenv('BULK_MAX_ROWS', 5000))  # строк в одной массовой операции админки
+
+    # Склад
+    INVENTORY_REBALANCE_INTERVAL = float(os.getenv('INVENTORY_REBALANCE_INTERVAL', 30))
+
+    # Idempotency-Key
+    IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 86400))  # секунды
+    IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', 10))
+    # Сколько незавершенный запрос держит ключ; после — повтор может его перехватить
+    IDEMPOTENCY_LEASE = int(os.getenv('IDEMPOTENCY_LEASE', 60))  # секунды
+
+    # Поиск
+    SEARCH_DEFAULT_LIMIT = int(os.getenv('SEARCH_DEFAULT_LIMIT', 20))
+    SEARCH_MAX_LIMIT = int(os.getenv('SEARCH_MAX_LIMIT', 100))
+    SEARCH_TYPO_CANDIDATES = int(os.getenv('SEARCH_TYPO_CANDIDATES', 3))
+    # Сколько слов словаря смотреть при опечатке в первой букве
+    SEARCH_TYPO_SCAN_LIMIT = int(os.getenv('SEARCH_TYPO_SCAN_LIMIT', 50000))
 
     # YooMoney
     YOOMONEY_API_KEY = os.environ.get('YOOMONEY_API_KEY') or 'test_RmuhggbVDh5ExF3v2TXflw94s_cP4lHXtRPfX1fjJPE'
     YOOMONEY_SHOP_ID = os.environ.get('YOOMONEY_SHOP_ID') or '1088812'  # ID магазина в ЮKassa
     YOOMONEY_RETURN_URL = os.environ.get('YOOMONEY_RETURN_URL') or 'http://localhost:5000/api/payments/verify'
     YOOMONEY_TEST_MODE = True  # Режим тестирования
+    YOOMONEY_STATUS_REFRESH_INTERVAL = int(os.getenv('YOOMONEY_STATUS_REFRESH_INTERVAL', 30))  # секунды
+    YOOMONEY_WEBHOOK_VERIFY_IP = os.getenv('YOOMONEY_WEBHOOK_VERIFY_IP', 'true').lower() == 'true'
+    YOOMONEY_API_URL = os.getenv('YOOMONEY_API_URL', 'https://api.yookassa.ru/v3')
+
+    # Сверка зависших платежей
+    RECONCILE_BATCH_SIZE = int(os.getenv('RECONCILE_BATCH_SIZE', 200))
+    RECONCILE_WORKERS = int(os.getenv('RECONCILE_WORKERS', 8))
+    RECONCILE_RATE_LIMIT = float(os.getenv('RECONCILE_RATE_LIMIT', 20))  # запросов в секунду
+    RECONCILE_MAX_ATTEMPTS = int(os.getenv('RECONCILE_MAX_ATTEMPTS', 4))
+    RECONCILE_BACKOFF_BASE = float(os.getenv('RECONCILE_BACKOFF_BASE', 0.5))  # секунды
+    RECONCILE_MIN_AGE = float(os.getenv('RECONCILE_MIN_AGE', 60))  # не трогаем совсем свежие платежи
+    RECONCILE_INTERVAL = float(os.getenv('RECONCILE_INTERVAL', 300))
+
+    # Хранилище изображений товаров: local (static/uploads) или s3
+    IMAGE_STORAGE = os.getenv('IMAGE_STORAGE', 'local')
+
+    # Производные изображений (миниатюры, WebP)
+    IMAGE_VARIANT_WIDTHS = [int(w) for w in os.getenv('IMAGE_VARIANT_WIDTHS', '200,400,800').split(',')]
+    IMAGE_VARIANT_FORMATS = os.getenv('IMAGE_VARIANT_FORMATS', 'webp,jpeg').split(',')
+    IMAGE_VARIANT_QUALITY = int(os.getenv('IMAGE_VARIANT_QUALITY', 80))
+    IMAGE_PIPELINE_WORKERS = int(os.getenv('IMAGE_PIPELINE_WORKERS', 2))
+    IMAGE_PIPELINE_MAX_ATTEMPTS = int(os.getenv('IMAGE_PIPELINE_MAX_ATTEMPTS', 3))
+    IMAGE_PIPELINE_RETRY_DELAY = float(os.getenv('IMAGE_PIPELINE_RETRY_DELAY', 2))  # секунды, растет вдвое
 
     # AWS S3 Configuration
     AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
     AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
     AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
     S3_BUCKET = os.getenv('S3_BUCKET')
-    S3_BUCKET_URL = f"https://{S3_BUCKET}.s3.{AWS_REGION}.amazonaws.com"
\ No newline at end of file
+    S3_BUCKET_URL = os.getenv('S3_BUCKET_URL', f"https://{S3_BUCKET}.s3.{AWS_REGION}.amazonaws.com")
+    S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL')  # для S3-совместимых хранилищ (MinIO, moto server)
+    S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', 32))
+    S3_CONNECT_TIMEOUT = float(os.getenv('S3_CONNECT_TIMEOUT', 5))
+    S3_READ_TIMEOUT = float(os.getenv('S3_READ_TIMEOUT', 60))
+    S3_MAX_ATTEMPTS = int(os.getenv('S3_MAX_ATTEMPTS', 3))
+    S3_MULTIPART_THRESHOLD = int(os.getenv('S3_MULTIPART_THRESHOLD', 8 * 1024 * 1024))
+    S3_MULTIPART_CHUNKSIZE = int(os.getenv('S3_MULTIPART_CHUNKSIZE', 8 * 1024 * 1024))
+    S3_MAX_CONCURRENCY = int(os.getenv('S3_MAX_CONCURRENCY', 8))  # параллельных частей на загрузку
+    # Прямые загрузки по подписанным URL
+    S3_UPLOAD_MAX_SIZE = int(os.getenv('S3_UPLOAD_MAX_SIZE', 10 * 1024 * 1024))
+    S3_UPLOAD_URL_TTL = int(os.getenv('S3_UPLOAD_URL_TTL', 900))  # секунды
+    S3_UPLOAD_ORPHAN_AGE = int(os.getenv('S3_UPLOAD_ORPHAN_AGE', 86400))  # непривязанные загрузки старше — удаляются
\ No newline at end of file
@@ -1,10 +1,12 @@
 from app import create_app, db
 from app.models import User, Order, Product, OrderProducts
+from app.services.search_service import search_service
 
 def init_db():
     app = create_app()
     with app.app_context():
         db.create_all()
+        search_service.ensure_index()
 
 if __name__ == '__main__':
     init_db()